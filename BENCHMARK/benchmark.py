@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import argparse
+import threading
+import psutil
+from typing import Dict, List
+
+from src.EXTRACT.extract import Crawler
+from src.BENCHMARK.synthetic_site import SyntheticSite
+from src.utils.dataset import utils as d_ut
+
+METRICS_FOLDER = "metrics"
+LOGGER = logging.getLogger("benchmark")
+LOGGER.addHandler(logging.NullHandler())
+LOGGER.propagate = False  # the fetch errors of the synthetic site are expected
+DEFAULT_SCENARIOS = [
+    {"name": "small", "site": {"fanout": 5, "depth": 3}},
+    {"name": "latency", "site": {"fanout": 5, "depth": 3, "latency": 0.05}},
+    {
+        "name": "noisy",
+        "site": {"fanout": 5, "depth": 3, "error_rate": 0.05, "duplicate_ratio": 0.2},
+    },
+    {"name": "pool", "mode": "pool", "site": {"n_sites": 4, "fanout": 4, "depth": 3}},
+    {
+        "name": "pool_async",
+        "mode": "pool",
+        "site": {"n_sites": 4, "fanout": 4, "depth": 3, "latency": 0.05},
+        "crawler": {"async_mode": True},
+    },
+]
+
+
+class ProcessTreeSampler:
+    """
+    Samples the RSS and CPU time of the benchmark process and of its children (the pool workers), except the excluded ones.
+    """
+
+    def __init__(self, exclude: List[int] = None, interval: float = 0.1) -> None:
+        self.exclude = set(exclude or [])
+        self.interval = interval
+        self.peak_rss = 0
+        self.cpu_seconds = {}  # pid -> last seen user + system time
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self) -> None:
+        root = psutil.Process()
+        rss = 0
+        for process in [root] + root.children(recursive=True):
+            if process.pid in self.exclude:
+                continue
+            try:
+                with process.oneshot():
+                    rss += process.memory_info().rss
+                    times = process.cpu_times()
+                    self.cpu_seconds[process.pid] = times.user + times.system
+            except psutil.NoSuchProcess:
+                continue
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self.cpu_at_start = sum(self.cpu_seconds.values())
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    @property
+    def cpu_used(self) -> float:
+        return sum(self.cpu_seconds.values()) - self.cpu_at_start
+
+
+def worker_metrics(metrics_folder: str) -> Dict:
+    """
+    Sums the final metrics snapshot of every crawl found in the metrics files of the workers.
+
+    Args:
+        metrics_folder (str): The metrics_path of the crawler.
+
+    Returns:
+        A dictionary with the summed counters and the summed count and sum of every histogram.
+    """
+    last_snapshots = {}
+    for name in os.listdir(metrics_folder):
+        if name.endswith(".jsonl"):
+            for snapshot in d_ut.read_jsonl(os.path.join(metrics_folder, name)):
+                # a pool worker can run several crawls, each one resets its metrics
+                last_snapshots[(snapshot["pid"], snapshot["started_at"])] = snapshot
+    counters, histograms = {}, {}
+    for snapshot in last_snapshots.values():
+        for key, value in snapshot["counters"].items():
+            counters[key] = counters.get(key, 0) + value
+        for key, histogram in snapshot["histograms"].items():
+            total = histograms.setdefault(key, {"count": 0, "sum": 0.0})
+            total["count"] += histogram["count"]
+            total["sum"] += histogram["sum"]
+    return {"counters": counters, "histograms": histograms}
+
+
+def run_benchmark(
+    name: str = "benchmark",
+    mode: str = "crawl_website",
+    site: Dict = None,
+    crawler: Dict = None,
+    landing_zone: str = None,
+) -> Dict:
+    """
+    Crawls a synthetic site and measures the throughput and the resource usage of the crawler.
+
+    Args:
+        name (str): The name of the scenario, copied in the result.
+        mode (str): 'crawl_website' (one root url, in process) or 'pool' (crawl_websites_pool over all the root urls).
+        site (Dict): The arguments of SyntheticSite.
+        crawler (Dict): Arguments of the Crawler overriding the benchmark defaults.
+        landing_zone (str): The folder the crawl is written to (OPTIONAL). Default is a temporary folder, removed at the end.
+
+    Returns:
+        A dictionary with the pages/s, bytes/s, CPU seconds, peak RSS and metadata write overhead of the run.
+    """
+    if mode not in ("crawl_website", "pool"):
+        raise Exception(f"modalità non supportata: {mode}, usa 'crawl_website' o 'pool'")
+    temporary = landing_zone is None
+    landing_zone = landing_zone or tempfile.mkdtemp(prefix="crawler-benchmark-")
+    synthetic_site = SyntheticSite(**(site or {}))
+    synthetic_site.start()
+    try:
+        config = {
+            "depth": synthetic_site.depth,
+            "landing_zone": landing_zone,
+            "metadata_path": "dataset",
+            "document_folder_path": "documents",
+            "html_folder_path": "html",
+            "n_threads": 4,
+            "extracton_report": landing_zone,
+            "logger": LOGGER,
+            "use_negative_cache": False,
+            "metrics_path": METRICS_FOLDER,
+            **(crawler or {}),
+        }
+        crawler_object = Crawler(**config)
+        root_urls = synthetic_site.root_urls
+        if mode == "crawl_website":
+            root_urls = root_urls[:1]
+        with ProcessTreeSampler(exclude=[synthetic_site.process.pid]) as sampler:
+            started_at = time.time()
+            if mode == "pool":
+                pool = crawler_object.crawl_websites_pool(root_urls)
+                pool.close()
+                pool.join()
+                pool.clear()  # pathos caches the pools by id
+            else:
+                crawler_object.crawl_website(root_urls[0])
+                compaction_started_at = time.time()
+                d_ut.compact_metadata_logs(crawler_object.metadata_path, "dataset.json")
+                crawler_object.metrics.observe(
+                    "compaction_seconds", time.time() - compaction_started_at
+                )
+            elapsed = time.time() - started_at
+
+        workers = worker_metrics(os.path.join(landing_zone, METRICS_FOLDER))
+        pages = sum(
+            value for key, value in workers["counters"].items() if key.startswith("records")
+        )
+        metadata_seconds = workers["histograms"].get(
+            "metadata_write_seconds", {"sum": 0.0}
+        )["sum"] + crawler_object.metrics.snapshot()["histograms"].get(
+            "compaction_seconds", {"sum": 0.0}
+        )["sum"]
+        server = synthetic_site.stats
+        return {
+            "name": name,
+            "mode": mode,
+            "site": synthetic_site.describe(),
+            "crawler": crawler or {},
+            "elapsed_seconds": elapsed,
+            "pages": pages,
+            "pages_per_second": pages / elapsed,
+            "requests_served": server["requests"],
+            "bytes_served": server["bytes"],
+            "bytes_per_second": server["bytes"] / elapsed,
+            "errors_served": server["errors"],
+            "cpu_seconds": sampler.cpu_used,
+            "cpu_percent": 100 * sampler.cpu_used / elapsed,
+            "peak_rss_mb": sampler.peak_rss / 1024**2,
+            "metadata_write_seconds": metadata_seconds,
+            "metadata_write_overhead": metadata_seconds / elapsed,
+            "fetch_seconds": workers["histograms"].get("fetch_seconds"),
+            "parse_seconds": workers["histograms"].get("parse_seconds"),
+        }
+    finally:
+        synthetic_site.stop()
+        if temporary:
+            shutil.rmtree(landing_zone, ignore_errors=True)
+
+
+def run_suite(scenarios: List[Dict] = None, results_path: str = None) -> List[Dict]:
+    """
+    Runs a list of benchmark scenarios, see run_benchmark for their keys.
+
+    Args:
+        scenarios (List[Dict]): The scenarios. Default is DEFAULT_SCENARIOS.
+        results_path (str): A JSONL file the results are appended to (OPTIONAL), to compare runs over time.
+
+    Returns:
+        The results of the scenarios.
+    """
+    results = []
+    for scenario in scenarios or DEFAULT_SCENARIOS:
+        result = run_benchmark(**scenario)
+        result["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        results.append(result)
+        if results_path:
+            d_ut.append_jsonl(results_path, [result])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the crawler against local synthetic websites."
+    )
+    parser.add_argument(
+        "--scenarios",
+        help="JSON file with a list of scenarios, default is DEFAULT_SCENARIOS",
+    )
+    parser.add_argument("--results", help="JSONL file the results are appended to")
+    arguments = parser.parse_args()
+    scenarios = None
+    if arguments.scenarios:
+        with open(arguments.scenarios, "r", encoding="utf-8") as file:
+            scenarios = json.load(file)
+    for result in run_suite(scenarios, arguments.results):
+        print(
+            f"{result['name']:<12} {result['pages_per_second']:8.1f} pages/s "
+            f"{result['bytes_per_second'] / 1024**2:8.2f} MB/s "
+            f"cpu {result['cpu_percent']:6.1f}% rss {result['peak_rss_mb']:7.1f} MB "
+            f"metadata {100 * result['metadata_write_overhead']:5.2f}%"
+        )
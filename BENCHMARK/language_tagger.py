@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import argparse
+from typing import Dict
+
+from src.utils import misc
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "language_tagger_sample.json")
+MIN_LABEL_AGREEMENT = 0.98
+
+
+def run_parity(
+    sample_path: str = SAMPLE_PATH,
+    candidate_backend: str = "onnx",
+    repeat: int = 5,
+) -> Dict:
+    """
+    Compares the labels of the full precision language tagger and of another backend on the held-out multilingual sample.
+
+    Args:
+        sample_path (str): JSON file with a list of {"language", "text"} phrases. Default is the sample next to this file.
+        candidate_backend (str): The backend compared to the 'transformers' one. Default is 'onnx'.
+        repeat (int): The number of times the sample is classified, so the timings are not dominated by the first call.
+
+    Returns:
+        The result of misc.language_tagger_parity, with the accuracy of both backends on the expected languages.
+    """
+    with open(sample_path, "r", encoding="utf-8") as file:
+        sample = json.load(file)
+    texts = [phrase["text"] for phrase in sample]
+    reference = misc.initialize_language_tagger_model("transformers")
+    candidate = misc.initialize_language_tagger_model(candidate_backend)
+    # the first call of a pipeline pays the warm-up of its runtime
+    for pipe in [reference, candidate]:
+        pipe(texts[:1], top_k=1, truncation=True)
+    result = misc.language_tagger_parity(reference, candidate, texts * repeat)
+    result["texts"] = len(texts)
+    result["mismatches"] = list(dict.fromkeys(result["mismatches"]))  # once per phrase
+    for name, pipe in [("reference", reference), ("candidate", candidate)]:
+        outputs = misc.top_labels(pipe(texts, top_k=1, truncation=True))
+        result[f"{name}_accuracy"] = sum(
+            labels[0]["label"] == phrase["language"]
+            for labels, phrase in zip(outputs, sample)
+        ) / len(sample)
+    result["candidate_backend"] = candidate_backend
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Parity check of the language tagger backends on a held-out multilingual sample."
+    )
+    parser.add_argument("--sample", default=SAMPLE_PATH, help="JSON file with the phrases")
+    parser.add_argument("--backend", default="onnx", help="the backend compared to 'transformers'")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the sample for the timings")
+    parser.add_argument(
+        "--min-agreement",
+        type=float,
+        default=MIN_LABEL_AGREEMENT,
+        help=f"minimum share of phrases with the same top label, default {MIN_LABEL_AGREEMENT}",
+    )
+    parser.add_argument("--min-speedup", type=float, help="minimum speedup of the candidate backend (OPTIONAL)")
+    arguments = parser.parse_args()
+    result = run_parity(arguments.sample, arguments.backend, arguments.repeat)
+    print(json.dumps(result, indent=4, ensure_ascii=False))
+    failures = []
+    if result["label_agreement"] < arguments.min_agreement:
+        failures.append(
+            f"label agreement {result['label_agreement']:.3f} < {arguments.min_agreement}"
+        )
+    speedup = result["speedup"] or 0.0
+    if arguments.min_speedup and speedup < arguments.min_speedup:
+        failures.append(f"speedup {speedup:.2f}x < {arguments.min_speedup}x")
+    if failures:
+        print("parity check failed: " + ", ".join(failures))
+        sys.exit(1)
+    print(
+        f"parity check passed: agreement {result['label_agreement']:.3f}, speedup {speedup:.2f}x"
+    )
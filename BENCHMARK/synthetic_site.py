@@ -0,0 +1,247 @@
+import time
+import socket
+import random
+import hashlib
+import multiprocessing
+from typing import Dict, List
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "sicurezza rete attacco dati sistema utente accesso protezione rischio incidente "
+    "servizio azienda controllo analisi gestione minaccia software aggiornamento "
+    "security network threat data system user access policy update report"
+).split()
+
+
+class SyntheticSite:
+    """
+    Deterministic graph of synthetic websites served by a local HTTP server, used to benchmark the crawler without network.
+
+    Every site is a tree of pages, `fanout` links per page down to `depth` levels below the
+    root, reachable at /site-<n>/page-<id>.html. A share of the links points to PDFs
+    (`pdf_ratio`), a share of the pages answers with an error (`error_rate`) and a share
+    of the pages repeats the text of its parent (`duplicate_ratio`). The same seed always
+    gives the same graph.
+
+    The server runs in its own process, so it does not compete with an in-process crawl for the GIL.
+    """
+
+    def __init__(
+        self,
+        n_sites: int = 1,
+        fanout: int = 5,
+        depth: int = 3,
+        page_size: int = 8192,
+        pdf_ratio: float = 0.1,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        duplicate_ratio: float = 0.0,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """
+        Initializes the synthetic site.
+
+        Args:
+            n_sites (int): The number of independent sites, one root url each.
+            fanout (int): The number of links of every page above the last level.
+            depth (int): The number of levels below the root page.
+            page_size (int): The approximate size in bytes of the text of a page and of a PDF.
+            pdf_ratio (float): The share of links pointing to a PDF.
+            latency (float): Seconds waited before every answer.
+            error_rate (float): The share of pages answering 500.
+            duplicate_ratio (float): The share of pages with the same text as their parent.
+            seed (int): The seed of the graph.
+            host (str): The interface the server listens on.
+            port (int): The port of the server, 0 picks a free one.
+        """
+        self.n_sites = n_sites
+        self.fanout = fanout
+        self.depth = depth
+        self.page_size = page_size
+        self.pdf_ratio = pdf_ratio
+        self.latency = latency
+        self.error_rate = error_rate
+        self.duplicate_ratio = duplicate_ratio
+        self.seed = seed
+        self.host = host
+        self.port = port
+        self.process = None
+        self.requests = multiprocessing.Value("q", 0)
+        self.bytes = multiprocessing.Value("q", 0)
+        self.errors = multiprocessing.Value("q", 0)
+
+    @property
+    def pages_per_site(self) -> int:
+        return sum(self.fanout**level for level in range(self.depth + 1))
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def root_urls(self) -> List[str]:
+        return [f"{self.base_url}/site-{site}/page-0.html" for site in range(self.n_sites)]
+
+    @property
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests.value,
+            "bytes": self.bytes.value,
+            "errors": self.errors.value,
+        }
+
+    def reset_stats(self) -> None:
+        for counter in [self.requests, self.bytes, self.errors]:
+            with counter.get_lock():
+                counter.value = 0
+
+    def node_random(self, kind: str, site: int, node: int) -> random.Random:
+        return random.Random(f"{self.seed}-{kind}-{site}-{node}")
+
+    def children(self, node: int) -> List[int]:
+        first = node * self.fanout + 1
+        return [
+            child for child in range(first, first + self.fanout) if child < self.pages_per_site
+        ]
+
+    def is_pdf(self, site: int, node: int) -> bool:
+        return node > 0 and self.node_random("pdf", site, node).random() < self.pdf_ratio
+
+    def is_error(self, site: int, node: int) -> bool:
+        return node > 0 and self.node_random("error", site, node).random() < self.error_rate
+
+    def text(self, site: int, node: int) -> str:
+        parent = (node - 1) // self.fanout
+        if node > 0 and self.node_random("duplicate", site, node).random() < self.duplicate_ratio:
+            return self.text(site, parent)
+        rng = self.node_random("text", site, node)
+        words, size = [], 0
+        while size < self.page_size:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)
+
+    def html(self, site: int, node: int) -> bytes:
+        links = "\n".join(
+            f'<li><a href="/site-{site}/page-{child}.{"pdf" if self.is_pdf(site, child) else "html"}">'
+            f"pagina {child}</a></li>"
+            for child in self.children(node)
+        )
+        return (
+            f'<!DOCTYPE html><html lang="it"><head><meta charset="utf-8">'
+            f"<title>Sito {site} pagina {node}</title></head><body>"
+            f"<h1>Pagina {node}</h1><p>{self.text(site, node)}</p><ul>{links}</ul>"
+            f"</body></html>"
+        ).encode("utf-8")
+
+    def pdf(self, site: int, node: int) -> bytes:
+        padding = hashlib.sha256(f"{self.seed}-{site}-{node}".encode()).hexdigest()
+        body = (padding * (self.page_size // len(padding) + 1))[: self.page_size]
+        return (
+            b"%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\n% "
+            + body.encode("ascii")
+            + b"\ntrailer << /Root 1 0 R >>\n%%EOF\n"
+        )
+
+    def answer(self, path: str) -> tuple:
+        """
+        Returns the (status, content type, body) of a path of the site.
+        """
+        parts = path.strip("/").split("/")
+        try:
+            site = int(parts[0].removeprefix("site-"))
+            name, extension = parts[1].removeprefix("page-").rsplit(".", 1)
+            node = int(name)
+        except (IndexError, ValueError):
+            return 404, "text/plain", b"not found"
+        if site >= self.n_sites or node >= self.pages_per_site:
+            return 404, "text/plain", b"not found"
+        if self.is_error(site, node):
+            return 500, "text/plain", b"synthetic error"
+        if extension == "pdf":
+            return 200, "application/pdf", self.pdf(site, node)
+        return 200, "text/html; charset=utf-8", self.html(site, node)
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if site.latency:
+                    time.sleep(site.latency)
+                status, content_type, body = site.answer(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                for counter, value in [
+                    (site.requests, 1),
+                    (site.bytes, len(body)),
+                    (site.errors, int(status >= 400)),
+                ]:
+                    with counter.get_lock():
+                        counter.value += value
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self) -> None:
+        server = ThreadingHTTPServer((self.host, self.port), self.handler())
+        server.daemon_threads = True
+        server.serve_forever()
+
+    def start(self, timeout: float = 10.0) -> str:
+        """
+        Starts the server process and returns its base url once it accepts connections.
+        """
+        if not self.port:
+            with socket.socket() as probe:
+                probe.bind((self.host, 0))
+                self.port = probe.getsockname()[1]
+        self.process = multiprocessing.Process(target=self.serve, daemon=True)
+        self.process.start()
+        deadline = time.time() + timeout
+        while True:
+            try:
+                socket.create_connection((self.host, self.port), timeout=1).close()
+                return self.base_url
+            except OSError:
+                if time.time() > deadline or not self.process.is_alive():
+                    self.stop()
+                    raise Exception(f"il server sintetico non risponde su {self.base_url}")
+                time.sleep(0.05)
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def describe(self) -> Dict:
+        return {
+            "n_sites": self.n_sites,
+            "fanout": self.fanout,
+            "depth": self.depth,
+            "pages_per_site": self.pages_per_site,
+            "page_size": self.page_size,
+            "pdf_ratio": self.pdf_ratio,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "duplicate_ratio": self.duplicate_ratio,
+            "seed": self.seed,
+        }
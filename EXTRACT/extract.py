@@ -1,5 +1,7 @@
 import requests
 import json
+import asyncio
+import aiohttp
 from tqdm import tqdm
 from typing import List, Dict
 import os
@@ -7,14 +9,34 @@ from urllib3.exceptions import MaxRetryError
 from urllib.request import urljoin
 from src.utils import misc as misc
 from src.utils.pipeline_utils import extraction_utils as e_ut
+from src.utils.pipeline_utils import html_utils as h_ut
+from src.utils.pipeline_utils.frontier import CrawlFrontier, remove_frontier
+from src.utils.pipeline_utils.visited import SharedVisitedSet
+from src.utils.pipeline_utils.url_filter import UrlFilter
+from src.utils.pipeline_utils import archive as a_ut
+from src.utils.pipeline_utils import http_cache as hc
+from src.utils.pipeline_utils.near_duplicates import (
+    SharedSimHashIndex,
+    SimHashIndex,
+    simhash,
+)
+from src.utils.pipeline_utils.focused import DomainBudget, RelevanceScorer
+from src.utils.pipeline_utils import sitemaps as s_ut
+from src.utils.pipeline_utils.language_gate import LanguageGate
+from src.utils.pipeline_utils import metrics as m_ut
+from src.utils.pipeline_utils.fetch_guard import (
+    HostCircuitBreaker,
+    NegativeCache,
+    NEGATIVE_CACHE_TTL,
+    PERMANENT_STATUS_CODES,
+)
 from src.utils.dataset import utils as d_ut
 from src.utils.decorator import monitoring_extraction as mt
 import warnings
-from bs4 import GuessedAtParserWarning, XMLParsedAsHTMLWarning, BeautifulSoup
+from bs4 import GuessedAtParserWarning, XMLParsedAsHTMLWarning
 import time
 from pathos.pools import ProcessPool
 import random
-import portalocker
 from fastapi import status, HTTPException
 
 
@@ -39,6 +61,42 @@ class Crawler:
         continue_from_before: bool = False,
         extracton_report: str = None,
         logger=None,
+        async_mode: bool = False,
+        max_concurrency: int = 32,
+        max_concurrency_per_host: int = 4,
+        frontier_path: str = None,
+        shared_frontier: bool = False,
+        politeness_delay: float = 0.0,
+        shared_visited: bool = False,
+        visited_capacity: int = 2**22,
+        visited_bloom: bool = False,
+        max_content_size: int = 50 * 1024 * 1024,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        site_time_budget: float = None,
+        host_failure_threshold: int = 5,
+        host_reset_timeout: float = 300.0,
+        use_negative_cache: bool = True,
+        negative_cache_ttl: float = NEGATIVE_CACHE_TTL,
+        html_backend: str = "lxml",
+        url_filters: Dict = None,
+        respect_robots: bool = False,
+        archive_path: str = None,
+        incremental: bool = False,
+        near_duplicate_threshold: float = None,
+        crawl_strategy: str = "bfs",
+        topic_keywords: List[str] = None,
+        relevance_threshold: float = 0.2,
+        domain_page_budget: int = None,
+        domain_time_budget: float = None,
+        sitemap_discovery: bool = False,
+        sitemap_max_urls: int = 10000,
+        accepted_languages: List[str] = None,
+        language_sample_size: int = 2000,
+        metrics_path: str = None,
+        metrics_format: str = "jsonl",
+        metrics_flush_interval: float = 10.0,
+        resource_sample_interval: float = 1.0,
     ) -> None:
         """
         Initializes the Crawler object with specified configurations for web scraping.
@@ -52,6 +110,42 @@ class Crawler:
         - content_path (str): Directory to save cleaned content from HTMLs in a json format (OPTIONAL). the folder will be created only if present
         - n_threads (int): Number of threads to use for parallel processing.
         - continue_from_before (bool): Whether to continue from previously saved progress.
+        - async_mode (bool): Whether to crawl each root with the asyncio engine, keeping many requests in flight.
+        - max_concurrency (int): Maximum number of requests in flight per crawl in async mode.
+        - max_concurrency_per_host (int): Maximum number of requests in flight towards the same host in async mode.
+        - frontier_path (str): Directory to save the crawl frontier of each root url (OPTIONAL). If present, a killed crawl is resumed from it when continue_from_before is set, otherwise the frontier is kept in memory.
+        - shared_frontier (bool): Whether the workers of crawl_websites_pool pull pages from one frontier shared by all the root urls, instead of crawling one root url each.
+        - politeness_delay (float): Minimum number of seconds between two requests to the same host when the frontier is shared.
+        - shared_visited (bool): Whether the workers share one set of visited url fingerprints, so a page reachable from several root urls is fetched once.
+        - visited_capacity (int): Expected number of urls in the shared visited set.
+        - visited_bloom (bool): Whether the shared visited set is a Bloom filter (smaller, with rare false positives) instead of a fingerprint table.
+        - max_content_size (int): Maximum size in bytes of a downloaded page or document, larger responses are aborted.
+        - connect_timeout (float): Seconds to wait for the connection to a host.
+        - read_timeout (float): Seconds to wait between two bytes of a response.
+        - site_time_budget (float): Maximum seconds spent crawling a root url (a shared frontier worker when the frontier is shared), the pages left are kept in the frontier (OPTIONAL).
+        - host_failure_threshold (int): Consecutive failures after which the requests to a host are suspended.
+        - host_reset_timeout (float): Seconds after which a suspended host is probed again.
+        - use_negative_cache (bool): Whether to skip the urls that kept failing in previous runs, and record the new failures.
+        - negative_cache_ttl (float): Seconds after their last failure after which the urls in the negative cache are fetched again, except the permanent failures (404, 410, 451). Default is one week.
+        - html_backend (str): Parser used for the webpages, 'lxml' (default) or a BeautifulSoup parser such as 'html.parser'.
+        - url_filters (Dict): Allow/deny rules of the links, with the optional keys 'denied_domains', 'allowed_domains', 'denied_paths' and 'allowed_paths' (see UrlFilter). The default denies social networks, subscription and donation pages.
+        - respect_robots (bool): Whether to skip the links disallowed by the robots.txt of their host.
+        - archive_path (str): Directory to save the fetched responses as compressed WARC segments (OPTIONAL). If present, the pages and documents are not written as single files in html_folder_path and document_folder_path.
+        - incremental (bool): Whether to re-crawl with conditional requests (If-None-Match/If-Modified-Since) based on a local HTTP cache kept across runs. Unmodified pages are rebuilt from the stored body and every record in dataset.json is marked as changed or not.
+        - near_duplicate_threshold (float): Minimum SimHash similarity (e.g. 0.95) above which a webpage is a near-duplicate of a page already crawled from the same root url (from any root url with shared_frontier, the fingerprints being kept in the frontier file): it is neither stored nor expanded (OPTIONAL). If not present, near-duplicates are not detected.
+        - crawl_strategy (str): 'bfs' (default) visits the pages in discovery order, 'best_first' visits first the links with the highest relevance to the topic (anchor text, URL tokens and relevance of the parent page).
+        - topic_keywords (List[str]): Word prefixes of the topic the relevance is scored on. The default covers cybersecurity, in italian and english.
+        - relevance_threshold (float): Page relevance from which a fetched page counts as relevant in the yield statistics of the extraction report.
+        - domain_page_budget (int): Maximum number of pages fetched from each host during a crawl (OPTIONAL). With shared_frontier the budget is shared by all the workers, through the frontier file.
+        - domain_time_budget (float): Maximum seconds spent fetching from each host during a crawl (OPTIONAL). With shared_frontier the budget is shared by all the workers, through the frontier file.
+        - sitemap_discovery (bool): Whether to seed the frontier with the pages listed in the sitemaps of the root urls (declared in robots.txt, or /sitemap.xml), besides following the links. Only the pages within depth path segments below the root url are taken, and the pages whose lastmod did not change since they were last fetched are skipped.
+        - sitemap_max_urls (int): Maximum number of pages seeded from the sitemaps of a root url.
+        - accepted_languages (List[str]): Languages of the webpages to keep, as langdetect codes such as 'it' (OPTIONAL). If present, the language of every webpage is detected at crawl time from <html lang>, hreflang and a sample of the text: the pages in other languages are neither stored nor expanded (only their hreflang alternates in the accepted languages are followed), and the hosts whose pages are all out of scope are no longer fetched (with shared_frontier the host verdicts are learned by all the workers, through the frontier file).
+        - language_sample_size (int): Number of characters of text used to detect the language of a webpage.
+        - metrics_path (str): Directory to flush the crawl metrics to, one file per process (OPTIONAL). The counters and histograms of fetch latency, bytes, status codes, parse time and frontier depth, and the sampled RSS and CPU usage, are always kept in memory for the extraction report.
+        - metrics_format (str): Format of the metrics files, 'jsonl' (a snapshot appended at every flush) or 'prometheus' (text exposition format, rewritten at every flush).
+        - metrics_flush_interval (float): Seconds between two flushes of the metrics files.
+        - resource_sample_interval (float): Seconds between two samples of the RSS and CPU usage of the process.
 
         Throws:
         - Exception: If required parameters are not provided or incorrect.
@@ -61,6 +155,19 @@ class Crawler:
         self.depth = depth
         self.n_threads = n_threads
         self.continue_from_before = continue_from_before
+        self.async_mode = async_mode
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.shared_frontier = shared_frontier
+        self.politeness_delay = politeness_delay
+        self.max_content_size = max_content_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.site_time_budget = site_time_budget
+        self.html_backend = html_backend
+        self.circuit_breaker = HostCircuitBreaker(
+            failure_threshold=host_failure_threshold, reset_timeout=host_reset_timeout
+        )
         if not n_threads:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -92,25 +199,90 @@ class Crawler:
             os.makedirs(self.content_path, exist_ok=True)
         else:
             self.content_path = None
-        self.filters = [
-            "twitter",
-            "facebook",
-            "linkedin",
-            "instagram",
-            "youtube",
-            "just-eat.co",
-            "mailto",
-            "slack",
-            "subscription",
-            "donate",
-            "meetup",
-        ]  # TODO update this filters please
+        self.url_filter = UrlFilter(
+            **(url_filters or {}), respect_robots=respect_robots
+        )
+        # the variant of a page in an accepted language is preferred, Italian by default
+        self.preferred_languages = accepted_languages or ["it"]
+        self.url_index = e_ut.CanonicalUrlIndex(self.preferred_languages)
         if metadata_path:
             os.makedirs(self.metadata_path, exist_ok=True)
+        if frontier_path:
+            self.frontier_path = os.path.join(self.landing_zone, frontier_path)
+            os.makedirs(self.frontier_path, exist_ok=True)
+        else:
+            self.frontier_path = None
+        if shared_visited:
+            self.visited_set = SharedVisitedSet(
+                os.path.join(self.metadata_path, "visited.fingerprints"),
+                capacity=visited_capacity,
+                bloom=visited_bloom,
+            )
+            if not continue_from_before:
+                self.visited_set.reset()
+        else:
+            self.visited_set = None
+        self.resumed_urls = set()
+        if use_negative_cache:
+            self.negative_cache = NegativeCache(
+                os.path.join(self.metadata_path, "negative_cache.sqlite"),
+                ttl=negative_cache_ttl,
+                max_content_size=max_content_size,
+            )
+        else:
+            self.negative_cache = None
+        if archive_path:
+            self.archive = a_ut.ArchiveWriter(
+                os.path.join(self.landing_zone, archive_path)
+            )
+        else:
+            self.archive = None
+        if incremental:
+            self.http_cache = hc.HttpCache(
+                os.path.join(self.metadata_path, "http_cache.sqlite")
+            )
+        else:
+            self.http_cache = None
+        self.incremental_stats = {"not_modified": 0, "changed": 0, "unchanged": 0}
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.simhash_index = (
+            SimHashIndex(near_duplicate_threshold) if near_duplicate_threshold else None
+        )
+        if crawl_strategy not in ("bfs", "best_first"):
+            raise Exception(
+                f"strategia di crawling non supportata: {crawl_strategy}, usa 'bfs' o 'best_first'"
+            )
+        self.crawl_strategy = crawl_strategy
+        self.relevance = RelevanceScorer(
+            topic_keywords, relevance_threshold=relevance_threshold
+        )
+        self.domain_budget = DomainBudget(domain_page_budget, domain_time_budget)
+        self.sitemap_discovery = sitemap_discovery
+        self.sitemap_max_urls = sitemap_max_urls
+        if sitemap_discovery:
+            self.sitemap_state = s_ut.SitemapState(
+                os.path.join(self.metadata_path, "sitemap_state.sqlite")
+            )
+        else:
+            self.sitemap_state = None
+        self.sitemap_stats = None
+        if accepted_languages:
+            self.language_gate = LanguageGate(
+                accepted_languages, sample_size=language_sample_size
+            )
+        else:
+            self.language_gate = None
+        self.metrics = m_ut.CrawlMetrics(
+            os.path.join(self.landing_zone, metrics_path) if metrics_path else None,
+            format=metrics_format,
+            flush_interval=metrics_flush_interval,
+            sample_interval=resource_sample_interval,
+        )
 
     def get_content(self, url: str) -> Dict:
         """
         Fetches and processes the content of the given URL, handling different content types.
+        The body is streamed: unwanted content types are aborted after the headers and PDFs are written to disk in chunks.
 
         Parameters:
         - url (str): The URL to fetch.
@@ -118,42 +290,438 @@ class Crawler:
         Returns:
         - A dictionary with the keys 'content', 'status', and 'type', describing the fetched content.
         """
+        if not self.fetch_allowed(url):
+            return {"content": None, "status": False, "type": None}
         self.logger.info(f"processing {url} at {time.time()}")
         session = requests.Session()
+        cached = self.http_cache.lookup(url) if self.http_cache is not None else None
+        started_at = time.time()
 
         try:
-            reqs = e_ut.requests_retry_session(
+            with e_ut.requests_retry_session(
                 retries=5, backoff_factor=0.2, session=session
-            ).get(url, verify=False)
-            reqs.raise_for_status()
-            extention = e_ut.get_extention(reqs)
-            if extention == "pdf":
-                with open(
-                    os.path.join(
-                        self.document_folder_path, f"{misc.hash_value(url)}.pdf"
-                    ),
-                    "wb",
-                ) as document_type_file:
-                    document_type_file.write(reqs.content)
-                return {"content": None, "status": True, "type": "pdf"}
-            elif extention == "webpage":
-                soup = BeautifulSoup(reqs.content, "html.parser")
-                with open(
-                    os.path.join(self.html_folder_path, f"{misc.hash_value(url)}.html"),
-                    "wb",
-                ) as document_type_file:
-                    document_type_file.write(reqs.content)
-            else:
-                return {"content": None, "status": False, "type": None}
-            return {"content": soup, "status": True, "type": "webpage"}
+            ).get(
+                url,
+                verify=False,
+                stream=True,
+                timeout=(self.connect_timeout, self.read_timeout),
+                headers=hc.HttpCache.conditional_headers(cached),
+            ) as reqs:
+                reqs.raise_for_status()
+                self.record_success(url)
+                self.metrics.inc("responses", status=reqs.status_code)
+                if reqs.status_code == 304 and cached:
+                    self.record_fetch(started_at, 0)
+                    return self.replay_cached(url, cached)
+                extention = self.accepted_extention(url, reqs.headers)
+                chunks = reqs.iter_content(chunk_size=e_ut.DOWNLOAD_CHUNK_SIZE)
+                response_head = (reqs.status_code, reqs.reason, reqs.headers)
+                if extention == "pdf":
+                    e_ut.write_limited(
+                        chunks, self.document_path(url), self.max_content_size
+                    )
+                    self.record_fetch(
+                        started_at, os.path.getsize(self.document_path(url))
+                    )
+                    return self.store_document(url, response_head)
+                elif extention == "webpage":
+                    content = e_ut.read_limited(chunks, self.max_content_size)
+                    self.record_fetch(started_at, len(content))
+                    return self.store_webpage(url, content, response_head)
         except requests.HTTPError as e:
             self.logger.error(f"\nHTTP error: {e}\n")
-        except MaxRetryError as e:
+            self.record_failure(url, "http error", e.response.status_code)
+        except (requests.ConnectionError, requests.Timeout, MaxRetryError) as e:
+            self.logger.error(f"\nconnection error: {e}\n")
+            self.record_failure(url, "connection error")
+        except requests.exceptions.RetryError as e:
             self.logger.error(f"\nMax retries exceeded: {e}\n")
+            self.record_failure(url, "max retries exceeded")
+        except e_ut.ContentTooLargeError as e:
+            self.logger.warning(f"\n{url} aborted: {e}\n")
+            self.record_failure(url, "too large", max_size=self.max_content_size)
+        except Exception as e:
+            self.logger.error(f"\nunespected error: {e}")
+        return {"content": None, "status": False, "type": None}
+
+    async def get_content_async(
+        self, session: aiohttp.ClientSession, url: str
+    ) -> Dict:
+        """
+        Asynchronous counterpart of get_content, used by the asyncio crawl engine.
+
+        Parameters:
+        - session (aiohttp.ClientSession): The shared session holding the connection pool.
+        - url (str): The URL to fetch.
+
+        Returns:
+        - A dictionary with the keys 'content', 'status', and 'type', describing the fetched content.
+        """
+
+        async def handle_response(response: aiohttp.ClientResponse) -> Dict:
+            self.record_success(url)
+            self.metrics.inc("responses", status=response.status)
+            if response.status == 304 and cached:
+                self.record_fetch(started_at, 0)
+                return self.replay_cached(url, cached)
+            extention = self.accepted_extention(url, response.headers)
+            chunks = response.content.iter_chunked(e_ut.DOWNLOAD_CHUNK_SIZE)
+            response_head = (response.status, response.reason, response.headers)
+            if extention == "pdf":
+                await e_ut.async_write_limited(
+                    chunks, self.document_path(url), self.max_content_size
+                )
+                self.record_fetch(started_at, os.path.getsize(self.document_path(url)))
+                return self.store_document(url, response_head)
+            elif extention == "webpage":
+                content = await e_ut.async_read_limited(chunks, self.max_content_size)
+                self.record_fetch(started_at, len(content))
+                return self.store_webpage(url, content, response_head)
+            return {"content": None, "status": False, "type": None}
+
+        if not self.fetch_allowed(url):
+            return {"content": None, "status": False, "type": None}
+        self.logger.info(f"processing {url} at {time.time()}")
+        cached = self.http_cache.lookup(url) if self.http_cache is not None else None
+        started_at = time.time()
+        try:
+            return await e_ut.async_get_with_retries(
+                session,
+                url,
+                handle_response,
+                retries=5,
+                backoff_factor=0.2,
+                headers=hc.HttpCache.conditional_headers(cached),
+            )
+        except aiohttp.ClientResponseError as e:
+            self.logger.error(f"\nHTTP error: {e}\n")
+            self.record_failure(url, "http error", e.status)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            self.logger.error(f"\nconnection error: {e!r}\n")
+            self.record_failure(url, "connection error")
+        except e_ut.ContentTooLargeError as e:
+            self.logger.warning(f"\n{url} aborted: {e}\n")
+            self.record_failure(url, "too large", max_size=self.max_content_size)
         except Exception as e:
             self.logger.error(f"\nunespected error: {e}")
         return {"content": None, "status": False, "type": None}
 
+    def fetch_allowed(self, url: str) -> bool:
+        """
+        Checks the negative cache and the circuit breaker of the host before sending a request.
+
+        Parameters:
+        - url (str): The URL about to be fetched.
+
+        Returns:
+        - False if the URL kept failing in previous runs or its host is suspended.
+        """
+        if self.negative_cache is not None and url in self.negative_cache:
+            self.logger.debug(f"{url} skipped, in the negative cache")
+            return False
+        if not self.circuit_breaker.allow(url):
+            self.logger.debug(f"{url} skipped, host suspended after repeated failures")
+            return False
+        return True
+
+    def record_success(self, url: str):
+        """
+        Records a successful response in the circuit breaker of the host and removes the URL from the negative cache.
+        """
+        self.circuit_breaker.record_success(url)
+        if self.negative_cache is not None:
+            self.negative_cache.record_success(url)
+
+    def record_failure(
+        self,
+        url: str,
+        reason: str,
+        status_code: int = None,
+        permanent: bool = False,
+        max_size: int = None,
+    ):
+        """
+        Records a failed fetch in the circuit breaker of the host and in the negative cache.
+
+        Parameters:
+        - url (str): The URL that failed.
+        - reason (str): A short description of the failure.
+        - status_code (int): The HTTP status code, if any.
+        - permanent (bool): Whether the failure does not depend on the host being reachable.
+        - max_size (int): The size limit exceeded by the response, for a response too large.
+        """
+        self.metrics.inc("fetch_errors", reason=reason)
+        if status_code is not None:
+            self.metrics.inc("responses", status=status_code)
+        permanent = permanent or status_code in PERMANENT_STATUS_CODES
+        if not permanent and max_size is None:
+            self.circuit_breaker.record_failure(url)
+        if self.negative_cache is not None:
+            self.negative_cache.add(
+                url, reason, status_code, permanent, max_size=max_size
+            )
+
+    def record_fetch(self, started_at: float, n_bytes: int):
+        """
+        Records the latency (from the request to the end of the body) and the size of a response in the crawl metrics.
+
+        Parameters:
+        - started_at (float): The time.time() at which the request was sent.
+        - n_bytes (int): The size of the body.
+        """
+        self.metrics.observe("fetch_seconds", time.time() - started_at)
+        self.metrics.observe("response_bytes", n_bytes, buckets=m_ut.SIZE_BUCKETS)
+        self.metrics.inc("bytes_downloaded", n_bytes)
+
+    def accepted_extention(self, url: str, headers) -> str:
+        """
+        Checks the response headers before the body is downloaded.
+
+        Parameters:
+        - url (str): The URL being fetched.
+        - headers (Mapping): The response headers.
+
+        Returns:
+        - 'pdf' or 'webpage', or None if the content type is not handled.
+
+        Throws:
+        - ContentTooLargeError: If the declared content length exceeds max_content_size.
+        """
+        extention = e_ut.get_extention_from_headers(headers)
+        if extention is None:
+            self.logger.debug(
+                f"{url} skipped, content type {headers.get('content-type')}"
+            )
+            if self.negative_cache is not None:
+                self.negative_cache.add(
+                    url,
+                    f"content type {headers.get('content-type')}",
+                    deterministic=True,
+                )
+            return None
+        content_length = headers.get("content-length")
+        if content_length and content_length.isdigit():
+            if int(content_length) > self.max_content_size:
+                raise e_ut.ContentTooLargeError(
+                    f"declared size {content_length} bytes exceeds {self.max_content_size}"
+                )
+        return extention
+
+    def document_path(self, url: str) -> str:
+        return os.path.join(self.document_folder_path, f"{misc.hash_value(url)}.pdf")
+
+    def store_document(self, url: str, response_head: tuple) -> Dict:
+        """
+        Moves the downloaded PDF into the archive, when the crawler writes one.
+
+        Parameters:
+        - url (str): The URL the document was fetched from.
+        - response_head (tuple): The status code, reason and headers of the response.
+
+        Returns:
+        - A dictionary with the keys 'content', 'status', 'type' and 'archive' (the location of the record, if archived), plus 'changed' and 'content_hash' in incremental mode.
+        """
+        location = None
+        body_hash = None
+        if self.http_cache is not None:
+            body_hash = hc.content_hash(self.document_path(url))
+        if self.archive is not None:
+            location = self.archive.append(url, *response_head, self.document_path(url))
+            os.remove(self.document_path(url))
+        return {
+            "content": None,
+            "status": True,
+            "type": "pdf",
+            "archive": location,
+            **self.remember_response(
+                url,
+                response_head[2],
+                "pdf",
+                body_hash,
+                self.document_path(url),
+                location,
+            ),
+        }
+
+    def store_webpage(self, url: str, content: bytes, response_head: tuple) -> Dict:
+        """
+        Writes the fetched webpage to the html folder (or to the archive) and parses it once.
+
+        The links, title and cleaned text come from the same parse, the text is saved next
+        to the raw html (same name, .txt) so that ParseHtml does not parse the page again.
+        Archived pages are parsed again by ParseHtml when the record is replayed.
+        The pages dropped by screen_webpage are not stored.
+
+        Parameters:
+        - url (str): The URL the content was fetched from.
+        - content (bytes): The raw response body.
+        - response_head (tuple): The status code, reason and headers of the response.
+
+        Returns:
+        - A dictionary with the keys 'content', 'status', 'type' and 'archive' (the location of the record, if archived), plus 'changed' and 'content_hash' in incremental mode.
+        """
+        parse_started_at = time.time()
+        page = h_ut.parse_html(content, self.html_backend)
+        self.metrics.observe("parse_seconds", time.time() - parse_started_at)
+        dropped = self.screen_webpage(url, page)
+        if dropped:
+            return dropped
+        html_path = os.path.join(self.html_folder_path, f"{misc.hash_value(url)}.html")
+        location = None
+        if self.archive is not None:
+            location = self.archive.append(url, *response_head, content)
+        else:
+            with open(html_path, "wb") as document_type_file:
+                document_type_file.write(content)
+            with open(h_ut.text_path(html_path), "w", encoding="utf-8") as text_file:
+                text_file.write(page["text"])
+        return {
+            "content": page,
+            "status": True,
+            "type": "webpage",
+            "archive": location,
+            **self.remember_response(
+                url,
+                response_head[2],
+                "webpage",
+                hc.content_hash(content) if self.http_cache is not None else None,
+                html_path,
+                location,
+            ),
+        }
+
+    def screen_webpage(self, url: str, page: Dict) -> Dict:
+        """
+        Applies the crawl-time filters to a parsed webpage before it is stored: the language gate, then the near-duplicate detection.
+
+        Parameters:
+        - url (str): The URL of the webpage.
+        - page (Dict): The parsed webpage, its detected language is added under 'language'.
+
+        Returns:
+        - The result of the fetch if the page is dropped, None if it is kept.
+        """
+        if self.language_gate is not None:
+            in_scope, page["language"], source = self.language_gate.check(url, page)
+            if not in_scope:
+                self.logger.debug(
+                    f"{url} skipped, language {page['language']} ({source}) not accepted"
+                )
+                return {
+                    "content": None,
+                    "status": False,
+                    "type": "webpage",
+                    "archive": None,
+                    "language": page["language"],
+                    "language_out_of_scope": True,
+                    "language_alternates": self.language_gate.alternates(url, page),
+                }
+        near_duplicate_of = self.near_duplicate_of(url, page["text"])
+        if near_duplicate_of:
+            return self.near_duplicate_result(near_duplicate_of)
+        return None
+
+    def near_duplicate_of(self, url: str, text: str) -> str:
+        """
+        Looks up the SimHash of the cleaned text of a webpage in the index of the pages crawled so far.
+
+        Parameters:
+        - url (str): The URL of the webpage.
+        - text (str): The cleaned text of the webpage.
+
+        Returns:
+        - The URL of the page it is a near-duplicate of, or None (always None if the detection is off).
+        """
+        if self.simhash_index is None:
+            return None
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        near_duplicate_of = self.simhash_index.add(fingerprint, url)
+        if near_duplicate_of:
+            self.logger.debug(f"{url} skipped, near-duplicate of {near_duplicate_of}")
+        return near_duplicate_of
+
+    @staticmethod
+    def near_duplicate_result(near_duplicate_of: str) -> Dict:
+        return {
+            "content": None,
+            "status": False,
+            "type": "webpage",
+            "archive": None,
+            "near_duplicate_of": near_duplicate_of,
+        }
+
+    def remember_response(
+        self,
+        url: str,
+        headers,
+        type: str,
+        body_hash: str,
+        path: str,
+        archive: Dict = None,
+    ) -> Dict:
+        """
+        Stores the validators of a full response in the HTTP cache, in incremental mode.
+
+        Parameters:
+        - url (str): The fetched URL.
+        - headers (Mapping): The response headers.
+        - type (str): The content type, 'pdf' or 'webpage'.
+        - body_hash (str): The hash of the body.
+        - path (str): The file the body was written to, when it is not archived.
+        - archive (Dict): The location of the archive record, if any.
+
+        Returns:
+        - A dictionary with the keys 'changed' and 'content_hash', empty if the crawl is not incremental.
+        """
+        if self.http_cache is None:
+            return {}
+        changed = self.http_cache.store(
+            url, headers, type, body_hash, archive["path"] if archive else path, archive
+        )
+        self.incremental_stats["changed" if changed else "unchanged"] += 1
+        return {"changed": changed, "content_hash": body_hash}
+
+    def replay_cached(self, url: str, cached: Dict) -> Dict:
+        """
+        Rebuilds the result of a fetch from the HTTP cache after a 304 Not Modified answer.
+
+        Webpages are parsed again from the stored body so that their links are followed as usual.
+
+        Parameters:
+        - url (str): The fetched URL.
+        - cached (Dict): The cache entry of the URL, see HttpCache.lookup.
+
+        Returns:
+        - A dictionary with the keys 'content', 'status', 'type', 'archive', 'changed' (always False) and 'content_hash'.
+        """
+        self.logger.debug(f"{url} not modified, reusing the stored body")
+        self.incremental_stats["not_modified"] += 1
+        page = None
+        if cached["type"] == "webpage":
+            if cached["archive"]:
+                body = a_ut.read_record(cached["path"], cached["archive"]["offset"])[
+                    "body"
+                ]
+            else:
+                with open(cached["path"], "rb") as html_file:
+                    body = html_file.read()
+            parse_started_at = time.time()
+            page = h_ut.parse_html(body, self.html_backend)
+            self.metrics.observe("parse_seconds", time.time() - parse_started_at)
+            dropped = self.screen_webpage(url, page)
+            if dropped:
+                return dropped
+        return {
+            "content": page,
+            "status": True,
+            "type": cached["type"],
+            "archive": cached["archive"],
+            "changed": False,
+            "content_hash": cached["content_hash"],
+        }
+
     def get_links(self, url: str, request_data: Dict) -> List[str]:
         """
         Extracts and returns all the hyperlinks from the fetched content of a webpage.
@@ -163,15 +731,16 @@ class Crawler:
         - request_data (Dict): The content data from which links should be extracted.
 
         Returns:
-        - A dictionary containing the type, status, and the list of extracted URLs.
+        - A dictionary containing the type, status, the list of extracted URLs and the list of their anchor texts.
         """
         urls = []
+        anchors = []
         if request_data["type"] == "pdf":
-            return {"type": "pdf", "status": True, "urls": urls}
+            return {"type": "pdf", "status": True, "urls": urls, "anchors": anchors}
         if not request_data["status"]:
-            return {"type": None, "status": False, "urls": urls}
-        for link in request_data["content"].find_all("a", href=True):
-            href = link["href"]
+            return {"type": None, "status": False, "urls": urls, "anchors": anchors}
+        for href, anchor in request_data["content"]["links"]:
+            anchors.append(anchor)
             if not href.startswith(
                 "http"
             ):  # TODO qui possiamo mettere anche un altro check, se il link senza estensione ha un hashtag è solo un paragrafo dell'intero sito
@@ -179,28 +748,53 @@ class Crawler:
                 urls.append(joined_link)
             else:
                 urls.append(href)
-        return {"type": "webpage", "status": True, "urls": urls}
+        return {"type": "webpage", "status": True, "urls": urls, "anchors": anchors}
 
     def fetch_links(self, url: str, request_data: Dict) -> List[str]:
         """
         Filters and returns relevant hyperlinks from the fetched content, excluding unwanted URLs.
+        The links are canonicalized and the language variants of already known pages are dropped.
 
         Parameters:
         - url (str): The URL of the webpage being processed.
         - request_data (Dict): The content data from which links are being fetched and filtered.
 
         Returns:
-        - A dictionary with filtered URLs, their type, and status.
+        - A dictionary with filtered URLs, their anchor texts, their type, and status.
         """
         links_request_data = self.get_links(url, request_data)
         if links_request_data["type"] == "webpage":
-            filtered_urls = [
-                url
-                for url in links_request_data["urls"]
-                if not any(social_network in url for social_network in self.filters)
+            canonical_links = [
+                (self.url_index.add(link), anchor)
+                for link, anchor in zip(
+                    links_request_data["urls"], links_request_data["anchors"]
+                )
+            ]
+            filtered_links = [
+                (url, anchor)
+                for url, anchor in canonical_links
+                if url and self.url_filter.allowed(url)
             ]
+            if self.language_gate is not None:
+                # the translations of the page in the languages not accepted are not followed
+                out_of_scope = {
+                    e_ut.canonicalize_url(alternate)
+                    for alternate in self.language_gate.out_of_scope_alternates(
+                        url, request_data["content"]
+                    )
+                }
+                filtered_links = [
+                    (link, anchor)
+                    for link, anchor in filtered_links
+                    if link not in out_of_scope
+                ]
 
-            return {"type": "webpage", "status": True, "urls": filtered_urls}
+            return {
+                "type": "webpage",
+                "status": True,
+                "urls": [url for url, _ in filtered_links],
+                "anchors": [anchor for _, anchor in filtered_links],
+            }
         return links_request_data
 
     def save_content_cleaned(self, parent_url: str, url: str, content: str):
@@ -228,18 +822,41 @@ class Crawler:
         with open(json_path, "w") as data:
             json.dump(structure, data, indent=2, ensure_ascii=False)
 
-    def save_meta(self, url: str, status: str, type: str):
+    def save_meta(
+        self,
+        url: str,
+        status: str,
+        type: str,
+        archive: Dict = None,
+        changed: bool = None,
+        content_hash: str = None,
+        near_duplicate_of: str = None,
+        language: str = None,
+        language_out_of_scope: bool = False,
+    ):
         """
-        Saves metadata for a fetched URL to a JSON file, including its status and content type.
+        Saves metadata for a fetched URL, including its status and content type.
+
+        The record is appended to the JSONL log of the current process, the logs are
+        merged into dataset.json by d_ut.compact_metadata_logs.
 
         Parameters:
         - url (str): The URL being processed.
         - status (str): The status of the URL fetch.
         - type (str): The content type of the fetched URL.
+        - archive (Dict): The location of the archived response, if any. The path then points to the archive segment and the offset and length of the record are saved too.
+        - changed (bool): Whether the content changed since the previous crawl, saved only in incremental mode.
+        - content_hash (str): The hash of the content, saved only in incremental mode.
+        - near_duplicate_of (str): The URL of the page the webpage is a near-duplicate of, if any.
+        - language (str): The language detected at crawl time, if any.
+        - language_out_of_scope (bool): Whether the webpage was dropped because of its language.
         """
 
+        started_at = time.time()
         url_hash = misc.hash_value(url)
-        meta_file_path = os.path.join(self.metadata_path, "dataset.json")
+        meta_log_path = d_ut.metadata_log_path(
+            self.metadata_path, "dataset.json", os.getpid()
+        )
 
         new_meta = {
             "hash_url": url_hash,
@@ -259,104 +876,543 @@ class Crawler:
                 )
             ),
         }
+        if archive:
+            new_meta["path"] = archive["path"]
+            new_meta["archive_offset"] = archive["offset"]
+            new_meta["archive_length"] = archive["length"]
+        if changed is not None:
+            new_meta["changed"] = changed
+            new_meta["content_hash"] = content_hash
+        if near_duplicate_of:
+            new_meta["near_duplicate_of"] = near_duplicate_of
+        if language:
+            new_meta["language"] = language
+        if language_out_of_scope:
+            new_meta["language_out_of_scope"] = True
+        d_ut.append_jsonl(meta_log_path, [new_meta])
+        self.metrics.observe("metadata_write_seconds", time.time() - started_at)
+        self.metrics.inc("records", type=type, status="ok" if status else "ko")
+        if near_duplicate_of:
+            self.metrics.inc("near_duplicates")
+
+    def process_page(
+        self, current_url: str, current_depth: int, parent_url: str, request_data: Dict
+    ) -> List[tuple]:
+        """
+        Saves the cleaned content and the metadata of a fetched page and returns the links to enqueue.
 
-        with portalocker.Lock(meta_file_path, "a+", timeout=2) as file:
-            file.seek(0)
-            try:  # TODO questo try è necessario?
-                existing_data = json.load(file)
-            except json.JSONDecodeError:
-                existing_data = []
+        Parameters:
+        - current_url (str): The URL that has been fetched.
+        - current_depth (int): The depth of the URL in the crawl.
+        - parent_url (str): The URL of the page the current URL was found in (None for the root).
+        - request_data (Dict): The content data returned by get_content.
 
-            existing_data.append(new_meta)
-            unique_existing_data = [
-                dict(t) for t in {tuple(d.items()) for d in existing_data}
+        Returns:
+        - A list of (url, depth, parent) tuples to add to the frontier, (url, depth, parent, priority) with the best_first strategy.
+        """
+        if self.content_path and request_data["type"] == "webpage":
+            request_string_data = request_data["content"]["text"]
+            self.save_content_cleaned(
+                parent_url or "", current_url, request_string_data
+            )
+        self.save_meta(
+            current_url,
+            request_data["status"],
+            request_data["type"],
+            request_data.get("archive"),
+            request_data.get("changed"),
+            request_data.get("content_hash"),
+            request_data.get("near_duplicate_of"),
+            request_data.get("language")
+            or (request_data["content"] or {}).get("language"),
+            request_data.get("language_out_of_scope", False),
+        )
+        if self.sitemap_state is not None and request_data["status"]:
+            self.sitemap_state.confirm(current_url)
+        page_score = 0.0
+        if request_data["status"]:
+            page_score = (
+                self.relevance.score_page(request_data["content"]["text"])
+                if request_data["type"] == "webpage"
+                else self.relevance.score_url(current_url)
+            )
+            self.relevance.record_page(page_score)
+
+        if request_data.get("language_alternates"):
+            return self.language_alternate_links(
+                current_url, current_depth, request_data["language_alternates"]
+            )
+        result = self.fetch_links(current_url, request_data)
+        if not (result["status"] and result["type"] == "webpage"):
+            return []
+        if current_depth >= self.depth:
+            return []
+        if self.crawl_strategy == "best_first":
+            return [
+                (
+                    link,
+                    current_depth + 1,
+                    current_url,
+                    self.relevance.score_link(anchor, link, page_score),
+                )
+                for link, anchor in zip(result["urls"], result["anchors"])
             ]
+        return [(link, current_depth + 1, current_url) for link in result["urls"]]
 
-            file.seek(0)
-            file.truncate()
-            json.dump(unique_existing_data, file, indent=4, ensure_ascii=False)
-        file.close()
+    def language_alternate_links(
+        self, current_url: str, current_depth: int, alternates: List[str]
+    ) -> List[tuple]:
+        """
+        Returns the frontier entries of the hreflang alternates, in the accepted languages, of a page dropped because of its language.
+        The alternates are the same page in another language, so they keep the depth of the page
+        and are not collapsed onto the page as language variants.
+        """
+        canonical_urls = [
+            self.url_index.add(alternate, collapse_languages=False)
+            for alternate in alternates
+        ]
+        return [
+            (url, current_depth, current_url)
+            for url in canonical_urls
+            if url and self.url_filter.allowed(url)
+        ]
 
-    @mt.extract_monitor_resources
-    def crawl_website(self, root_url: str):
+    def open_frontier(
+        self, root_urls: List[str], frontier_file: str = None
+    ) -> CrawlFrontier:
         """
-        Recursively crawls websites starting from a root URL to the specified depth, saving content and metadata.
+        Opens a crawl frontier, resuming it or seeding it with the root URLs.
 
         Parameters:
-        - root_url (str): The starting point URL for the crawl.
+        - root_urls (List[str]): The starting point URLs for the crawl.
+        - frontier_file (str): The file of the frontier, if not provided the frontier is kept in memory.
 
         Returns:
-        - The process ID of the crawl operation.
+        - The CrawlFrontier of the crawl.
         """
-        pid = os.getpid()
-
-        queue = [(root_url, 0)]
-        visited = set()
+        if frontier_file and not self.continue_from_before:
+            remove_frontier(frontier_file)
+        frontier = CrawlFrontier(
+            frontier_file, best_first=self.crawl_strategy == "best_first"
+        )
+        if not frontier.is_empty():
+            resumed = frontier.resume()
+            # already in the shared visited set, but never fetched
+            self.resumed_urls.update(resumed)
+            self.logger.info(
+                f"resuming frontier {frontier_file}: {len(frontier)} pending, {len(resumed)} were in progress"
+            )
+            return frontier
 
         if (
             os.path.exists(os.path.join(self.metadata_path, "dataset.json"))
-            and self.continue_from_before
-        ):
+            or d_ut.metadata_log_paths(self.metadata_path, "dataset.json")
+        ) and self.continue_from_before:
             # use this only if you are SURE you want to skip already visited ROOT websites.
             dataset = d_ut.GetExtraction(
                 self.metadata_path, "dataset.json"
             ).get_extraction
-            visited = set([url_data["url"] for url_data in dataset]) - set([root_url])
+            frontier.push(
+                [
+                    (url_data["url"], 0, None)
+                    for url_data in dataset
+                    if url_data["url"] not in root_urls
+                ],
+                state=CrawlFrontier.DONE,
+            )
+        frontier.push([(root_url, 0, None) for root_url in root_urls])
+        if self.sitemap_discovery:
+            for root_url in root_urls:
+                self.seed_from_sitemaps(frontier, root_url)
+        return frontier
+
+    def seed_from_sitemaps(self, frontier: CrawlFrontier, root_url: str) -> Dict:
+        """
+        Seeds the frontier with the pages listed in the sitemaps of the host of a root URL.
+
+        The pages are seeded at the depth of their path below the directory of the root URL (at
+        least 1), so they are fetched without fetching the intermediate pages that link to them
+        and are expanded like the pages reached through links. Pages whose lastmod
+        did not change since they were last fetched are marked as skipped in the frontier, so
+        they are not fetched even if a link to them is found.
+
+        Parameters:
+        - frontier (CrawlFrontier): The frontier of the crawl.
+        - root_url (str): The root URL whose sitemaps are read.
+
+        Returns:
+        - A dictionary with the number of pages seeded, unchanged and out of scope (another host, outside the root url directory, deeper than depth or filtered out).
+        """
+        stats = {"seeded": 0, "unchanged": 0, "out_of_scope": 0}
+        seeds, unchanged = [], []
+        for sitemap_url in self.url_filter.sitemaps(root_url):
+            if len(seeds) >= self.sitemap_max_urls:
+                break
+            for loc, lastmod in s_ut.iter_sitemap(
+                sitemap_url,
+                timeout=(self.connect_timeout, self.read_timeout),
+                logger=self.logger,
+            ):
+                if len(seeds) >= self.sitemap_max_urls:
+                    break
+                depth = s_ut.sitemap_depth(root_url, loc)
+                if depth is None or depth > self.depth:
+                    stats["out_of_scope"] += 1
+                    continue
+                url = self.url_index.add(loc)
+                if not url:
+                    continue  # already in the frontier, or a language variant of a known page
+                if not self.url_filter.allowed(url):
+                    stats["out_of_scope"] += 1
+                elif self.sitemap_state.unchanged(url, lastmod):
+                    unchanged.append((url, max(depth, 1), root_url))
+                else:
+                    seeds.append((url, max(depth, 1), root_url))
+        frontier.push(unchanged, state=CrawlFrontier.SKIPPED)
+        stats["unchanged"] = len(unchanged)
+        stats["seeded"] = frontier.push(seeds)
+        self.logger.info(f"{root_url}: sitemap discovery {stats}")
+        self.sitemap_stats = stats
+        return stats
+
+    @property
+    def shared_frontier_file(self) -> str:
+        return os.path.join(
+            self.frontier_path or self.metadata_path, "shared_frontier.sqlite"
+        )
+
+    @mt.extract_monitor_resources
+    def crawl_website(self, root_url: str):
+        """
+        Recursively crawls websites starting from a root URL to the specified depth, saving content and metadata.
+
+        Parameters:
+        - root_url (str): The starting point URL for the crawl.
+
+        Returns:
+        - The process ID of the crawl operation.
+        """
+        pid = os.getpid()
+        self.url_index = e_ut.CanonicalUrlIndex(self.preferred_languages)
+        self.url_index.add(root_url)
+        self.incremental_stats = {"not_modified": 0, "changed": 0, "unchanged": 0}
+        if self.near_duplicate_threshold:
+            self.simhash_index = SimHashIndex(self.near_duplicate_threshold)
+        self.relevance.reset()
+        self.domain_budget.reset()
+        if self.language_gate is not None:
+            self.language_gate.reset()
+        frontier = self.open_frontier(
+            [root_url],
+            (
+                os.path.join(self.frontier_path, f"{misc.hash_value(root_url)}.sqlite")
+                if self.frontier_path
+                else None
+            ),
+        )
 
         colour = random.choice(["red", "green", "blue", "yellow", "white"])
         short_url = misc.truncate_url(root_url)
         pbar = tqdm(
-            total=len(queue),
+            total=len(frontier),
             desc=f"pid: {pid}: Crwlng Url {short_url} ",
             colour=colour,
         )
-        while queue:
-            current_url, current_depth = queue.pop(0)  # FIFO queue
+        if self.async_mode:
+            asyncio.run(self.crawl_frontier_async(frontier, pbar))
+        else:
+            self.crawl_frontier(frontier, pbar)
+        pbar.close()
+        frontier.close()
+        self.logger.info(f"{root_url}: fetches avoided by url canonicalization {self.url_index.stats}")
+        self.logger.info(f"{root_url}: circuit breaker {self.circuit_breaker.stats()}")
+        self.logger.info(f"{root_url}: url filter {self.url_filter.stats}")
+        self.logger.info(
+            f"{root_url}: {self.crawl_strategy} yield {self.relevance.stats}, domain budget {self.domain_budget.stats()}"
+        )
+        return pid
 
-            if current_url in visited or current_depth > self.depth:
-                pbar.update(1)
-                self.logger.debug(
-                    f"{current_url} already visited, or depth out of reach"
-                )
+    @mt.extract_monitor_resources
+    def crawl_shared_frontier(self, worker_name: str):
+        """
+        Crawls pages from the frontier shared by all the pool workers until no page is left.
 
-                continue
-            visited.add(current_url)
-            request_data = self.get_content(current_url)
-            if self.content_path:
-                request_string_data = e_ut.get_string_content(
-                    request_data["content"],
-                    request_data["status"],
-                    request_data["type"],
-                )
-                self.save_content_cleaned("", current_url, request_string_data)
-            self.save_meta(current_url, request_data["status"], request_data["type"])
+        Parameters:
+        - worker_name (str): The name of the worker, used in the progress bar and in the extraction report.
 
-            result = self.fetch_links(current_url, request_data)
-            if not result["status"] or result["type"] == "pdf":
-                pbar.update(1)
-            if result["status"] and result["type"] == "webpage":
-                pbar.update(1)
-                new_links = [
-                    link
-                    for link in result["urls"]
-                    if link not in visited and current_depth < self.depth
-                ]  # questa lista si svuota se tutti gli url dentro il parent sono stati già visitati, il resto è lasciato li dove sono <3
-                for link in new_links:
-                    queue.append((link, current_depth + 1))
-                    pbar.total += 1
+        Returns:
+        - The process ID of the crawl operation.
+        """
+        pid = os.getpid()
+        frontier = CrawlFrontier(
+            self.shared_frontier_file, best_first=self.crawl_strategy == "best_first"
+        )
+        # one budget per host for all the workers, in the hosts table of the frontier
+        self.domain_budget.share(frontier)
+        if self.language_gate is not None:
+            # the language verdicts of the hosts are learned by all the workers together
+            self.language_gate.share(frontier)
+        if self.near_duplicate_threshold:
+            # the pages fetched by the other workers are compared too
+            self.simhash_index = SharedSimHashIndex(
+                self.shared_frontier_file, self.near_duplicate_threshold
+            )
 
+        colour = random.choice(["red", "green", "blue", "yellow", "white"])
+        pbar = tqdm(
+            total=0,
+            desc=f"pid: {pid}: Crwlng {worker_name} ",
+            colour=colour,
+        )
+        if self.async_mode:
+            asyncio.run(self.crawl_frontier_async(frontier, pbar, shared=True))
+        else:
+            self.crawl_frontier(frontier, pbar, shared=True)
         pbar.close()
+        frontier.close()
+        if self.near_duplicate_threshold:
+            self.simhash_index.close()
+        self.logger.info(f"{worker_name}: fetches avoided by url canonicalization {self.url_index.stats}")
         return pid
 
+    def already_fetched(self, url: str, depth: int) -> bool:
+        """
+        Records the URL in the shared visited set and tells whether another worker already fetched it.
+
+        The root urls (depth 0) are always fetched, otherwise a root reached by another crawl at its
+        maximum depth would never be expanded. So are the URLs put back in the queue by
+        CrawlFrontier.resume, recorded in the set by the killed crawl before being fetched.
+
+        Parameters:
+        - url (str): The URL about to be fetched.
+        - depth (int): The depth of the URL in the crawl.
+
+        Returns:
+        - True if the fetch should be skipped.
+        """
+        if self.visited_set is None:
+            return False
+        if url in self.resumed_urls:
+            # left in progress by a killed crawl: recorded in the set before its fetch completed
+            self.resumed_urls.discard(url)
+            self.visited_set.add(url)
+            return False
+        return not self.visited_set.add(url) and depth > 0
+
+    def skip_fetch(self, url: str, depth: int) -> bool:
+        """
+        Tells whether a URL taken from the frontier is skipped, because another worker already
+        fetched it, because all the pages of its host were in languages not accepted or because
+        its host has used its page or time budget. The budget is checked last, since an allowed
+        URL is charged to it.
+        """
+        if self.already_fetched(url, depth):
+            return True
+        if (
+            self.language_gate is not None
+            and depth > 0
+            and not self.language_gate.allow(url)
+        ):
+            return True
+        return not self.domain_budget.allow(url)
+
+    def crawl_deadline(self) -> float:
+        """
+        Returns the time at which a crawl starting now must stop, or None without a site_time_budget.
+        """
+        if not self.site_time_budget:
+            return None
+        return time.time() + self.site_time_budget
+
+    def frontier_pop_kwargs(self, shared: bool) -> Dict:
+        """
+        Returns the per-host politeness arguments of CrawlFrontier.pop, used only when the frontier is shared.
+        """
+        if not shared:
+            return {}
+        return {
+            "max_per_host": self.max_concurrency_per_host,
+            "host_delay": self.politeness_delay,
+        }
+
+    @staticmethod
+    def frontier_state(request_data: Dict) -> str:
+        """
+        Returns the frontier state of a processed page: DONE, SKIPPED for a near-duplicate or a page in a language not accepted, FAILED otherwise.
+        """
+        if request_data["status"]:
+            return CrawlFrontier.DONE
+        if request_data.get("near_duplicate_of") or request_data.get(
+            "language_out_of_scope"
+        ):
+            return CrawlFrontier.SKIPPED
+        return CrawlFrontier.FAILED
+
+    def record_queue_depth(self, frontier: CrawlFrontier, pbar: tqdm, in_flight: int = 0):
+        """
+        Updates the frontier depth gauges of the crawl metrics, every QUEUE_DEPTH_SAMPLE_PAGES pages
+        since counting the pending pages is a query on the frontier.
+
+        Parameters:
+        - frontier (CrawlFrontier): The frontier of the crawl.
+        - pbar (tqdm): The progress bar of the crawl, counting the processed pages.
+        - in_flight (int): The number of requests in flight (async mode).
+        """
+        self.metrics.set("in_flight", in_flight)
+        if pbar.n % m_ut.QUEUE_DEPTH_SAMPLE_PAGES == 1:
+            pending = len(frontier)
+            self.metrics.set("frontier_pending", pending)
+            self.metrics.observe(
+                "frontier_pending_pages", pending, buckets=m_ut.QUEUE_BUCKETS
+            )
+
+    def crawl_frontier(self, frontier: CrawlFrontier, pbar: tqdm, shared: bool = False):
+        """
+        Drains the crawl frontier one page at a time.
+
+        Parameters:
+        - frontier (CrawlFrontier): The frontier of the crawl, updated in place with the discovered links.
+        - pbar (tqdm): The progress bar of the crawl.
+        - shared (bool): Whether the frontier is shared with other workers.
+        """
+        pop_kwargs = self.frontier_pop_kwargs(shared)
+        deadline = self.crawl_deadline()
+        while True:
+            if deadline and time.time() > deadline:
+                self.logger.warning(
+                    f"time budget exhausted, {len(frontier)} pages left in the frontier"
+                )
+                break
+            entry = frontier.pop(**pop_kwargs)  # FIFO queue
+            if entry is None:
+                if not frontier.has_work():
+                    break
+                time.sleep(0.1)  # the pending hosts are busy in other workers
+                continue
+            current_url, current_depth, parent_url = entry
+            if self.skip_fetch(current_url, current_depth):
+                frontier.complete(current_url, CrawlFrontier.SKIPPED)
+                pbar.update(1)
+                continue
+            started_at = time.time()
+            request_data = self.get_content(current_url)
+            self.domain_budget.record(current_url, started_at)
+            new_links = self.process_page(
+                current_url, current_depth, parent_url, request_data
+            )
+            added = frontier.complete(
+                current_url, self.frontier_state(request_data), new_links
+            )  # i link già presenti nella frontiera vengono ignorati <3
+            pbar.update(1)
+            pbar.total += added
+            self.record_queue_depth(frontier, pbar)
+
+    async def crawl_frontier_async(
+        self, frontier: CrawlFrontier, pbar: tqdm, shared: bool = False
+    ):
+        """
+        Drains the crawl frontier with the asyncio engine, keeping up to max_concurrency requests in flight.
+
+        The global and per-host limits are enforced by the aiohttp connector, pages are
+        processed in completion order so the crawl is breadth-first only approximately.
+
+        Parameters:
+        - frontier (CrawlFrontier): The frontier of the crawl, updated in place with the discovered links.
+        - pbar (tqdm): The progress bar of the crawl.
+        - shared (bool): Whether the frontier is shared with other workers.
+        """
+
+        async def fetch(url: str, depth: int, parent: str):
+            started_at = time.time()
+            request_data = await self.get_content_async(session, url)
+            self.domain_budget.record(url, started_at)
+            # robots.txt of the hosts of the links, so fetch_links does not block the loop
+            links = list(request_data.get("language_alternates") or [])
+            if request_data["status"] and request_data["type"] == "webpage":
+                links += [urljoin(url, href) for href, _ in request_data["content"]["links"]]
+            await self.url_filter.fetch_robots_async(session, links)
+            return url, depth, parent, request_data
+
+        pop_kwargs = self.frontier_pop_kwargs(shared)
+        deadline = self.crawl_deadline()
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.max_concurrency_per_host,
+            ssl=False,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=self.connect_timeout, sock_read=self.read_timeout
+        )
+        in_flight = set()
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=timeout
+        ) as session:
+            while True:
+                out_of_time = deadline and time.time() > deadline
+                if out_of_time and not in_flight:
+                    self.logger.warning(
+                        f"time budget exhausted, {len(frontier)} pages left in the frontier"
+                    )
+                    break
+                # keep a bounded backlog of tasks waiting on the connector
+                while not out_of_time and len(in_flight) < 2 * self.max_concurrency:
+                    entry = frontier.pop(**pop_kwargs)
+                    if entry is None:
+                        break
+                    if self.skip_fetch(entry[0], entry[1]):
+                        frontier.complete(entry[0], CrawlFrontier.SKIPPED)
+                        pbar.update(1)
+                        continue
+                    in_flight.add(asyncio.create_task(fetch(*entry)))
+                if not in_flight:
+                    if not frontier.has_work():
+                        break
+                    await asyncio.sleep(0.1)  # the pending hosts are busy in other workers
+                    continue
+                done, in_flight = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    current_url, current_depth, parent_url, request_data = (
+                        task.result()
+                    )
+                    new_links = self.process_page(
+                        current_url, current_depth, parent_url, request_data
+                    )
+                    added = frontier.complete(
+                        current_url, self.frontier_state(request_data), new_links
+                    )
+                    pbar.update(1)
+                    pbar.total += added
+                    self.record_queue_depth(frontier, pbar, len(in_flight))
+
     def crawl_websites_pool(self, root_urls: List[str]) -> ProcessPool:
         """
         Manages a pool of processes for crawling multiple websites in parallel, based on the configured number of threads.
+        With shared_frontier every worker pulls pages of any root url from the same frontier, otherwise each root url is crawled by one worker.
+        The metadata logs written by the workers are compacted into dataset.json at the end.
 
         Parameters:
         - root_urls (List[str]): A list of root URLs to start crawling from.
         """
 
         pool = ProcessPool(ncpus=self.n_threads, id="INIT")
-        pool.map(self.crawl_website, root_urls)
+        if self.shared_frontier:
+            self.open_frontier(root_urls, self.shared_frontier_file).close()
+            pool.map(
+                self.crawl_shared_frontier,
+                [f"shared-frontier-worker-{n}" for n in range(self.n_threads)],
+            )
+        else:
+            pool.map(self.crawl_website, root_urls)
+        started_at = time.time()
+        d_ut.compact_metadata_logs(
+            self.metadata_path,
+            "dataset.json",
+            key="url" if self.http_cache is not None else None,
+        )
+        self.metrics.observe("compaction_seconds", time.time() - started_at)
+        if self.visited_set is not None:
+            self.logger.info(f"shared visited set: {self.visited_set.stats()}")
 
         return pool
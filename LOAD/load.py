@@ -11,7 +11,8 @@ from typing import List
 from tqdm import tqdm
 from typing import Dict
 import src.utils.misc as msc
-from langchain.text_splitter import CharacterTextSplitter
+from src.utils.pipeline_utils.token_splitter import TokenSplitter
+from src.utils.pipeline_utils.chunk_store import ChunkStore
 
 
 class Loader:
@@ -39,13 +40,14 @@ class Loader:
         self.client = client
         self.mutation_client = mutation_client
         self.visited = []
-        self.splitter = CharacterTextSplitter.from_tiktoken_encoder(
+        self.splitter = TokenSplitter(
             "cl100k_base",
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separator=separator,
         )
         self.embeddings = embeddings
+        self.chunk_stores = {}
         if not os.path.exists(root):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="path not found"
@@ -86,8 +88,17 @@ class Loader:
             }
             self.add_new_metadata(new_meta)
             return
-        with open(chunk_data["path"]) as ptc_data:
-            chunk = json.load(ptc_data)
+        full_content = None
+        if chunk_data.get("storage") == "arrow":
+            # the path of a chunk in a ChunkStore is the folder of the store
+            if chunk_data["path"] not in self.chunk_stores:
+                self.chunk_stores[chunk_data["path"]] = ChunkStore(chunk_data["path"])
+            store = self.chunk_stores[chunk_data["path"]]
+            chunk = store.chunk(chunk_data["unique_code"])
+            full_content = store.document(chunk["full_document_id"])["content"]
+        else:
+            with open(chunk_data["path"]) as ptc_data:
+                chunk = json.load(ptc_data)
         content_hash = msc.hash_value(chunk["chunk"])
         if content_hash in self.visited:
             print(f"skip hash {content_hash}")
@@ -112,6 +123,7 @@ class Loader:
             mutation_client=self.mutation_client,
             splitter=self.splitter,
             embeddings=self.embeddings,
+            full_content=full_content,
         )
         if "status" in generated_questions[0]:
             if generated_questions[0]["status"] == "<NOQUESTION>":
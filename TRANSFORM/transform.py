@@ -1,9 +1,10 @@
 from langchain_community.document_loaders.pdf import PyPDFLoader
 from langchain_core.documents import Document
 from langchain_community.document_loaders.html_bs import BSHTMLLoader
-from langchain.text_splitter import CharacterTextSplitter
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 import json
 import os
+import tempfile
 from typing import List, Dict
 import tiktoken
 from pathos.pools import ProcessPool
@@ -11,7 +12,18 @@ from tqdm import tqdm
 import random
 
 from src.utils.pipeline_utils import transform_utils as t_ut
+from src.utils.pipeline_utils import html_utils as h_ut
+from src.utils.pipeline_utils import archive as a_ut
+from src.utils.pipeline_utils.ngram_language import NgramLanguageIdentifier
+from src.utils.pipeline_utils.language_cache import LanguageVerdictCache
+from src.utils.pipeline_utils.token_splitter import TokenSplitter
+from src.utils.pipeline_utils.chunk_store import (
+    ChunkStore,
+    STORAGE_FORMATS,
+    document_records,
+)
 from src.utils.decorator import monitoring_transform as mt
+from src.utils.dataset import utils as d_ut
 from src.utils import misc as misc
 import warnings
 from transformers import Pipeline
@@ -36,6 +48,8 @@ class ParsePdf:
         accepted_languages: List[str] = None,
         logger=None,
         total_lenght: int = None,
+        language_detector: str = "langdetect",
+        storage_format: str = "json",
     ) -> None:
         self.logger = logger
         self.transform_report = transform_report
@@ -44,14 +58,29 @@ class ParsePdf:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.separator = separator
-        self.splitter = CharacterTextSplitter.from_tiktoken_encoder(
-            "cl100k_base",
+        # one encoding per document, the chunks come with their token counts
+        self.splitter = TokenSplitter(
+            self.tiktoken_encoder,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separator=separator,
         )
         self.accepted_languages = accepted_languages
         self.pipeline = pipeline
+        if language_detector not in t_ut.LANGUAGE_DETECTORS:
+            raise Exception(
+                f"rilevatore di lingua non supportato: {language_detector}, usa uno tra {t_ut.LANGUAGE_DETECTORS}"
+            )
+        if language_detector == "transformer" and pipeline is None:
+            raise Exception(
+                "il rilevatore di lingua 'transformer' richiede una pipeline o un LanguageTaggerClient"
+            )
+        self.language_detector = language_detector
+        self.ngram_identifier = (
+            NgramLanguageIdentifier(accepted_languages)
+            if language_detector == "ngram"
+            else None
+        )
 
         self.transform_landing_zone = transform_landing_zone
         self.total_lenght = total_lenght
@@ -73,29 +102,55 @@ class ParsePdf:
             self.transform_landing_zone, self.full_pdf_landing_zone
         )
         os.makedirs(self.transform_landing_zone_full_pdf, exist_ok=True)
+        if storage_format not in STORAGE_FORMATS:
+            raise Exception(
+                f"formato di salvataggio non supportato: {storage_format}, usa uno tra {STORAGE_FORMATS}"
+            )
+        # documents and chunks in Arrow shards instead of one JSON file each
+        self.chunk_store = (
+            ChunkStore(self.transform_landing_zone_pdf)
+            if storage_format == "arrow"
+            else None
+        )
         # self.visited = list(set([hash_.split("c_")[0] for hash_ in os.listdir(self.transform_landing_zone_pdf)]))
-        tr_path = os.path.join(self.transform_report, "transform_dataset.json")
-        if os.path.exists(tr_path):
-            with open(tr_path, "r") as f:
-                visited_data = json.load(f)
-            self.visited = [v["hash_url"] for v in visited_data]
-        else:
-            self.visited = []
+        # content hash transformed last for every url, from the compacted report and the
+        # worker ledgers not yet compacted (None if the crawl was not incremental)
+        self.visited = {
+            v["hash_url"]: v.get("content_hash")
+            for v in d_ut.read_metadata(self.transform_report, "transform_dataset.json")
+        }
 
     @mt.tranform_monitor_resources
     def load_pdf(self, pdf_data: Dict) -> List[Dict]:
         pdf_data_hash = pdf_data["hash_url"]
-        if pdf_data_hash in self.visited:
+        if (
+            pdf_data_hash in self.visited
+            and self.visited[pdf_data_hash] == pdf_data.get("content_hash")
+        ):
             print(f"skipping hash: {pdf_data_hash}")
             return [{"status_transform": False, "detail": "already present"}]
         path = pdf_data["path"]
-        loader = PyPDFLoader(path)
-        loaded_pdf = [l.page_content for l in loader.load_and_split() if l]
+        if "archive_offset" in pdf_data:
+            # replay the archived response, PyPDFLoader needs a file
+            record = a_ut.read_record(path, pdf_data["archive_offset"])
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+                pdf_file.write(record["body"])
+            try:
+                loader = PyPDFLoader(pdf_file.name)
+                loaded_pdf = [l.page_content for l in loader.load_and_split() if l]
+            finally:
+                os.remove(pdf_file.name)
+        else:
+            loader = PyPDFLoader(path)
+            loaded_pdf = [l.page_content for l in loader.load_and_split() if l]
         if not loaded_pdf:
             return [{"status_transform": False, "detail": "empty doc"}]
         sample = t_ut.sample_docs(text=loaded_pdf, k=10)
-        language, confidence = t_ut.democratic_language_tagger_detect_lang(
-            sample, pipeline=self.pipeline
+        language, confidence = t_ut.detect_language(
+            sample,
+            self.language_detector,
+            pipeline=self.pipeline,
+            identifier=self.ngram_identifier,
         )
         if not language in self.accepted_languages:
             return [
@@ -112,7 +167,7 @@ class ParsePdf:
         short_path = misc.truncate_url(pdf_data["path"])
 
         content = " ".join([page for page in loaded_pdf])
-        splitted_doc = self.splitter.split_text(content)
+        splitted_doc = self.splitter.split(content)
         pbar = tqdm(
             total=len(splitted_doc),
             desc=f"pid: {pid}: Splitting Url {short_path} ",
@@ -120,34 +175,45 @@ class ParsePdf:
         )
 
         full_unique_code = pdf_data["hash_url"] + "_full"
-        full_path = self.save_pdf_content(
-            {
-                **pdf_data,
-                "unique_code": full_unique_code,
-                # "token_gpt": token,
-                "language": language,
-                "confidence": confidence,
-                "content": content,
-            }
-        )
-
-        results = []
-        for n, chunk in enumerate(splitted_doc):
-
-            unique_code = pdf_data["hash_url"] + f"c_{n}"
-            token = len(self.tiktoken_encoder.encode(chunk))
-            path = self.save_pdf_chunk(
+        if self.chunk_store is not None:
+            self.chunk_store.stage(
+                *document_records(
+                    pdf_data, full_unique_code, content, splitted_doc, language, confidence
+                )
+            )
+        else:
+            full_path = self.save_pdf_content(
                 {
                     **pdf_data,
-                    "chunk": chunk,
-                    "chunk_num": n,
-                    "unique_code": unique_code,
-                    "token_gpt": token,
+                    "unique_code": full_unique_code,
+                    # "token_gpt": token,
                     "language": language,
                     "confidence": confidence,
-                    "full_document_path": full_path,
+                    "content": content,
                 }
             )
+
+        results = []
+        for n, chunk in enumerate(splitted_doc):
+
+            unique_code = pdf_data["hash_url"] + f"c_{n}"
+            if self.chunk_store is not None:
+                path = self.chunk_store.folder
+            else:
+                path = self.save_pdf_chunk(
+                    {
+                        **pdf_data,
+                        "chunk": chunk["text"],
+                        "chunk_num": n,
+                        "unique_code": unique_code,
+                        "token_gpt": chunk["token_count"],
+                        "chunk_start": chunk["start"],
+                        "chunk_end": chunk["end"],
+                        "language": language,
+                        "confidence": confidence,
+                        "full_document_path": full_path,
+                    }
+                )
             results.extend(
                 [
                     {
@@ -156,6 +222,7 @@ class ParsePdf:
                         "language": language,
                         "confidence": confidence,
                         "path": path,
+                        "storage": "arrow" if self.chunk_store is not None else "json",
                         "chunk_num": n,
                         "unique_code": unique_code,
                     }
@@ -193,6 +260,11 @@ class ParsePdf:
     def load_pdf_pool(self, pdf_file_paths) -> ProcessPool:
         pool = ProcessPool(ncpus=self.n_threads, id="INIT")
         pool.map(self.load_pdf, pdf_file_paths)
+        d_ut.compact_metadata_logs(self.transform_report, "transform_dataset.json")
+        if self.chunk_store is not None:
+            counts = self.chunk_store.compact()
+            if self.logger is not None:
+                self.logger.info(f"chunk store: {counts}")
 
         return pool
 
@@ -212,6 +284,11 @@ class ParseHtml:
         logger=None,
         accepted_languages: List[str] = None,
         total_lenght: int = None,
+        language_detector: str = "langdetect",
+        language_cache_path: str = None,
+        language_cache_min_documents: int = 5,
+        language_cache_recheck_rate: float = 0.1,
+        storage_format: str = "json",
     ) -> None:
         self.logger = logger
         self.transform_report = transform_report
@@ -220,14 +297,29 @@ class ParseHtml:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.separator = separator
-        self.splitter = CharacterTextSplitter.from_tiktoken_encoder(
-            "cl100k_base",
+        # one encoding per document, the chunks come with their token counts
+        self.splitter = TokenSplitter(
+            self.tiktoken_encoder,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separator=separator,
         )
         self.pipeline = pipeline
         self.accepted_languages = accepted_languages
+        if language_detector not in t_ut.LANGUAGE_DETECTORS:
+            raise Exception(
+                f"rilevatore di lingua non supportato: {language_detector}, usa uno tra {t_ut.LANGUAGE_DETECTORS}"
+            )
+        if language_detector == "transformer" and pipeline is None:
+            raise Exception(
+                "il rilevatore di lingua 'transformer' richiede una pipeline o un LanguageTaggerClient"
+            )
+        self.language_detector = language_detector
+        self.ngram_identifier = (
+            NgramLanguageIdentifier(accepted_languages)
+            if language_detector == "ngram"
+            else None
+        )
         self.transform_landing_zone = transform_landing_zone
         self.total_lenght = total_lenght
         if not transform_landing_zone:
@@ -249,28 +341,64 @@ class ParseHtml:
             self.transform_landing_zone, self.full_html_landing_zone
         )
         os.makedirs(self.transform_landing_zone_full_html, exist_ok=True)
+        if storage_format not in STORAGE_FORMATS:
+            raise Exception(
+                f"formato di salvataggio non supportato: {storage_format}, usa uno tra {STORAGE_FORMATS}"
+            )
+        # documents and chunks in Arrow shards instead of one JSON file each
+        self.chunk_store = (
+            ChunkStore(self.transform_landing_zone_html)
+            if storage_format == "arrow"
+            else None
+        )
+        # language verdicts per host and path prefix, shared by the workers
+        self.language_cache = (
+            LanguageVerdictCache(
+                os.path.join(self.transform_landing_zone, language_cache_path),
+                min_documents=language_cache_min_documents,
+                recheck_rate=language_cache_recheck_rate,
+            )
+            if language_cache_path
+            else None
+        )
 
-        tr_path = os.path.join(self.transform_report, "transform_dataset.json")
-        if os.path.exists(tr_path):
-            with open(tr_path, "r") as f:
-                visited_data = json.load(f)
-            self.visited = [v["hash_url"] for v in visited_data]
-        else:
-            self.visited = []
+        # content hash transformed last for every url, from the compacted report and the
+        # worker ledgers not yet compacted (None if the crawl was not incremental)
+        self.visited = {
+            v["hash_url"]: v.get("content_hash")
+            for v in d_ut.read_metadata(self.transform_report, "transform_dataset.json")
+        }
 
     @mt.tranform_monitor_resources
     def load_html(self, html_data: Dict) -> List[Document]:
         html_data_hash = html_data["hash_url"]
-        if html_data_hash in self.visited:
+        if (
+            html_data_hash in self.visited
+            and self.visited[html_data_hash] == html_data.get("content_hash")
+        ):
             print(f"skipping hash: {html_data_hash}")
             return [{"status_transform": False, "detail": "already present"}]
         path = html_data["path"]
         try:
-            loader = BSHTMLLoader(path, open_encoding="utf8")
+            if "archive_offset" in html_data:
+                # replay the archived response, same split as the text saved by the crawler
+                record = a_ut.read_record(path, html_data["archive_offset"])
+                pages = RecursiveCharacterTextSplitter().split_text(
+                    h_ut.parse_html(record["body"])["text"]
+                )
+            elif os.path.exists(h_ut.text_path(path)):
+                # cleaned text saved by the crawler, same split as BSHTMLLoader.load_and_split
+                with open(h_ut.text_path(path), "r", encoding="utf8") as text_file:
+                    pages = RecursiveCharacterTextSplitter().split_text(
+                        text_file.read()
+                    )
+            else:
+                loader = BSHTMLLoader(path, open_encoding="utf8")
+                pages = [l.page_content for l in loader.load_and_split()]
             loaded_html = [
-                re.sub(r"\s+", " ", re.sub(r"\n\s*\n", " ", l.page_content))
-                for l in loader.load_and_split()
-                if l
+                re.sub(r"\s+", " ", re.sub(r"\n\s*\n", " ", page))
+                for page in pages
+                if page
             ]
             # re.sub(r"(\n\s*)+\n+", "\n\n", sourceFileContents)
 
@@ -280,18 +408,37 @@ class ParseHtml:
         if len(loaded_html) < cut:
             if len(" ".join([l for l in loaded_html])) < 100:
                 return [{"status_transform": False, "detail": "too short html"}]
-        try:
-            sample = t_ut.sample_docs(text=loaded_html, n_phrases=10, k=cut)
-            language, confidence = t_ut.democratic_language_tagger_detect_lang(
-                text=sample, pipeline=self.pipeline
-            )
-        except:
-            return [
-                {
-                    "status_transform": False,
-                    "detail": "uknown error in lang detetion",
-                }
-            ]
+        url = html_data.get("url") or html_data.get("current_url")
+        cached, cache_outcome = (
+            self.language_cache.lookup(url)
+            if self.language_cache is not None and url
+            else (None, None)
+        )
+        # the outcome of the cache travels with the results, summed by load_html_pool
+        cache_info = {"language_cache": cache_outcome} if cache_outcome else {}
+        if cached:
+            language, confidence = cached
+        else:
+            try:
+                sample = t_ut.sample_docs(text=loaded_html, n_phrases=10, k=cut)
+                language, confidence = t_ut.detect_language(
+                    sample,
+                    self.language_detector,
+                    pipeline=self.pipeline,
+                    identifier=self.ngram_identifier,
+                )
+            except:
+                return [
+                    {
+                        "status_transform": False,
+                        "detail": "uknown error in lang detetion",
+                        **cache_info,
+                    }
+                ]
+            if self.language_cache is not None and url:
+                cache_info["language_drift"] = self.language_cache.record(
+                    url, language, confidence
+                )
         if not language in self.accepted_languages:
             return [
                 {
@@ -299,6 +446,7 @@ class ParseHtml:
                     "detail": "language not in scope",
                     "language": language,
                     "confidence": confidence,
+                    **cache_info,
                 }
             ]
         colour = random.choice(["red", "green", "blue", "yellow", "white"])
@@ -306,7 +454,7 @@ class ParseHtml:
         short_url = misc.truncate_url(html_data["path"])
 
         content = " ".join(loaded_html)
-        loaded_html_splitted = self.splitter.split_text(content)
+        loaded_html_splitted = self.splitter.split(content)
         pbar = tqdm(
             total=len(loaded_html_splitted),
             desc=f"pid: {pid}: Splitting Url {short_url} ",
@@ -314,32 +462,49 @@ class ParseHtml:
         )
 
         full_unique_code = html_data["hash_url"]
-        full_path = self.save_html_content(
-            {
-                **html_data,
-                "unique_code": full_unique_code,
-                # "token_gpt": token,
-                "language": language,
-                "confidence": confidence,
-                "content": content,
-            }
-        )
-
-        results = []
-        for n, chunk in enumerate(loaded_html_splitted):
-            unique_code = html_data["hash_url"] + f"c_{n}"
-
-            path = self.save_html_chunk(
+        if self.chunk_store is not None:
+            self.chunk_store.stage(
+                *document_records(
+                    html_data,
+                    full_unique_code,
+                    content,
+                    loaded_html_splitted,
+                    language,
+                    confidence,
+                )
+            )
+        else:
+            full_path = self.save_html_content(
                 {
                     **html_data,
-                    "chunk": chunk,
-                    "unique_code": unique_code,
-                    "token_gpt": len(self.tiktoken_encoder.encode(chunk)),
+                    "unique_code": full_unique_code,
+                    # "token_gpt": token,
                     "language": language,
                     "confidence": confidence,
-                    "full_document_path": full_path,
+                    "content": content,
                 }
             )
+
+        results = []
+        for n, chunk in enumerate(loaded_html_splitted):
+            unique_code = html_data["hash_url"] + f"c_{n}"
+
+            if self.chunk_store is not None:
+                path = self.chunk_store.folder
+            else:
+                path = self.save_html_chunk(
+                    {
+                        **html_data,
+                        "chunk": chunk["text"],
+                        "unique_code": unique_code,
+                        "token_gpt": chunk["token_count"],
+                        "chunk_start": chunk["start"],
+                        "chunk_end": chunk["end"],
+                        "language": language,
+                        "confidence": confidence,
+                        "full_document_path": full_path,
+                    }
+                )
             results.extend(
                 [
                     {
@@ -348,8 +513,10 @@ class ParseHtml:
                         "language": language,
                         "confidence": confidence,
                         "path": path,
+                        "storage": "arrow" if self.chunk_store is not None else "json",
                         "chunk_num": n,
                         "unique_code": unique_code,
+                        **cache_info,
                     }
                 ]
             )
@@ -386,5 +553,13 @@ class ParseHtml:
 
     def load_html_pool(self, html_file_data) -> ProcessPool:
         pool = ProcessPool(ncpus=self.n_threads, id="INIT")
-        pool.map(self.load_html, html_file_data)
+        results = pool.map(self.load_html, html_file_data)
+        d_ut.compact_metadata_logs(self.transform_report, "transform_dataset.json")
+        if self.chunk_store is not None:
+            counts = self.chunk_store.compact()
+            if self.logger is not None:
+                self.logger.info(f"chunk store: {counts}")
+        if self.language_cache is not None and self.logger is not None:
+            counts = LanguageVerdictCache.count_results(results)
+            self.logger.info(f"language verdict cache: {self.language_cache.stats(counts)}")
         return pool
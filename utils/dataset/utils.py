@@ -1,11 +1,128 @@
 import os
 import json
-from typing import List, Dict
+import glob
+import portalocker
+from typing import List, Dict, Iterator
 from fastapi import status, HTTPException
 
 # TODO rinominare il file come dataset_extraction o qualcosa di simile
 
 
+def metadata_log_path(landing_zone_path: str, dataset: str, pid: int) -> str:
+    """
+    Returns the path of the append-only JSONL log a worker writes the records of `dataset` to.
+    """
+    stem = os.path.splitext(dataset)[0]
+    return os.path.join(landing_zone_path, f"{stem}_{pid}.jsonl")
+
+
+def metadata_log_paths(landing_zone_path: str, dataset: str) -> List[str]:
+    """
+    Returns the paths of all the worker logs of `dataset`, sorted by name.
+    """
+    stem = os.path.splitext(dataset)[0]
+    return sorted(glob.glob(os.path.join(landing_zone_path, f"{stem}_*.jsonl")))
+
+
+def append_jsonl(path: str, records: List[Dict]) -> None:
+    """
+    Appends the records to a JSONL file with a single write, so a batch is never interleaved with other writers.
+    """
+    lines = "".join(
+        json.dumps(record, ensure_ascii=False) + "\n" for record in records
+    )
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(lines)
+        file.flush()
+
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    """
+    Reads the records of a JSONL file, skipping a truncated last line left by a killed writer.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def unique_records(records: List[Dict], key: str = None) -> List[Dict]:
+    """
+    Removes duplicated records keeping the order of first appearance.
+
+    With a key, the records sharing the same value of that field are duplicates too and the last one wins.
+    """
+    if key is not None:
+        latest = {}
+        for record in records:
+            latest[record.get(key)] = record
+        return list(latest.values())
+    seen = set()
+    unique = []
+    for record in records:
+        key = json.dumps(record, sort_keys=True, ensure_ascii=False)
+        if key not in seen:
+            seen.add(key)
+            unique.append(record)
+    return unique
+
+
+def read_metadata(landing_zone_path: str, dataset: str = "dataset.json") -> List[Dict]:
+    """
+    Reads the records of `dataset`, merging the compacted JSON file with the worker logs not yet compacted.
+    """
+    records = []
+    dataset_path = os.path.join(landing_zone_path, dataset)
+    if os.path.exists(dataset_path):
+        with open(dataset_path, "r", encoding="utf-8") as file:
+            records = json.load(file)
+    log_paths = metadata_log_paths(landing_zone_path, dataset)
+    if not log_paths:
+        return records
+    for log_path in log_paths:
+        records.extend(read_jsonl(log_path))
+    return unique_records(records)
+
+
+def compact_metadata_logs(
+    landing_zone_path: str, dataset: str = "dataset.json", key: str = None
+) -> int:
+    """
+    Merges the worker JSONL logs into the deduplicated `dataset` JSON file and removes the merged logs.
+
+    Args:
+        landing_zone_path (str): The folder containing the dataset and its logs.
+        dataset (str): The name of the compacted dataset file.
+        key (str): The field identifying a record, if given only the latest record of each value is kept (see unique_records).
+
+    Returns:
+        The number of records in the compacted dataset.
+    """
+    dataset_path = os.path.join(landing_zone_path, dataset)
+    log_paths = metadata_log_paths(landing_zone_path, dataset)
+    with portalocker.Lock(dataset_path + ".lock", "a+", timeout=60):
+        records = []
+        if os.path.exists(dataset_path):
+            with open(dataset_path, "r", encoding="utf-8") as file:
+                try:
+                    records = json.load(file)
+                except json.JSONDecodeError:
+                    records = []
+        for log_path in log_paths:
+            records.extend(read_jsonl(log_path))
+        records = unique_records(records, key)
+
+        tmp_path = dataset_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(records, file, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, dataset_path)
+        for log_path in log_paths:
+            os.remove(log_path)
+    return len(records)
+
+
 class GetExtraction:  # TODO non usare get, mettere un nome più parlante
     """
     Provides functionalities to extract and manage data from a dataset.
@@ -22,7 +139,9 @@ class GetExtraction:  # TODO non usare get, mettere un nome più parlante
         self.dataset = dataset
         self.html_dataset = []
         self.pdf_dataset = []
-        if not os.path.exists(os.path.join(self.landing_zone_path, self.dataset)):
+        if not os.path.exists(
+            os.path.join(self.landing_zone_path, self.dataset)
+        ) and not metadata_log_paths(self.landing_zone_path, self.dataset):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="path to dataset not found",
@@ -31,15 +150,9 @@ class GetExtraction:  # TODO non usare get, mettere un nome più parlante
     @property
     def get_extraction(self) -> List[Dict]:
         """
-        Retrieves the full dataset as a list of dictionaries.
+        Retrieves the full dataset as a list of dictionaries, merging the compacted file with the worker logs not yet compacted.
         """
-        with open(
-            os.path.join(self.landing_zone_path, self.dataset), "r"
-        ) as extraction_dataset_data:
-            extraction_dataset = json.load(extraction_dataset_data)
-        extraction_dataset_data.close()
-
-        return extraction_dataset
+        return read_metadata(self.landing_zone_path, self.dataset)
 
     @property
     def get_pdf_paths(self):
@@ -3,7 +3,6 @@ from memory_profiler import memory_usage
 import psutil
 import os
 import json
-from src.utils.dataset.utils import GetExtraction
 import portalocker
 
 
@@ -11,6 +10,9 @@ def extract_monitor_resources(func):
     """
     A decorator that wraps a function to monitor and log its resource usage.
 
+    The statistics come from the in-process crawl metrics of the crawler (reset when the
+    function starts), the dataset is not read again.
+
     Args:
         func: The function to wrap.
 
@@ -20,13 +22,19 @@ def extract_monitor_resources(func):
 
     def wrapper(*args, **kwargs):
         config = args[0].__dict__
+        crawl_metrics = config["metrics"]
+        crawl_metrics.reset()
+        crawl_metrics.start()
         timestamp_start = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
         start_time = time.time()
         pid = os.getpid()
         # peak_memory_before = memory_usage(
         #     -1, interval=0.1, timeout=1, multiprocess=True
         # )
-        result = func(*args, **kwargs)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            crawl_metrics.stop()
         timestamp_end = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
         # peak_memory_after = memory_usage(-1, interval=0.1, timeout=1, multiprocess=True)
         end_time = time.time()
@@ -43,28 +51,24 @@ def extract_monitor_resources(func):
             "Timestamp_end": timestamp_end,
             "root_urls": args[1],
             "pid": pid,
+            # one entry per run: root_urls is the worker name with a shared frontier
+            "run_id": f"{crawl_metrics.started_at}-{pid}",
         }
 
         metrics = {
             "Execution Time (seconds)": execution_time,
-            # "Peak Memory Usage (MB)": peak_memory_usage,
-            # "CPU Usage (%)": cpu_usage,
+            "Peak Memory Usage (MB)": crawl_metrics.gauge("peak_rss_mb"),
+            "CPU Usage (%)": crawl_metrics.gauge("cpu_percent"),
             **additional_info,
         }
-        dataset = GetExtraction(
-            **{
-                "landing_zone_path": os.path.join(config["metadata_path"]),
-                "dataset": "dataset.json",
-            }
-        )
-        extraction = dataset.get_extraction
 
         dataset_info = {
-            "total": len(extraction),
-            "number_of_htmls": len(dataset.get_html_dataset),
-            "number_of_pdfs": len(dataset.get_pdf_dataset),
-            "number_of_OK": len([i for i in extraction if i["status"] == True]),
-            "number_of_KO": len([i for i in extraction if i["status"] == False]),
+            "total": crawl_metrics.total("records"),
+            "number_of_htmls": crawl_metrics.total("records", type="webpage"),
+            "number_of_pdfs": crawl_metrics.total("records", type="pdf"),
+            "number_of_OK": crawl_metrics.total("records", status="ok"),
+            "number_of_KO": crawl_metrics.total("records", status="ko"),
+            "number_of_near_duplicates": crawl_metrics.total("near_duplicates"),
         }
         dump = {
             **dataset_info,
@@ -74,6 +78,32 @@ def extract_monitor_resources(func):
                 "depth": config["depth"],
             },
         }
+        dump["fetches_avoided_by_canonicalization"] = config["url_index"].stats
+        if config.get("visited_set") is not None:
+            dump["duplicate_fetches_avoided"] = config["visited_set"].stats()[
+                "duplicate_fetches_avoided"
+            ]
+        dump["focused_crawl"] = {
+            "strategy": config["crawl_strategy"],
+            **config["relevance"].stats,
+            **config["domain_budget"].stats(),
+        }
+        if config.get("sitemap_stats") is not None:
+            dump["sitemap_discovery"] = config["sitemap_stats"]
+        if config.get("language_gate") is not None:
+            dump["language_gate"] = {
+                **config["language_gate"].stats,
+                "host_verdicts": config["language_gate"].verdicts(),
+            }
+        if config.get("simhash_index") is not None:
+            dump["near_duplicates"] = config["simhash_index"].stats
+        if config.get("http_cache") is not None:
+            dump["incremental_recrawl"] = config["incremental_stats"]
+        snapshot = crawl_metrics.snapshot()
+        dump["crawl_metrics"] = {
+            "counters": snapshot["counters"],
+            "histograms": snapshot["histograms"],
+        }
         er = config["extracton_report"]
 
         with portalocker.Lock(
@@ -85,7 +115,7 @@ def extract_monitor_resources(func):
             except json.JSONDecodeError:
                 existing_data = []
 
-            if dump["root_urls"] not in [D["root_urls"] for D in existing_data]:
+            if dump["run_id"] not in [D.get("run_id") for D in existing_data]:
                 existing_data.append(dump)
 
             file.seek(0)
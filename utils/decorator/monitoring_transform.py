@@ -2,14 +2,16 @@ import time
 from memory_profiler import memory_usage
 import psutil
 import os
-import json
-import portalocker
+from src.utils.dataset import utils as d_ut
 
 
 def tranform_monitor_resources(func):
     """
     A decorator that wraps a function to monitor and log its resource usage.
 
+    The records of all the results of a call are appended at once to the JSONL ledger of the
+    worker, merged into transform_dataset.json by d_ut.compact_metadata_logs.
+
     Args:
         func: The function to wrap.
 
@@ -29,6 +31,7 @@ def tranform_monitor_resources(func):
         end_time = time.time()
 
         execution_time = end_time - start_time
+        dumps = []
         for result in results:
             if result["detail"] == "already present":
                 return result
@@ -47,24 +50,12 @@ def tranform_monitor_resources(func):
                 **additional_info,
             }
             dump = {**additional_info, **metrics, **args[1], **result}
+            dumps.append(dump)
 
-            er = config["transform_report"]
-
-            with portalocker.Lock(
-                os.path.join(er, f"transform_dataset.json"), "a+", timeout=2
-            ) as file:
-                file.seek(0)
-                try:
-                    existing_data = json.load(file)
-                except json.JSONDecodeError:
-                    existing_data = []
-
-                existing_data.append(dump)
-
-                file.seek(0)
-                file.truncate()
-                json.dump(existing_data, file, indent=4, ensure_ascii=False)
-            file.close()
+        er = config["transform_report"]
+        d_ut.append_jsonl(
+            d_ut.metadata_log_path(er, "transform_dataset.json", pid), dumps
+        )
         return results
 
     return wrapper
@@ -1,5 +1,7 @@
 import hashlib
 import os
+import time
+from typing import Dict, List
 from transformers import pipeline
 import psutil
 
@@ -43,18 +45,130 @@ def truncate_url(url, max_length=30):
     return truncated
 
 
-def initialize_language_tagger_model():
-    if not os.path.exists("src/utils/pipeline_utils/LTM"):
-        pipe = pipeline(
-            "text-classification", model="papluca/xlm-roberta-base-language-detection"
-        )
-        pipe.save_pretrained("src/utils/pipeline_utils/LTM")
-    else:
+LANGUAGE_TAGGER_MODEL = "papluca/xlm-roberta-base-language-detection"
+LANGUAGE_TAGGER_PATH = "src/utils/pipeline_utils/LTM"
+LANGUAGE_TAGGER_ONNX_PATH = "src/utils/pipeline_utils/LTM_onnx_int8"
+LANGUAGE_TAGGER_ONNX_FILE = "model_quantized.onnx"
+
+
+def initialize_language_tagger_model(backend: str = "transformers"):
+    """
+    Loads the language tagger pipeline, downloading and saving the model the first time.
 
-        pipe = pipeline("text-classification", model="src/utils/pipeline_utils/LTM")
+    Args:
+        backend (str): 'transformers' (full precision PyTorch model) or 'onnx' (int8 dynamically
+            quantized ONNX Runtime model for CPU, exported from the saved model the first time).
+            Both return a text-classification pipeline with the same top_k/truncation arguments.
+
+    Returns:
+        The text-classification pipeline.
+    """
+    if backend not in ("transformers", "onnx"):
+        raise Exception(
+            f"backend del language tagger non supportato: {backend}, usa 'transformers' o 'onnx'"
+        )
+    if not os.path.exists(LANGUAGE_TAGGER_PATH):
+        pipe = pipeline("text-classification", model=LANGUAGE_TAGGER_MODEL)
+        pipe.save_pretrained(LANGUAGE_TAGGER_PATH)
+    elif backend == "transformers":
+        pipe = pipeline("text-classification", model=LANGUAGE_TAGGER_PATH)
+    if backend == "onnx":
+        return initialize_onnx_language_tagger_model()
     return pipe
 
 
+def initialize_onnx_language_tagger_model():
+    """
+    Loads the int8 quantized ONNX version of the saved language tagger, exporting and quantizing it the first time.
+    """
+    # optimum[onnxruntime] is needed only by this backend
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    if not os.path.exists(
+        os.path.join(LANGUAGE_TAGGER_ONNX_PATH, LANGUAGE_TAGGER_ONNX_FILE)
+    ):
+        exported = ORTModelForSequenceClassification.from_pretrained(
+            LANGUAGE_TAGGER_PATH, export=True
+        )
+        # dynamic quantization: int8 weights, activations quantized at run time
+        ORTQuantizer.from_pretrained(exported).quantize(
+            save_dir=LANGUAGE_TAGGER_ONNX_PATH,
+            quantization_config=AutoQuantizationConfig.avx2(
+                is_static=False, per_channel=False
+            ),
+        )
+        AutoTokenizer.from_pretrained(LANGUAGE_TAGGER_PATH).save_pretrained(
+            LANGUAGE_TAGGER_ONNX_PATH
+        )
+    model = ORTModelForSequenceClassification.from_pretrained(
+        LANGUAGE_TAGGER_ONNX_PATH, file_name=LANGUAGE_TAGGER_ONNX_FILE
+    )
+    tokenizer = AutoTokenizer.from_pretrained(LANGUAGE_TAGGER_ONNX_PATH)
+    return pipeline("text-classification", model=model, tokenizer=tokenizer)
+
+
+def top_labels(output) -> List[Dict]:
+    """
+    Returns the labels of every phrase from the output of a text-classification pipeline called on a list of phrases.
+
+    With top_k the pipeline returns one list of labels per phrase, without it (or with some
+    versions of transformers when top_k is 1) one label dictionary per phrase: both shapes are
+    reduced to one list of labels, the best first, per phrase.
+    """
+    return [item if isinstance(item, list) else [item] for item in output]
+
+
+def language_tagger_parity(reference, candidate, texts: List[str], top_k: int = 1) -> Dict:
+    """
+    Compares the labels of two language tagger pipelines (e.g. the transformers and the onnx backend) on a held-out sample.
+
+    Args:
+        reference: The reference pipeline.
+        candidate: The pipeline compared to the reference.
+        texts (List[str]): The held-out phrases.
+        top_k (int): The number of labels compared per phrase.
+
+    Returns:
+        A dictionary with the share of phrases with the same top label, the maximum score
+        difference of the top label, the seconds each pipeline took and the speedup of the candidate.
+    """
+    timings = {}
+    outputs = {}
+    for name, pipe in [("reference", reference), ("candidate", candidate)]:
+        start = time.time()
+        outputs[name] = top_labels(pipe(texts, top_k=top_k, truncation=True))
+        timings[f"{name}_seconds"] = time.time() - start
+    same_label = [
+        r[0]["label"] == c[0]["label"]
+        for r, c in zip(outputs["reference"], outputs["candidate"])
+    ]
+    score_differences = [
+        abs(r[0]["score"] - c[0]["score"])
+        for r, c, same in zip(outputs["reference"], outputs["candidate"], same_label)
+        if same
+    ]
+    return {
+        "texts": len(texts),
+        "label_agreement": sum(same_label) / len(texts) if texts else 1.0,
+        "max_score_difference": max(score_differences, default=0.0),
+        "mismatches": [
+            (text, r[0]["label"], c[0]["label"])
+            for text, r, c, same in zip(
+                texts, outputs["reference"], outputs["candidate"], same_label
+            )
+            if not same
+        ],
+        **timings,
+        "speedup": (
+            timings["reference_seconds"] / timings["candidate_seconds"]
+            if timings["candidate_seconds"]
+            else None
+        ),
+    }
+
+
 def kill_subprocesses():
     # Get the current process ID
     current_process = psutil.Process()
@@ -0,0 +1,208 @@
+import os
+import json
+import glob
+import time
+import uuid
+import zlib
+from typing import Dict, Iterator
+
+SEGMENT_MAX_BYTES = 1024 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ArchiveWriter:
+    """
+    Writes the fetched responses to append-only, gzip compressed WARC segments.
+
+    Every record (WARC header, HTTP status line and headers, body) is its own gzip member,
+    so a record can be decompressed alone starting from its offset. Each process writes its
+    own segments, named <prefix>-<pid>-<n>.warc.gz, and records the offset of every record
+    in the JSONL index next to the segment (<segment>.idx).
+    """
+
+    def __init__(
+        self, folder: str, prefix: str = "crawl", segment_max_bytes: int = SEGMENT_MAX_BYTES
+    ) -> None:
+        self.folder = folder
+        self.prefix = prefix
+        self.segment_max_bytes = segment_max_bytes
+        self._pid = None
+        self._segment_number = 0
+        self._file = None
+        self._index = None
+        self.segment_path = None
+        os.makedirs(folder, exist_ok=True)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_file"] = state["_index"] = state["_pid"] = None
+        return state
+
+    def _open_segment(self) -> None:
+        self.close()
+        self._pid = os.getpid()
+        while True:
+            self.segment_path = os.path.join(
+                self.folder,
+                f"{self.prefix}-{self._pid}-{self._segment_number:05d}.warc.gz",
+            )
+            if not os.path.exists(self.segment_path):
+                break
+            self._segment_number += 1  # full segment, or written by another run with the same pid
+        self._file = open(self.segment_path, "ab")
+        self._index = open(self.segment_path + ".idx", "a", encoding="utf-8")
+
+    def append(
+        self,
+        url: str,
+        status_code: int,
+        reason: str,
+        headers: Dict,
+        body,
+    ) -> Dict:
+        """
+        Appends a response record.
+
+        Args:
+            url (str): The fetched URL.
+            status_code (int): The HTTP status code.
+            reason (str): The HTTP reason phrase.
+            headers (Dict): The response headers.
+            body (bytes or str): The response body, or the path of a file containing it.
+
+        Returns:
+            The location of the record, a dictionary with the keys 'path', 'offset' and 'length'.
+        """
+        if (
+            self._file is None
+            or self._pid != os.getpid()
+            or self._file.tell() >= self.segment_max_bytes
+        ):
+            self._open_segment()
+
+        fetch_time = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        http_head = f"HTTP/1.1 {status_code} {reason or ''}\r\n" + "".join(
+            f"{key}: {value}\r\n"
+            for key, value in headers.items()
+            if key.lower() not in ("content-encoding", "transfer-encoding")
+        )
+        http_head = (http_head + "\r\n").encode("utf-8", errors="replace")
+        body_length = os.path.getsize(body) if isinstance(body, str) else len(body)
+        warc_head = (
+            "WARC/1.0\r\n"
+            "WARC-Type: response\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"WARC-Date: {fetch_time}\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            "Content-Type: application/http; msgtype=response\r\n"
+            f"Content-Length: {len(http_head) + body_length}\r\n\r\n"
+        ).encode("utf-8")
+
+        offset = self._file.tell()
+        compressor = zlib.compressobj(wbits=31)  # one gzip member per record
+        self._file.write(compressor.compress(warc_head + http_head))
+        if isinstance(body, str):
+            with open(body, "rb") as body_file:
+                for chunk in iter(lambda: body_file.read(READ_CHUNK_SIZE), b""):
+                    self._file.write(compressor.compress(chunk))
+        else:
+            self._file.write(compressor.compress(body))
+        self._file.write(compressor.compress(b"\r\n\r\n"))
+        self._file.write(compressor.flush())
+        self._file.flush()
+        location = {
+            "path": self.segment_path,
+            "offset": offset,
+            "length": self._file.tell() - offset,
+        }
+        self._index.write(
+            json.dumps(
+                {
+                    "url": url,
+                    "status": status_code,
+                    "content_type": headers.get("content-type"),
+                    "fetch_time": fetch_time,
+                    **location,
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+        )
+        self._index.flush()
+        return location
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._index.close()
+            self._file = self._index = None
+
+
+def parse_record(record: bytes) -> Dict:
+    """
+    Splits a decompressed WARC response record into its parts.
+
+    Returns:
+        A dictionary with the keys 'url', 'fetch_time', 'status', 'headers' and 'body'.
+    """
+    warc_head, payload = record.split(b"\r\n\r\n", 1)
+    warc_headers = dict(
+        line.split(": ", 1) for line in warc_head.decode("utf-8").split("\r\n")[1:]
+    )
+    payload = payload[: int(warc_headers["Content-Length"])]
+    http_head, body = payload.split(b"\r\n\r\n", 1)
+    status_line, *header_lines = http_head.decode("utf-8", errors="replace").split("\r\n")
+    return {
+        "url": warc_headers["WARC-Target-URI"],
+        "fetch_time": warc_headers["WARC-Date"],
+        "status": int(status_line.split(" ")[1]),
+        "headers": {
+            key.lower(): value
+            for key, value in (line.split(": ", 1) for line in header_lines if line)
+        },
+        "body": body,
+    }
+
+
+def read_record(path: str, offset: int) -> Dict:
+    """
+    Reads the record starting at offset in a segment, decompressing only its gzip member.
+
+    Args:
+        path (str): The segment path.
+        offset (int): The offset of the record, as returned by ArchiveWriter.append.
+
+    Returns:
+        The record, see parse_record.
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    parts = []
+    with open(path, "rb") as segment:
+        segment.seek(offset)
+        while not decompressor.eof:
+            chunk = segment.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise EOFError(f"truncated record at {path}:{offset}")
+            parts.append(decompressor.decompress(chunk))
+    return parse_record(b"".join(parts))
+
+
+def iter_index(folder: str) -> Iterator[Dict]:
+    """
+    Yields the index entries of all the segments in the archive folder.
+    """
+    for index_path in sorted(glob.glob(os.path.join(folder, "*.warc.gz.idx"))):
+        with open(index_path, "r", encoding="utf-8") as index:
+            for line in index:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # last line of a killed writer
+
+
+def iter_records(folder: str) -> Iterator[Dict]:
+    """
+    Replays all the records of the archive folder in index order.
+    """
+    for entry in iter_index(folder):
+        yield read_record(entry["path"], entry["offset"])
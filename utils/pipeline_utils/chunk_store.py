@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import pyarrow as pa
+from typing import Dict, List, Tuple
+
+STORAGE_FORMATS = ("json", "arrow")
+
+DOCUMENTS = "documents"
+CHUNKS = "chunks"
+SCHEMAS = {
+    DOCUMENTS: pa.schema(
+        [
+            ("unique_code", pa.string()),
+            ("hash_url", pa.string()),
+            ("language", pa.string()),
+            ("confidence", pa.float64()),
+            ("content", pa.large_string()),
+            ("metadata", pa.string()),  # the crawl metadata of the document, as JSON
+        ]
+    ),
+    CHUNKS: pa.schema(
+        [
+            ("unique_code", pa.string()),
+            ("document", pa.string()),
+            ("chunk_num", pa.int32()),
+            ("chunk", pa.large_string()),
+            ("token_gpt", pa.int32()),
+            ("chunk_start", pa.int64()),
+            ("chunk_end", pa.int64()),
+        ]
+    ),
+}
+STAGING_FOLDER = "staging"
+
+
+def document_records(
+    data: Dict,
+    unique_code: str,
+    content: str,
+    chunks: List[Dict],
+    language: str,
+    confidence: float,
+) -> Tuple[Dict, List[Dict]]:
+    """
+    Builds the rows of a transformed document and of its chunks.
+
+    Args:
+        data (Dict): The crawl metadata of the document.
+        unique_code (str): The id of the full document.
+        content (str): The text of the document.
+        chunks (List[Dict]): The chunks returned by TokenSplitter.split.
+        language (str): The language of the document.
+        confidence (float): The confidence of the language.
+
+    Returns:
+        The document row and the chunk rows, chunk n having id hash_url + 'c_n' as the JSON chunk files.
+    """
+    document = {
+        "unique_code": unique_code,
+        "hash_url": data["hash_url"],
+        "language": language,
+        "confidence": confidence,
+        "content": content,
+        "metadata": data,
+    }
+    rows = [
+        {
+            "unique_code": data["hash_url"] + f"c_{n}",
+            "document": unique_code,
+            "chunk_num": n,
+            "chunk": chunk["text"],
+            "token_gpt": chunk["token_count"],
+            "chunk_start": chunk["start"],
+            "chunk_end": chunk["end"],
+        }
+        for n, chunk in enumerate(chunks)
+    ]
+    return document, rows
+
+
+def write_table(path: str, table: pa.Table) -> None:
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+class ChunkStore:
+    """
+    Columnar store of the transformed documents and chunks, in Arrow IPC files.
+
+    Each worker stages every document with its chunks as two small Arrow files in a folder of its
+    own; compact (run once the pool is done) merges the staged files of every worker into shards
+    of up to `shard_max_rows` rows and records the (shard, row) of every id in a SQLite index.
+    The index is the source of truth: the rows of a re-staged document, and of its previous
+    chunks, stay in the older shards but are no longer returned by get or table.
+    The metadata of a document is stored once, next to its content, and not in every chunk.
+    Shards are read memory-mapped, without copying the columns.
+    """
+
+    def __init__(self, folder: str, shard_max_rows: int = 100000) -> None:
+        """
+        Initializes the store.
+
+        Args:
+            folder (str): The folder of the shards, the index and the staging area.
+            shard_max_rows (int): The maximum number of rows of a shard.
+        """
+        self.folder = folder
+        self.shard_max_rows = shard_max_rows
+        os.makedirs(os.path.join(folder, STAGING_FOLDER), exist_ok=True)
+        self._connection = None
+        self._shards = {}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                os.path.join(self.folder, "index.sqlite"),
+                timeout=60,
+                isolation_level=None,
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_index (
+                    id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    shard TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    document TEXT,
+                    PRIMARY KEY (kind, id)
+                )
+                """
+            )
+            columns = [
+                column[1]
+                for column in self._connection.execute("PRAGMA table_info(chunk_index)")
+            ]
+            if "document" not in columns:
+                self._connection.execute("ALTER TABLE chunk_index ADD COLUMN document TEXT")
+                self._backfill_documents()
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS chunk_index_document ON chunk_index (kind, document)"
+            )
+        return self._connection
+
+    def _backfill_documents(self) -> None:
+        """
+        Fills the document of the chunks indexed before the column existed, from their shards.
+        """
+        shards = [
+            row[0]
+            for row in self._connection.execute(
+                "SELECT DISTINCT shard FROM chunk_index WHERE kind = ?", (CHUNKS,)
+            )
+        ]
+        self._connection.execute("BEGIN IMMEDIATE")
+        for name in shards:
+            part = self.shard(name)
+            self._connection.executemany(
+                "UPDATE chunk_index SET document = ? WHERE kind = ? AND id = ? AND shard = ?",
+                [
+                    (document, CHUNKS, unique_code, name)
+                    for unique_code, document in zip(
+                        part.column("unique_code").to_pylist(),
+                        part.column("document").to_pylist(),
+                    )
+                ],
+            )
+        self._connection.execute("COMMIT")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_shards"] = {}
+        return state
+
+    def stage(self, document: Dict, chunks: List[Dict]) -> None:
+        """
+        Stages a document and its chunks from a worker, they are readable after compact.
+
+        Args:
+            document (Dict): The document, with the keys of SCHEMAS[DOCUMENTS] ('metadata' as a dictionary).
+            chunks (List[Dict]): The chunks, with the keys of SCHEMAS[CHUNKS].
+        """
+        folder = os.path.join(self.folder, STAGING_FOLDER, str(os.getpid()))
+        os.makedirs(folder, exist_ok=True)
+        document = {
+            **document,
+            "confidence": float(document["confidence"]),
+            "metadata": json.dumps(document["metadata"], ensure_ascii=False),
+        }
+        for kind, rows in [(DOCUMENTS, [document]), (CHUNKS, chunks)]:
+            write_table(
+                os.path.join(folder, f"{document['unique_code']}.{kind}.arrow"),
+                pa.Table.from_pylist(rows, schema=SCHEMAS[kind]),
+            )
+
+    def compact(self) -> Dict:
+        """
+        Merges the staged files into per-worker shards and indexes their rows, then removes the staged files.
+
+        The chunks indexed for a re-staged document are dropped from the index first, so a
+        document re-transformed into fewer chunks does not keep resolving its old chunk ids.
+
+        Returns:
+            The number of documents and chunks compacted.
+        """
+        staging = os.path.join(self.folder, STAGING_FOLDER)
+        counts = {DOCUMENTS: 0, CHUNKS: 0}
+        connection = self.connection
+        for pid in sorted(os.listdir(staging)):
+            worker_folder = os.path.join(staging, pid)
+            names = sorted(os.listdir(worker_folder))
+            for kind in [DOCUMENTS, CHUNKS]:
+                paths = [
+                    os.path.join(worker_folder, name)
+                    for name in names
+                    if name.endswith(f".{kind}.arrow")
+                ]
+                if not paths:
+                    continue
+                table = pa.concat_tables(
+                    pa.ipc.open_file(pa.memory_map(path)).read_all() for path in paths
+                )
+                for start in range(0, table.num_rows, self.shard_max_rows):
+                    shard = f"{kind}-{pid}-{time.time_ns()}.arrow"
+                    part = table.slice(start, self.shard_max_rows)
+                    write_table(os.path.join(self.folder, shard), part)
+                    unique_codes = part.column("unique_code").to_pylist()
+                    documents = (
+                        part.column("document").to_pylist()
+                        if kind == CHUNKS
+                        else [None] * part.num_rows
+                    )
+                    connection.execute("BEGIN IMMEDIATE")
+                    if kind == DOCUMENTS:
+                        connection.executemany(
+                            "DELETE FROM chunk_index WHERE kind = ? AND document = ?",
+                            [(CHUNKS, unique_code) for unique_code in unique_codes],
+                        )
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO chunk_index (id, kind, shard, row, document) VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (unique_code, kind, shard, row, document)
+                            for row, (unique_code, document) in enumerate(
+                                zip(unique_codes, documents)
+                            )
+                        ],
+                    )
+                    connection.execute("COMMIT")
+                counts[kind] += table.num_rows
+            shutil.rmtree(worker_folder)
+        return counts
+
+    def shard(self, name: str) -> pa.Table:
+        """
+        Returns a shard, memory-mapped (zero-copy) and kept open.
+        """
+        if name not in self._shards:
+            self._shards[name] = pa.ipc.open_file(
+                pa.memory_map(os.path.join(self.folder, name))
+            ).read_all()
+        return self._shards[name]
+
+    def get(self, kind: str, unique_code: str) -> Dict:
+        row = self.connection.execute(
+            "SELECT shard, row FROM chunk_index WHERE kind = ? AND id = ?",
+            (kind, unique_code),
+        ).fetchone()
+        if row is None:
+            return None
+        return self.shard(row[0]).slice(row[1], 1).to_pylist()[0]
+
+    def document(self, unique_code: str) -> Dict:
+        """
+        Returns a full document, its metadata decoded.
+        """
+        document = self.get(DOCUMENTS, unique_code)
+        if document is not None:
+            document["metadata"] = json.loads(document["metadata"])
+        return document
+
+    def chunk(self, unique_code: str) -> Dict:
+        """
+        Returns a chunk with the metadata, language and confidence of its document, the same fields as a JSON chunk file.
+        """
+        chunk = self.get(CHUNKS, unique_code)
+        if chunk is None:
+            return None
+        document = self.get(DOCUMENTS, chunk["document"])
+        return {
+            **json.loads(document["metadata"]),
+            **chunk,
+            "language": document["language"],
+            "confidence": document["confidence"],
+            "full_document_id": chunk["document"],
+        }
+
+    def table(self, kind: str) -> pa.Table:
+        """
+        Returns the indexed rows of a kind ('documents' or 'chunks') as one table over the shards.
+
+        Superseded rows are filtered out: a shard whose rows are all indexed is returned memory-mapped
+        as is, the others are reduced to their indexed rows.
+        """
+        rows = {}
+        for name, row in self.connection.execute(
+            "SELECT shard, row FROM chunk_index WHERE kind = ? ORDER BY shard, row", (kind,)
+        ):
+            rows.setdefault(name, []).append(row)
+        shards = []
+        for name, indexed in rows.items():
+            part = self.shard(name)
+            shards.append(part if len(indexed) == part.num_rows else part.take(indexed))
+        if not shards:
+            return SCHEMAS[kind].empty_table()
+        return pa.concat_tables(shards)
+
+    def close(self) -> None:
+        self._shards = {}
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -1,16 +1,39 @@
 import requests
+import os
+import asyncio
+import aiohttp
 from urllib3.util import Retry
 from requests.adapters import HTTPAdapter
 import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from bs4 import BeautifulSoup
 from requests import Response
+from typing import Dict, List
+from src.utils.pipeline_utils.visited import url_fingerprint
+
+TRACKING_PARAMETERS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# language codes used as path segments by the multilingual portals (/it/, /en/, ...); two-letter
+# segments that are more often something else, such as /pa/ (pubblica amministrazione) or
+# /eu/ (unione europea), are left out on purpose
+LANGUAGE_SEGMENTS = frozenset(
+    "it en fr de es pt nl ro ca pl sl hr sv ru el cs sk hu bg da fi et lv lt mt ga"
+    " lb no is sq sr bs mk uk be tr ar he fa hi zh ja ko".split()
+)
+
+
+class ContentTooLargeError(Exception):
+    """
+    Raised when a response body exceeds the maximum size allowed by the crawler.
+    """
 
 
 # TODO rinomina il file python
 def requests_retry_session(
     retries: int = 5,
     backoff_factor: float = 0.5,
-    status_forcelist: tuple = (400, 401, 403, 500, 502, 503, 504, 505),
+    status_forcelist: tuple = (429, 500, 502, 503, 504, 505),
     session: requests.Session = None,
 ) -> requests.Session:
     """
@@ -21,7 +44,7 @@ def requests_retry_session(
             backoff_factor (float): The delay factor to apply between retry attempts. Default is 0.5.
             status_forcelist (tuple): A tuple of HTTP status codes that should force a retry.
                     A retry is initiated if the HTTP status code of the response is in this list.
-                    Default is a tuple of common server error codes.
+                    Default is a tuple of common server error codes, client errors such as 403 are not retried.
             session (requests.Session): An existing requests session to use. If not provided, a new session will be created.
 
     Returns:
@@ -56,35 +79,150 @@ def clean_link_lang(url):
     return cleaned_url
 
 
-def get_unique_links(links):
+def get_unique_links(links: List[str]) -> List[str]:
     """
     Filters out similar links, keeping only unique ones based on language path considerations.
 
+    Links are grouped by their language-agnostic form in a single pass, when a page exists in
+    several languages the Italian variant is kept (or the first one if there is none).
+
     Args:
         links (List[str]): The list of URLs to filter.
 
     Returns:
         A list of unique URLs after filtering.
     """
-    checked_links = {links[0].strip(): 1}
-    for link1 in links[1:]:
-        link1 = link1.strip()
-        is_similar = False
-        for link2 in checked_links:
-            if clean_link_lang(link1) == clean_link_lang(link2):
-                is_similar = True
-                break
-            if is_similar:
-                checked_links[link1] = checked_links[link2] = 0
-            else:
-                checked_links[link1] = 1
-    unique_links = [key for key, val in checked_links.items() if val == 1]
-    for link in [key for key, val in checked_links.items() if val == 0]:
-        if "/it" in link:
-            unique_links.append(link)
+    groups = {}
+    for link in links:
+        link = link.strip()
+        groups.setdefault(clean_link_lang(link), []).append(link)
+    unique_links = []
+    for variants in groups.values():
+        italian = [link for link in variants if "/it" in link]
+        unique_links.append(italian[0] if italian else variants[0])
     return unique_links
 
 
+def canonicalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that the variants of the same page compare equal.
+
+    Lowercases scheme and host, drops default ports, fragments, tracking parameters and
+    repeated slashes, and sorts the query parameters. The trailing slash of the path is kept,
+    since the relative links of a page are resolved against it.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        The canonical URL, or None if the URL is not http(s).
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    netloc = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith(TRACKING_PARAMETERS)
+        )
+    )
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_language(url: str) -> str:
+    """
+    Returns the first language segment (see LANGUAGE_SEGMENTS) of the path of a URL, lowercased, or None.
+    """
+    for segment in urlsplit(url).path.split("/"):
+        if segment.lower() in LANGUAGE_SEGMENTS:
+            return segment.lower()
+    return None
+
+
+def strip_language_segments(url: str) -> str:
+    """
+    Removes the language segments (see LANGUAGE_SEGMENTS) from the path of a URL, so the translations of a page compare equal.
+    """
+    parts = urlsplit(url)
+    path = "/".join(
+        segment
+        for segment in parts.path.split("/")
+        if segment.lower() not in LANGUAGE_SEGMENTS
+    )
+    return urlunsplit(parts._replace(path=path or "/"))
+
+
+class CanonicalUrlIndex:
+    """
+    Index of the canonical URLs met during a crawl, keyed by the fingerprint of their language-agnostic form.
+
+    The first variant of a page wins, unless a later one is in a preferred language and the
+    known one is not: links differing only by fragment, query order or language segment
+    (/en/, /it/, ...) are mapped to the indexed variant or dropped, and the distinct collapsed
+    links are counted as avoided fetches.
+    """
+
+    def __init__(self, preferred_languages: List[str] = ("it",)) -> None:
+        """
+        Initializes the index.
+
+        Args:
+            preferred_languages (List[str]): The languages whose variant of a page replaces a variant in another language. Default is Italian, as get_unique_links.
+        """
+        self.preferred_languages = {l.lower() for l in preferred_languages or ()}
+        self.keys = {}
+        self.collapsed = set()
+        self.stats = {"canonical_duplicates": 0, "language_variants": 0, "not_http": 0}
+
+    def add(self, url: str, collapse_languages: bool = True) -> str:
+        """
+        Registers a link found in a page.
+
+        Args:
+            url (str): The absolute URL of the link.
+            collapse_languages (bool): Whether a language variant of a known page is dropped. False for the links that are translations on purpose, such as the hreflang alternates, which then become the indexed variant.
+
+        Returns:
+            The canonical URL to enqueue, or None if the link is a language variant of a known page or is not http(s).
+        """
+        canonical = canonicalize_url(url)
+        if canonical is None:
+            self.stats["not_http"] += 1
+            return None
+        fingerprint = url_fingerprint(canonical)
+        key = url_fingerprint(strip_language_segments(canonical))
+        known = self.keys.setdefault(key, (fingerprint, url_language(canonical)))
+        raw_fingerprint = url_fingerprint(url)
+        if known[0] != fingerprint and (
+            not collapse_languages
+            or (
+                url_language(canonical) in self.preferred_languages
+                and known[1] not in self.preferred_languages
+            )
+        ):
+            # the variant in a preferred language becomes the indexed one
+            self.keys[key] = known = (fingerprint, url_language(canonical))
+        if known[0] == fingerprint:
+            if canonical != url and raw_fingerprint not in self.collapsed:
+                self.collapsed.add(raw_fingerprint)
+                self.stats["canonical_duplicates"] += 1
+            return canonical
+        if raw_fingerprint not in self.collapsed:
+            self.collapsed.add(raw_fingerprint)
+            self.stats["language_variants"] += 1
+        return None
+
+
 def get_string_content(soup: BeautifulSoup, status: bool, type: str) -> str:
     """
     Extracts and returns all text from a BeautifulSoup object as a single string.
@@ -131,9 +269,150 @@ def get_clean_content(soup: BeautifulSoup, status: bool, type: str) -> str:
 
 
 def get_extention(reqs: Response) -> str:
-    if "application/pdf" in reqs.headers.get("content-type"):
+    return get_extention_from_headers(reqs.headers)
+
+
+def get_extention_from_headers(headers) -> str:
+    """
+    Maps the content-type header of a response to the crawler content types.
+
+    Args:
+        headers (Mapping): The response headers (case insensitive mapping).
+
+    Returns:
+        'pdf', 'webpage' or None if the content type is not handled.
+    """
+    content_type = headers.get("content-type") or ""
+    if "application/pdf" in content_type:
         return "pdf"
-    elif "text/html" in reqs.headers.get("content-type"):
+    elif "text/html" in content_type:
         return "webpage"
     else:
         return None
+
+
+def read_limited(chunks, max_size: int) -> bytes:
+    """
+    Reads a streamed body in memory, stopping as soon as it exceeds max_size.
+
+    Args:
+        chunks (Iterable[bytes]): The chunks of the body.
+        max_size (int): The maximum size in bytes.
+
+    Returns:
+        The body as bytes.
+
+    Raises:
+        ContentTooLargeError: If the body exceeds max_size.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer.extend(chunk)
+        if len(buffer) > max_size:
+            raise ContentTooLargeError(f"body exceeds {max_size} bytes")
+    return bytes(buffer)
+
+
+def write_limited(chunks, path: str, max_size: int) -> int:
+    """
+    Writes a streamed body to disk chunk by chunk, the file appears at path only once complete.
+
+    Args:
+        chunks (Iterable[bytes]): The chunks of the body.
+        path (str): The destination file.
+        max_size (int): The maximum size in bytes.
+
+    Returns:
+        The number of bytes written.
+
+    Raises:
+        ContentTooLargeError: If the body exceeds max_size, no file is left behind.
+    """
+    size = 0
+    part_path = path + ".part"
+    try:
+        with open(part_path, "wb") as file:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise ContentTooLargeError(f"body exceeds {max_size} bytes")
+                file.write(chunk)
+        os.replace(part_path, path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return size
+
+
+async def async_read_limited(chunks, max_size: int) -> bytes:
+    """
+    Asynchronous counterpart of read_limited.
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        if len(buffer) > max_size:
+            raise ContentTooLargeError(f"body exceeds {max_size} bytes")
+    return bytes(buffer)
+
+
+async def async_write_limited(chunks, path: str, max_size: int) -> int:
+    """
+    Asynchronous counterpart of write_limited.
+    """
+    size = 0
+    part_path = path + ".part"
+    try:
+        with open(part_path, "wb") as file:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise ContentTooLargeError(f"body exceeds {max_size} bytes")
+                file.write(chunk)
+        os.replace(part_path, path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return size
+
+
+async def async_get_with_retries(
+    session: aiohttp.ClientSession,
+    url: str,
+    handle_response,
+    retries: int = 5,
+    backoff_factor: float = 0.5,
+    status_forcelist: tuple = (429, 500, 502, 503, 504, 505),
+    headers: Dict = None,
+):
+    """
+    Asynchronous GET with the same retry policy as requests_retry_session.
+
+    Args:
+        session (aiohttp.ClientSession): The session used to perform the request.
+        url (str): The URL to fetch.
+        handle_response (Callable): Coroutine called with the successful response before it is released,
+            it can stream the body or return without reading it.
+        retries (int): The number of times to retry a failed request. Default is 5.
+        backoff_factor (float): The delay factor to apply between retry attempts. Default is 0.5.
+        status_forcelist (tuple): A tuple of HTTP status codes that should force a retry.
+        headers (Dict): Additional request headers, such as the conditional request validators.
+
+    Returns:
+        The result of handle_response.
+
+    Raises:
+        aiohttp.ClientResponseError: If the last attempt returns an error status.
+    """
+    for attempt in range(retries + 1):
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status not in status_forcelist or attempt == retries:
+                    response.raise_for_status()
+                    return await handle_response(response)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            # connection errors and timeouts are retried, as the read timeouts of Retry
+            if attempt == retries:
+                raise
+        # the response is released before the backoff, so its connection goes back to the pool
+        await asyncio.sleep(backoff_factor * (2**attempt))
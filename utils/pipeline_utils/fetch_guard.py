@@ -0,0 +1,214 @@
+import sqlite3
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+PERMANENT_STATUS_CODES = (404, 410, 451)
+NEGATIVE_CACHE_TTL = 7 * 24 * 3600
+
+
+class HostCircuitBreaker:
+    """
+    Per-host circuit breaker of the crawler.
+
+    After `failure_threshold` consecutive failures (timeouts, connection errors, 5xx, 429, 403)
+    the host is opened and its URLs are skipped for `reset_timeout` seconds, then a single
+    probe request is let through: a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 300.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = {}
+        self.opened_at = {}
+        self.skipped = 0
+
+    def allow(self, url: str) -> bool:
+        """
+        Tells whether a request to the host of the URL can be sent.
+        """
+        host = urlsplit(url).netloc
+        opened_at = self.opened_at.get(host)
+        if opened_at is None:
+            return True
+        if time.time() - opened_at >= self.reset_timeout:
+            self.opened_at[host] = time.time()  # half open: one probe per reset_timeout
+            return True
+        self.skipped += 1
+        return False
+
+    def record_success(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        self.failures.pop(host, None)
+        self.opened_at.pop(host, None)
+
+    def record_failure(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        self.failures[host] = self.failures.get(host, 0) + 1
+        if self.failures[host] >= self.failure_threshold:
+            self.opened_at[host] = time.time()
+
+    def stats(self) -> Dict:
+        return {"open_hosts": sorted(self.opened_at), "skipped_requests": self.skipped}
+
+
+class NegativeCache:
+    """
+    Persistent cache of the URLs that keep failing, stored in a SQLite file shared by the crawler processes.
+
+    URLs answering with a permanent status (404, 410, 451) are failing for good. URLs rejected
+    for a reason that repeats as long as the page does not change (a content type the crawler
+    does not handle, a body larger than the size limit) are failing from the first time, the
+    others after `failure_threshold` failed fetches. These entries expire `ttl` seconds after
+    their last failure and are removed by a successful fetch; a size rejection only holds
+    while the size limit is not raised. Later runs consult the cache before sending any request.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        failure_threshold: int = 3,
+        ttl: float = NEGATIVE_CACHE_TTL,
+        max_content_size: int = None,
+    ) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            path (str): The SQLite file of the cache.
+            failure_threshold (int): The number of failed fetches, each less than `ttl` seconds after the previous one, after which a URL is failing.
+            ttl (float): Seconds after the last failure after which a non permanent entry expires.
+            max_content_size (int): The size limit of the crawler, the size rejections recorded under a lower limit are ignored.
+        """
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.ttl = ttl
+        self.max_content_size = max_content_size
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS negative_cache (
+                    url TEXT PRIMARY KEY,
+                    reason TEXT,
+                    status_code INTEGER,
+                    permanent INTEGER NOT NULL,
+                    failures INTEGER NOT NULL,
+                    last_seen REAL,
+                    deterministic INTEGER NOT NULL DEFAULT 0,
+                    max_size INTEGER
+                )
+                """
+            )
+            columns = [
+                column[1]
+                for column in self._connection.execute(
+                    "PRAGMA table_info(negative_cache)"
+                )
+            ]
+            if "deterministic" not in columns:  # cache files written before the expiry
+                self._connection.execute(
+                    "ALTER TABLE negative_cache ADD COLUMN deterministic INTEGER NOT NULL DEFAULT 0"
+                )
+                self._connection.execute(
+                    "ALTER TABLE negative_cache ADD COLUMN max_size INTEGER"
+                )
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def __contains__(self, url: str) -> bool:
+        row = self.connection.execute(
+            "SELECT permanent, deterministic, failures, last_seen, max_size FROM negative_cache WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return False
+        permanent, deterministic, failures, last_seen, max_size = row
+        if permanent:
+            return True
+        if time.time() - (last_seen or 0) >= self.ttl:
+            return False
+        if (
+            max_size is not None
+            and self.max_content_size is not None
+            and max_size < self.max_content_size
+        ):
+            return False  # rejected under a lower size limit
+        return bool(deterministic) or failures >= self.failure_threshold
+
+    def add(
+        self,
+        url: str,
+        reason: str,
+        status_code: int = None,
+        permanent: bool = False,
+        deterministic: bool = False,
+        max_size: int = None,
+    ) -> None:
+        """
+        Records a failed fetch.
+
+        Args:
+            url (str): The URL that failed.
+            reason (str): A short description of the failure.
+            status_code (int): The HTTP status code, if any.
+            permanent (bool): Whether the failure will not change on a later run.
+            deterministic (bool): Whether the failure repeats as long as the page does not change, such as an unhandled content type.
+            max_size (int): The size limit the response exceeded, for a response too large (deterministic).
+        """
+        now = time.time()
+        self.connection.execute(
+            """
+            INSERT INTO negative_cache (url, reason, status_code, permanent, failures, last_seen, deterministic, max_size)
+            VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                reason = excluded.reason,
+                status_code = excluded.status_code,
+                permanent = MAX(permanent, excluded.permanent),
+                failures = CASE WHEN last_seen < ? THEN 1 ELSE failures + 1 END,
+                last_seen = excluded.last_seen,
+                deterministic = excluded.deterministic,
+                max_size = excluded.max_size
+            """,
+            (
+                url,
+                reason,
+                status_code,
+                int(permanent),
+                now,
+                int(deterministic or max_size is not None),
+                max_size,
+                now - self.ttl,
+            ),
+        )
+
+    def record_success(self, url: str) -> None:
+        """
+        Removes a URL fetched successfully, reading before writing so the successful fetches do not take the write lock.
+        """
+        if (
+            self.connection.execute(
+                "SELECT 1 FROM negative_cache WHERE url = ?", (url,)
+            ).fetchone()
+            is not None
+        ):
+            self.remove(url)
+
+    def remove(self, url: str) -> None:
+        self.connection.execute("DELETE FROM negative_cache WHERE url = ?", (url,))
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,209 @@
+import re
+import math
+import time
+from typing import Dict, List
+from urllib.parse import urlsplit, unquote
+
+# word prefixes of the cybersecurity topic, italian and english
+DEFAULT_TOPIC_KEYWORDS = [
+    "cyber",
+    "sicurezz",
+    "secur",
+    "vulnerab",
+    "malware",
+    "ransomware",
+    "phishing",
+    "attacc",
+    "attack",
+    "minacc",
+    "threat",
+    "incident",
+    "exploit",
+    "patch",
+    "firewall",
+    "crittograf",
+    "cifratur",
+    "encrypt",
+    "cryptograph",
+    "autenticazion",
+    "authentication",
+    "password",
+    "privacy",
+    "gdpr",
+    "nis2",
+    "cve",
+    "csirt",
+    "intrusion",
+    "breach",
+    "hacker",
+    "botnet",
+    "ddos",
+    "spoofing",
+    "backdoor",
+    "rischi",
+    "risk",
+    "compliance",
+    "iso27001",
+]
+WORD_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+class RelevanceScorer:
+    """
+    Cheap local relevance model of the focused crawl.
+
+    A page is scored by the density of topic keywords (word prefixes) in its cleaned text,
+    a link by the keywords in its anchor text and URL tokens mixed with the score of the page
+    it was found in. The scores are in [0, 1] and are used as frontier priorities. The scorer
+    also counts the fetched and relevant pages, the yield of the crawl.
+    """
+
+    def __init__(
+        self,
+        keywords: List[str] = None,
+        relevance_threshold: float = 0.2,
+        anchor_weight: float = 0.5,
+        url_weight: float = 0.3,
+        parent_weight: float = 0.2,
+    ) -> None:
+        """
+        Initializes the scorer.
+
+        Args:
+            keywords (List[str]): The word prefixes of the topic. Default is DEFAULT_TOPIC_KEYWORDS.
+            relevance_threshold (float): The page score from which a page counts as relevant in the yield.
+            anchor_weight (float): Weight of the anchor text in the link priority.
+            url_weight (float): Weight of the URL tokens in the link priority.
+            parent_weight (float): Weight of the score of the parent page in the link priority.
+        """
+        keywords = DEFAULT_TOPIC_KEYWORDS if keywords is None else keywords
+        self.keywords = re.compile(
+            r"\b(?:" + "|".join(re.escape(k.lower()) for k in keywords) + r")",
+            re.UNICODE,
+        )
+        self.relevance_threshold = relevance_threshold
+        self.anchor_weight = anchor_weight
+        self.url_weight = url_weight
+        self.parent_weight = parent_weight
+        self.reset()
+
+    def reset(self) -> None:
+        self.stats = {"fetched": 0, "relevant": 0, "yield": 0.0}
+
+    def keyword_hits(self, text: str) -> int:
+        return len(self.keywords.findall(text.lower()))
+
+    def score_page(self, text: str) -> float:
+        """
+        Scores the cleaned text of a page by keyword density, saturating at about 3 hits every 100 words.
+        """
+        words = len(WORD_PATTERN.findall(text))
+        if not words:
+            return 0.0
+        density = 100 * self.keyword_hits(text) / words
+        return 1 - math.exp(-density)
+
+    def score_url(self, url: str) -> float:
+        parts = urlsplit(url)
+        tokens = " ".join(WORD_PATTERN.findall(unquote(parts.path + " " + parts.query)))
+        return 1 - math.exp(-self.keyword_hits(tokens))
+
+    def score_link(self, anchor: str, url: str, parent_score: float) -> float:
+        """
+        Computes the frontier priority of a link.
+
+        Args:
+            anchor (str): The anchor text of the link.
+            url (str): The URL of the link.
+            parent_score (float): The score of the page the link was found in.
+
+        Returns:
+            The priority, in [0, 1].
+        """
+        return (
+            self.anchor_weight * (1 - math.exp(-self.keyword_hits(anchor or "")))
+            + self.url_weight * self.score_url(url)
+            + self.parent_weight * parent_score
+        )
+
+    def record_page(self, score: float) -> None:
+        """
+        Counts a fetched page in the yield statistics.
+        """
+        self.stats["fetched"] += 1
+        self.stats["relevant"] += score >= self.relevance_threshold
+        self.stats["yield"] = self.stats["relevant"] / self.stats["fetched"]
+
+
+class DomainBudget:
+    """
+    Per-host page and time budgets of a crawl: once a host has used its budget its URLs are skipped.
+
+    A page is charged to its host when it is allowed, before the fetch, so the requests in
+    flight count against the budget. The counters are kept in memory, or in the hosts table of
+    the shared frontier once share() is called, so the workers pulling from it draw on one budget.
+    """
+
+    def __init__(self, max_pages: int = None, max_seconds: float = None) -> None:
+        self.max_pages = max_pages or None
+        self.max_seconds = max_seconds or None
+        self.reset()
+
+    def reset(self) -> None:
+        self.pages = {}
+        self.seconds = {}
+        self.skipped = 0
+        self.frontier = None
+
+    def share(self, frontier) -> None:
+        """
+        Keeps the counters in the hosts table of a shared CrawlFrontier instead of in memory.
+        """
+        self.reset()
+        self.frontier = frontier
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_pages or self.max_seconds)
+
+    def exhausted(self, host: str) -> bool:
+        return bool(
+            (self.max_pages and self.pages.get(host, 0) >= self.max_pages)
+            or (self.max_seconds and self.seconds.get(host, 0.0) >= self.max_seconds)
+        )
+
+    def allow(self, url: str) -> bool:
+        """
+        Tells whether the host of the URL still has budget left, and if so charges the page to it.
+        """
+        if not self.enabled:
+            return True
+        host = urlsplit(url).netloc
+        if self.frontier is not None:
+            allowed = self.frontier.charge_host_page(host, self.max_pages, self.max_seconds)
+        else:
+            allowed = not self.exhausted(host)
+            if allowed:
+                self.pages[host] = self.pages.get(host, 0) + 1
+        if not allowed:
+            self.skipped += 1
+        return allowed
+
+    def record(self, url: str, started_at: float) -> None:
+        """
+        Charges the duration of a fetch started at `started_at` (time.time()) to the host of the URL.
+        """
+        if not self.enabled:
+            return
+        host, seconds = urlsplit(url).netloc, time.time() - started_at
+        if self.frontier is not None:
+            self.frontier.charge_host_seconds(host, seconds)
+        else:
+            self.seconds[host] = self.seconds.get(host, 0.0) + seconds
+
+    def stats(self) -> Dict:
+        if self.frontier is not None:
+            exhausted_hosts = self.frontier.exhausted_hosts(self.max_pages, self.max_seconds)
+        else:
+            exhausted_hosts = sorted(host for host in self.pages if self.exhausted(host))
+        return {"exhausted_hosts": exhausted_hosts, "skipped_urls": self.skipped}
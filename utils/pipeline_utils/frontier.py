@@ -0,0 +1,517 @@
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class CrawlFrontier:
+    """
+    Disk-backed crawl frontier stored in a SQLite table.
+
+    Every URL is recorded once with its depth, parent and state ('pending', 'in_progress',
+    'done', 'failed' or 'skipped'). Dequeue reads the first pending row through the
+    (state, id) index, so the queue keeps FIFO order without ever shifting a list, and a
+    killed crawl can be resumed from the file with resume().
+
+    The same file can be shared by several processes: pop() with max_per_host leases the
+    host of the returned URL, so workers pulling from a shared frontier respect per-host
+    politeness while spreading the pages of a site over all of them.
+
+    With best_first the URLs are dequeued by decreasing priority (through the
+    (state, priority, id) index) instead of FIFO, for focused crawls.
+
+    A URL left in progress for more than `lease_timeout` seconds (its worker was killed) is put
+    back in the queue by has_work, so the other workers do not wait for it forever.
+
+    The hosts table also keeps the pages and seconds every host was charged and the number of its
+    pages in and out of the accepted languages, so the per-domain budgets and the language
+    verdicts of the hosts hold across all the workers of a shared frontier.
+    """
+
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(
+        self, path: str = None, best_first: bool = False, lease_timeout: float = 900.0
+    ) -> None:
+        """
+        Initializes the frontier.
+
+        Args:
+            path (str): The SQLite file of the frontier. If not provided the frontier is kept in memory.
+            best_first (bool): Whether to dequeue the URL with the highest priority first instead of the oldest one.
+            lease_timeout (float): Seconds after which a URL still in progress is considered abandoned and put back in the queue.
+        """
+        self.path = path
+        self.best_first = best_first
+        self.lease_timeout = lease_timeout
+        self._connection = None
+        self.connection
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Lazily opens the SQLite connection, so the frontier can be pickled and reopened in another process.
+        """
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path or ":memory:", timeout=60, isolation_level=None
+            )
+            if self.path:
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS frontier (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT UNIQUE NOT NULL,
+                    depth INTEGER NOT NULL,
+                    parent TEXT,
+                    state TEXT NOT NULL,
+                    updated_at REAL,
+                    host TEXT,
+                    priority REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = [
+                column[1]
+                for column in self._connection.execute("PRAGMA table_info(frontier)")
+            ]
+            if "host" not in columns:  # frontier files written before host leasing
+                self._connection.execute("ALTER TABLE frontier ADD COLUMN host TEXT")
+            if "priority" not in columns:  # frontier files written before best-first crawling
+                self._connection.execute(
+                    "ALTER TABLE frontier ADD COLUMN priority REAL NOT NULL DEFAULT 0"
+                )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS frontier_state ON frontier (state, id)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS frontier_priority ON frontier (state, priority DESC, id)"
+            )
+            # the pending URLs of a host, for the per-host lookups of pop with max_per_host
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS frontier_host ON frontier (state, host, id)"
+            )
+            if self.best_first:
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS frontier_host_priority ON frontier (state, host, priority DESC, id)"
+                )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS hosts (
+                    host TEXT PRIMARY KEY,
+                    in_flight INTEGER NOT NULL,
+                    next_allowed_at REAL NOT NULL,
+                    pages INTEGER NOT NULL DEFAULT 0,
+                    seconds REAL NOT NULL DEFAULT 0,
+                    in_scope_pages INTEGER NOT NULL DEFAULT 0,
+                    out_of_scope_pages INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            host_columns = [
+                column[1]
+                for column in self._connection.execute("PRAGMA table_info(hosts)")
+            ]
+            if "pages" not in host_columns:  # frontier files written before shared domain budgets
+                self._connection.execute(
+                    "ALTER TABLE hosts ADD COLUMN pages INTEGER NOT NULL DEFAULT 0"
+                )
+                self._connection.execute(
+                    "ALTER TABLE hosts ADD COLUMN seconds REAL NOT NULL DEFAULT 0"
+                )
+            if "in_scope_pages" not in host_columns:  # frontier files written before shared language verdicts
+                self._connection.execute(
+                    "ALTER TABLE hosts ADD COLUMN in_scope_pages INTEGER NOT NULL DEFAULT 0"
+                )
+                self._connection.execute(
+                    "ALTER TABLE hosts ADD COLUMN out_of_scope_pages INTEGER NOT NULL DEFAULT 0"
+                )
+            # every host with pending URLs has a row, also in files written before
+            self._connection.execute(
+                "INSERT OR IGNORE INTO hosts (host, in_flight, next_allowed_at) SELECT DISTINCT host, 0, 0 FROM frontier WHERE state = ?",
+                (self.PENDING,),
+            )
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def __len__(self) -> int:
+        """
+        Returns the number of URLs still pending.
+        """
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM frontier WHERE state = ?", (self.PENDING,)
+        ).fetchone()[0]
+
+    def __contains__(self, url: str) -> bool:
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM frontier WHERE url = ?", (url,)
+            ).fetchone()
+            is not None
+        )
+
+    def push(self, entries: List[Tuple], state: str = PENDING) -> int:
+        """
+        Adds the URLs not yet known to the frontier.
+
+        Args:
+            entries (List[Tuple]): The (url, depth, parent) or (url, depth, parent, priority) tuples to add.
+            state (str): The state of the new rows. Default is 'pending'.
+
+        Returns:
+            The number of URLs actually added.
+        """
+        connection = self.connection
+        before = connection.total_changes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._insert(entries, state)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return connection.total_changes - before
+
+    def _insert(self, entries: List[Tuple], state: str) -> None:
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO frontier (url, depth, parent, state, updated_at, host, priority) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    url,
+                    depth,
+                    parent,
+                    state,
+                    time.time(),
+                    urlsplit(url).netloc,
+                    priority[0] if priority else 0.0,
+                )
+                for url, depth, parent, *priority in entries
+            ],
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO hosts (host, in_flight, next_allowed_at) VALUES (?, 0, 0)",
+            {(urlsplit(url).netloc,) for url, *_ in entries},
+        )
+        # a pending URL found again through a shorter path takes the lower depth, so it is expanded
+        self.connection.executemany(
+            "UPDATE frontier SET depth = ?, parent = ? WHERE url = ? AND state = ? AND depth > ?",
+            [
+                (depth, parent, url, self.PENDING, depth)
+                for url, depth, parent, *_ in entries
+            ],
+        )
+
+    def _raise_priorities(self, entries: List[Tuple]) -> None:
+        # a pending URL found again through a better link moves up the queue
+        self.connection.executemany(
+            "UPDATE frontier SET priority = ? WHERE url = ? AND state = ? AND priority < ?",
+            [
+                (priority[0], url, self.PENDING, priority[0])
+                for url, _, _, *priority in entries
+                if priority
+            ],
+        )
+
+    def pop(
+        self, max_per_host: int = None, host_delay: float = 0.0
+    ) -> Optional[Tuple[str, int, str]]:
+        """
+        Takes the oldest (or, with best_first, the highest priority) pending URL and marks it as in progress.
+
+        Args:
+            max_per_host (int): If provided, skip the URLs whose host already has this many URLs in progress
+                and lease the host of the returned URL. Used when the frontier is shared between workers.
+            host_delay (float): Minimum number of seconds between two leases of the same host.
+
+        Returns:
+            The (url, depth, parent) tuple, or None if nothing can be taken now.
+        """
+        connection = self.connection
+        now = time.time()
+        columns = ["priority DESC", "id"] if self.best_first else ["id"]
+        order = ", ".join(f"f.{column}" for column in columns)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if max_per_host is None:
+                row = connection.execute(
+                    f"SELECT f.id, f.url, f.depth, f.parent, f.host FROM frontier f WHERE f.state = ? ORDER BY {order} LIMIT 1",
+                    (self.PENDING,),
+                ).fetchone()
+            else:
+                # the first URL of every available host, through the (state, host) indexes, so the
+                # pending URLs of the saturated hosts are never scanned
+                row = connection.execute(
+                    f"""
+                    SELECT f.id, f.url, f.depth, f.parent, f.host FROM hosts h
+                    JOIN frontier f ON f.id = (
+                        SELECT g.id FROM frontier g
+                        WHERE g.state = ? AND g.host = h.host
+                        ORDER BY {", ".join(f"g.{column}" for column in columns)} LIMIT 1
+                    )
+                    WHERE h.in_flight < ? AND h.next_allowed_at <= ?
+                    ORDER BY {order} LIMIT 1
+                    """,
+                    (self.PENDING, max_per_host, now),
+                ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE frontier SET state = ?, updated_at = ? WHERE id = ?",
+                    (self.IN_PROGRESS, now, row[0]),
+                )
+                if max_per_host is not None:
+                    connection.execute(
+                        """
+                        INSERT INTO hosts (host, in_flight, next_allowed_at) VALUES (?, 1, ?)
+                        ON CONFLICT (host) DO UPDATE SET in_flight = in_flight + 1, next_allowed_at = excluded.next_allowed_at
+                        """,
+                        (row[4], now + host_delay),
+                    )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return None if row is None else row[1:4]
+
+    def has_work(self) -> bool:
+        """
+        Returns True while some URL is pending or in progress, in this or in another process.
+        The URLs in progress for more than lease_timeout seconds are put back in the queue first.
+        """
+        if self.lease_timeout:
+            self.reclaim_stale()
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM frontier WHERE state IN (?, ?) LIMIT 1",
+                (self.PENDING, self.IN_PROGRESS),
+            ).fetchone()
+            is not None
+        )
+
+    def complete(
+        self, url: str, state: str = DONE, children: List[Tuple] = None
+    ) -> int:
+        """
+        Marks a URL as processed and enqueues its children in the same transaction.
+
+        Args:
+            url (str): The processed URL.
+            state (str): The final state of the URL, 'done', 'failed' or 'skipped'.
+            children (List[Tuple]): The (url, depth, parent) or (url, depth, parent, priority) tuples discovered in the page.
+
+        Returns:
+            The number of children actually added.
+        """
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE frontier SET state = ?, updated_at = ? WHERE url = ?",
+                (state, time.time(), url),
+            )
+            connection.execute(
+                "UPDATE hosts SET in_flight = MAX(in_flight - 1, 0) WHERE host = ?",
+                (urlsplit(url).netloc,),
+            )
+            before = connection.total_changes
+            self._insert(children or [], self.PENDING)
+            added = connection.total_changes - before
+            if self.best_first:
+                self._raise_priorities(children or [])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return added
+
+    def reclaim_stale(self) -> int:
+        """
+        Puts back in the queue the URLs in progress for more than lease_timeout seconds and releases their hosts.
+
+        Returns:
+            The number of URLs re-enqueued.
+        """
+        connection = self.connection
+        deadline = time.time() - self.lease_timeout
+        if (
+            connection.execute(
+                "SELECT 1 FROM frontier WHERE state = ? AND updated_at < ? LIMIT 1",
+                (self.IN_PROGRESS, deadline),
+            ).fetchone()
+            is None
+        ):
+            return 0
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            stale = connection.execute(
+                "SELECT host, COUNT(*) FROM frontier WHERE state = ? AND updated_at < ? GROUP BY host",
+                (self.IN_PROGRESS, deadline),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE hosts SET in_flight = MAX(in_flight - ?, 0) WHERE host = ?",
+                [(count, host) for host, count in stale],
+            )
+            reclaimed = connection.execute(
+                "UPDATE frontier SET state = ?, updated_at = ? WHERE state = ? AND updated_at < ?",
+                (self.PENDING, time.time(), self.IN_PROGRESS, deadline),
+            ).rowcount
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return reclaimed
+
+    def resume(self) -> List[str]:
+        """
+        Puts back in the queue the URLs left in progress by a killed crawl.
+
+        Returns:
+            The URLs re-enqueued.
+        """
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            urls = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT url FROM frontier WHERE state = ?", (self.IN_PROGRESS,)
+                )
+            ]
+            connection.execute("UPDATE hosts SET in_flight = 0")
+            connection.execute(
+                "UPDATE frontier SET state = ? WHERE state = ?",
+                (self.PENDING, self.IN_PROGRESS),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return urls
+
+    def charge_host_page(
+        self, host: str, max_pages: int = None, max_seconds: float = None
+    ) -> bool:
+        """
+        Charges a page to a host if it has not used its budget yet, atomically for all the workers.
+
+        Args:
+            host (str): The host of the URL about to be fetched.
+            max_pages (int): The page budget of a host (OPTIONAL).
+            max_seconds (float): The time budget of a host (OPTIONAL).
+
+        Returns:
+            True if the page was charged, False if the host has used its budget.
+        """
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR IGNORE INTO hosts (host, in_flight, next_allowed_at) VALUES (?, 0, 0)",
+                (host,),
+            )
+            charged = connection.execute(
+                """
+                UPDATE hosts SET pages = pages + 1
+                WHERE host = ? AND (? IS NULL OR pages < ?) AND (? IS NULL OR seconds < ?)
+                """,
+                (host, max_pages, max_pages, max_seconds, max_seconds),
+            ).rowcount
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return charged == 1
+
+    def charge_host_seconds(self, host: str, seconds: float) -> None:
+        """
+        Adds the duration of a fetch to the seconds charged to its host.
+        """
+        self.connection.execute(
+            "UPDATE hosts SET seconds = seconds + ? WHERE host = ?", (seconds, host)
+        )
+
+    def exhausted_hosts(self, max_pages: int = None, max_seconds: float = None) -> List[str]:
+        """
+        Returns the hosts that have used their page or time budget.
+        """
+        return [
+            row[0]
+            for row in self.connection.execute(
+                """
+                SELECT host FROM hosts
+                WHERE (? IS NOT NULL AND pages >= ?) OR (? IS NOT NULL AND seconds >= ?)
+                ORDER BY host
+                """,
+                (max_pages, max_pages, max_seconds, max_seconds),
+            )
+        ]
+
+    def record_host_language(self, host: str, in_scope: bool) -> Tuple[int, int]:
+        """
+        Counts a page of a host in or out of the accepted languages.
+
+        Returns:
+            The (in scope, out of scope) pages of the host counted so far by all the workers.
+        """
+        column = "in_scope_pages" if in_scope else "out_of_scope_pages"
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR IGNORE INTO hosts (host, in_flight, next_allowed_at) VALUES (?, 0, 0)",
+                (host,),
+            )
+            connection.execute(
+                f"UPDATE hosts SET {column} = {column} + 1 WHERE host = ?", (host,)
+            )
+            counts = connection.execute(
+                "SELECT in_scope_pages, out_of_scope_pages FROM hosts WHERE host = ?",
+                (host,),
+            ).fetchone()
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return tuple(counts)
+
+    def host_languages(self, host: str = None) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the (in scope, out of scope) pages of the hosts with at least one page counted, or of the given host only.
+        """
+        query = "SELECT host, in_scope_pages, out_of_scope_pages FROM hosts WHERE (in_scope_pages > 0 OR out_of_scope_pages > 0)"
+        rows = (
+            self.connection.execute(query + " AND host = ?", (host,))
+            if host is not None
+            else self.connection.execute(query)
+        )
+        return {host: (in_scope, out_of_scope) for host, in_scope, out_of_scope in rows}
+
+    def is_empty(self) -> bool:
+        """
+        Returns True if the frontier has never been seeded.
+        """
+        return self.connection.execute("SELECT 1 FROM frontier LIMIT 1").fetchone() is None
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def remove_frontier(path: str) -> None:
+    """
+    Removes a frontier file together with its SQLite write-ahead log.
+    """
+    for file_path in [path, path + "-wal", path + "-shm"]:
+        if os.path.exists(file_path):
+            os.remove(file_path)
@@ -0,0 +1,126 @@
+import re
+from typing import Dict
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup
+
+SKIPPED_TAGS = ("script", "style", "noscript", "template")
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+BLOCK_TAGS = set(
+    "p div br li ul ol tr td th table section article header footer nav aside main"
+    " h1 h2 h3 h4 h5 h6 pre blockquote dd dt form title".split()
+)
+
+
+def clean_text(text: str) -> str:
+    """
+    Strips every line and drops the empty ones, as get_clean_content does.
+    """
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)
+
+
+def parse_html_lxml(content: bytes) -> Dict:
+    """
+    Parses a webpage with lxml, collecting links, title and text in a single walk of the tree.
+
+    Args:
+        content (bytes): The raw html.
+
+    Returns:
+        A dictionary with the keys 'links' (list of (href, anchor text) tuples), 'title', 'text',
+        'lang' (the <html lang> attribute) and 'hreflang' (list of (language, href) alternates).
+
+    Example:
+        >>> parse_html_lxml(b"<p>Alpha <b>Bravo <i>Charlie</i> Delta</b> Echo</p>")["text"]
+        'Alpha Bravo Charlie Delta Echo'
+    """
+    root = lxml.html.fromstring(content)
+    etree.strip_elements(root, *SKIPPED_TAGS, etree.Comment, with_tail=False)
+    links, title, parts, hreflang = [], None, [], []
+    lang = root.get("lang") or root.get(XML_LANG)
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        if event == "end":
+            if element is not root and element.tail:
+                # the tail follows the whole subtree of the element, in the text of the parent
+                parts.append(element.tail)
+            continue
+        tag = element.tag if isinstance(element.tag, str) else None
+        if tag in BLOCK_TAGS:
+            parts.append("\n")
+        if tag in ("link", "a") and element.get("hreflang") and element.get("href"):
+            hreflang.append((element.get("hreflang"), element.get("href")))
+        if tag == "a" and element.get("href"):
+            links.append((element.get("href"), " ".join(element.text_content().split())))
+        elif tag == "title" and title is None:
+            title = (element.text or "").strip()
+        if element.text:
+            parts.append(element.text)
+    return {
+        "links": links,
+        "title": title,
+        "text": clean_text("".join(parts)),
+        "lang": lang,
+        "hreflang": hreflang,
+    }
+
+
+def parse_html_bs4(content: bytes, parser: str = "html.parser") -> Dict:
+    """
+    Parses a webpage with BeautifulSoup, kept for the environments without lxml.
+
+    Args:
+        content (bytes): The raw html.
+        parser (str): The BeautifulSoup parser.
+
+    Returns:
+        A dictionary with the keys 'links', 'title', 'text', 'lang' and 'hreflang', see parse_html_lxml.
+    """
+    soup = BeautifulSoup(content, parser)
+    for element in soup(list(SKIPPED_TAGS)):
+        element.decompose()
+    links = [
+        (link["href"], " ".join(link.get_text(" ").split()))
+        for link in soup.find_all("a", href=True)
+    ]
+    title = soup.title.get_text().strip() if soup.title else None
+    hreflang = [
+        (element["hreflang"], element["href"])
+        for element in soup.find_all(["link", "a"], hreflang=True, href=True)
+    ]
+    lang = (soup.html.get("lang") or soup.html.get("xml:lang")) if soup.html else None
+    return {
+        "links": links,
+        "title": title,
+        "text": clean_text(soup.get_text()),
+        "lang": lang,
+        "hreflang": hreflang,
+    }
+
+
+def parse_html(content: bytes, backend: str = "lxml") -> Dict:
+    """
+    Parses a webpage once with the selected backend.
+
+    Args:
+        content (bytes): The raw html.
+        backend (str): 'lxml' (default, C parser) or a BeautifulSoup parser name such as 'html.parser'.
+
+    Returns:
+        A dictionary with the keys 'links', 'title', 'text', 'lang' and 'hreflang', see parse_html_lxml.
+    """
+    if backend == "lxml":
+        try:
+            return parse_html_lxml(content)
+        except (etree.ParserError, ValueError):
+            # lxml refuses empty documents and some broken encodings declarations
+            return parse_html_bs4(content)
+    return parse_html_bs4(content, backend)
+
+
+def text_path(html_path: str) -> str:
+    """
+    Returns the path of the cleaned text saved next to a raw html file.
+    """
+    return re.sub(r"\.html$", "", html_path) + ".txt"
@@ -0,0 +1,169 @@
+import os
+import time
+import hashlib
+import sqlite3
+from typing import Dict
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(body) -> str:
+    """
+    Computes the SHA-256 digest of a response body.
+
+    Args:
+        body (bytes or str): The body, or the path of a file containing it.
+
+    Returns:
+        The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    if isinstance(body, str):
+        with open(body, "rb") as body_file:
+            for chunk in iter(lambda: body_file.read(READ_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        digest.update(body)
+    return digest.hexdigest()
+
+
+class HttpCache:
+    """
+    Local HTTP cache of the crawler, stored in a SQLite file shared by the crawler processes and kept across runs.
+
+    For every fetched URL it keeps the validators of the response (ETag, Last-Modified), the
+    hash of the body and where the body was stored (a file of the landing zone or an archive
+    record), so a later crawl can send a conditional request and reuse the stored body on 304.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    type TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    archive_offset INTEGER,
+                    archive_length INTEGER,
+                    fetched_at REAL
+                )
+                """
+            )
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def lookup(self, url: str) -> Dict:
+        """
+        Returns the cache entry of a URL, or None if the URL was never fetched or its stored body is gone.
+
+        Args:
+            url (str): The URL about to be fetched.
+
+        Returns:
+            A dictionary with the keys 'etag', 'last_modified', 'type', 'content_hash', 'path'
+            and 'archive' (the location of the archive record, or None).
+        """
+        row = self.connection.execute(
+            """
+            SELECT etag, last_modified, type, content_hash, path, archive_offset, archive_length
+            FROM http_cache WHERE url = ?
+            """,
+            (url,),
+        ).fetchone()
+        if row is None or not os.path.exists(row[4]):
+            return None
+        etag, last_modified, type, hash_, path, offset, length = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "type": type,
+            "content_hash": hash_,
+            "path": path,
+            "archive": (
+                None
+                if offset is None
+                else {"path": path, "offset": offset, "length": length}
+            ),
+        }
+
+    @staticmethod
+    def conditional_headers(entry: Dict) -> Dict:
+        """
+        Returns the If-None-Match/If-Modified-Since headers of a cache entry (empty without an entry or validators).
+        """
+        headers = {}
+        if entry is None:
+            return headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(
+        self,
+        url: str,
+        headers,
+        type: str,
+        body_hash: str,
+        path: str,
+        archive: Dict = None,
+    ) -> bool:
+        """
+        Records a full (200) response.
+
+        Args:
+            url (str): The fetched URL.
+            headers (Mapping): The response headers, case insensitive.
+            type (str): The crawler content type, 'pdf' or 'webpage'.
+            body_hash (str): The hash of the body, see content_hash.
+            path (str): Where the body was stored.
+            archive (Dict): The location of the archive record, if the body was archived.
+
+        Returns:
+            True if the body differs from the one of the previous fetch (or the URL is new).
+        """
+        previous = self.connection.execute(
+            "SELECT content_hash FROM http_cache WHERE url = ?", (url,)
+        ).fetchone()
+        self.connection.execute(
+            """
+            INSERT OR REPLACE INTO http_cache
+                (url, etag, last_modified, type, content_hash, path, archive_offset, archive_length, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                url,
+                headers.get("etag"),
+                headers.get("last-modified"),
+                type,
+                body_hash,
+                path,
+                archive["offset"] if archive else None,
+                archive["length"] if archive else None,
+                time.time(),
+            ),
+        )
+        return previous is None or previous[0] != body_hash
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
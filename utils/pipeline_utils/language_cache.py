@@ -0,0 +1,172 @@
+import hashlib
+import sqlite3
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+STAT_NAMES = ("hits", "misses", "rechecks", "drifts")
+
+
+def url_prefix(url: str, depth: int = 1) -> str:
+    """
+    Returns the host and the first `depth` directories of the path of a URL, e.g. 'example.gov/it' for http://example.gov/it/news/page.html.
+    """
+    parts = urlsplit(url)
+    directories = [s for s in parts.path.split("/") if s][:-1]  # the last one is the page
+    return "/".join([parts.netloc.lower()] + directories[:depth])
+
+
+class LanguageVerdictCache:
+    """
+    Language verdicts of the transform stage per host and path prefix, stored in a SQLite file shared by the pool workers and kept across runs.
+
+    A prefix becomes confident after `min_documents` consecutive documents detected in the same
+    language: its next documents take the cached verdict, except a deterministic `recheck_rate`
+    share of them that is detected again. A detection disagreeing with the verdict of the
+    prefix (a drift) resets it, so full detection is used again until the prefix is confident.
+
+    Only the verdicts are written to the file. The hits, misses, rechecks and drifts are counted
+    in memory by every process and returned with the outcome of each lookup, so the workers do
+    not take the write lock for the statistics: count_results sums them from the pool results.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        prefix_depth: int = 1,
+        min_documents: int = 5,
+        recheck_rate: float = 0.1,
+    ) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            path (str): The SQLite file of the cache.
+            prefix_depth (int): The number of path directories of the prefix (0 for the host only).
+            min_documents (int): The number of consecutive concordant documents after which a prefix is confident.
+            recheck_rate (float): The share of the documents of a confident prefix detected again.
+        """
+        self.path = path
+        self.prefix_depth = prefix_depth
+        self.min_documents = min_documents
+        self.recheck_rate = recheck_rate
+        self.counts = dict.fromkeys(STAT_NAMES, 0)
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS language_verdicts (
+                    prefix TEXT PRIMARY KEY,
+                    language TEXT,
+                    confidence REAL,
+                    streak INTEGER NOT NULL
+                )
+                """
+            )
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def count(self, name: str) -> str:
+        self.counts[name] += 1
+        return name
+
+    def recheck(self, url: str) -> bool:
+        digest = hashlib.sha256(url.encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") < self.recheck_rate * 2**32
+
+    def lookup(self, url: str) -> Tuple[Tuple[str, float], str]:
+        """
+        Looks up the verdict of the prefix of a URL.
+
+        Returns:
+            The cached (language, confidence), or None if the document has to be detected, and
+            the outcome of the lookup: 'hits', 'misses' or 'rechecks'.
+        """
+        row = self.connection.execute(
+            "SELECT language, confidence, streak FROM language_verdicts WHERE prefix = ?",
+            (url_prefix(url, self.prefix_depth),),
+        ).fetchone()
+        if row is None or row[2] < self.min_documents:
+            return None, self.count("misses")
+        if self.recheck(url):
+            return None, self.count("rechecks")
+        return (row[0], row[1]), self.count("hits")
+
+    def record(self, url: str, language: str, confidence: float) -> bool:
+        """
+        Records the language detected for a document in the verdict of its prefix.
+
+        Returns:
+            True if the detection reset a confident verdict (a drift).
+        """
+        prefix = url_prefix(url, self.prefix_depth)
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT language, streak FROM language_verdicts WHERE prefix = ?",
+                (prefix,),
+            ).fetchone()
+            drift = False
+            if row is not None and row[0] == language:
+                streak = row[1] + 1
+            else:
+                streak = 1
+                drift = row is not None and row[1] >= self.min_documents
+            connection.execute(
+                """
+                INSERT INTO language_verdicts (prefix, language, confidence, streak)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (prefix) DO UPDATE SET
+                    language = excluded.language,
+                    confidence = excluded.confidence,
+                    streak = excluded.streak
+                """,
+                (prefix, language, float(confidence), streak),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        if drift:
+            self.count("drifts")
+        return drift
+
+    @staticmethod
+    def count_results(results: List) -> Dict:
+        """
+        Sums the lookup outcomes ('language_cache' and 'language_drift' keys) of the results of a pool of ParseHtml.load_html, one per document.
+        """
+        counts = dict.fromkeys(STAT_NAMES, 0)
+        for document_results in results:
+            if not isinstance(document_results, list) or not document_results:
+                continue  # skipped documents
+            outcome = document_results[0].get("language_cache")
+            if outcome in counts:
+                counts[outcome] += 1
+            counts["drifts"] += bool(document_results[0].get("language_drift"))
+        return counts
+
+    def stats(self, counts: Dict = None) -> Dict:
+        """
+        Returns the hit rate of the cache from the given counts, by default the ones of this process.
+        """
+        stats = {name: (counts or self.counts).get(name, 0) for name in STAT_NAMES}
+        lookups = stats["hits"] + stats["misses"] + stats["rechecks"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
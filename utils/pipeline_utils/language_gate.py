@@ -0,0 +1,182 @@
+from typing import Dict, List, Tuple
+from urllib.parse import urljoin, urlsplit
+from langdetect import DetectorFactory, detect_langs
+from langdetect.lang_detect_exception import LangDetectException
+
+DetectorFactory.seed = 0  # deterministic verdicts across runs
+MIN_SAMPLE_CHARS = 50
+
+
+def normalize_language(tag: str) -> str:
+    """
+    Reduces a language tag such as 'it-IT' or 'en_US' to its primary subtag ('it', 'en'), the codes used by langdetect.
+    """
+    if not tag:
+        return None
+    return tag.strip().replace("_", "-").split("-")[0].lower() or None
+
+
+class LanguageGate:
+    """
+    Crawl-time language filter of the webpages.
+
+    The language of a page is taken from <html lang> (or from the hreflang entry pointing to
+    the page itself); a declared language outside the accepted ones is confirmed on a sample
+    of the text before the page is dropped, and a page without a declaration is judged on the
+    sample alone. Once `host_verdict_pages` pages of a host got the same verdict, the verdict
+    is cached for the host: the in-scope hosts are no longer checked and the out-of-scope
+    ones are no longer fetched. After share() the pages of every host are counted in the hosts
+    table of the shared frontier, so the workers pulling from it learn the verdicts together.
+    """
+
+    def __init__(
+        self,
+        accepted_languages: List[str],
+        sample_size: int = 2000,
+        host_verdict_pages: int = 5,
+    ) -> None:
+        """
+        Initializes the gate.
+
+        Args:
+            accepted_languages (List[str]): The accepted languages, as langdetect codes ('it', 'en', ...).
+            sample_size (int): The number of characters of text given to the detector.
+            host_verdict_pages (int): The number of concordant pages after which the verdict of a host is cached.
+        """
+        self.accepted_languages = {normalize_language(l) for l in accepted_languages}
+        self.sample_size = sample_size
+        self.host_verdict_pages = host_verdict_pages
+        self.reset()
+
+    def reset(self) -> None:
+        self.host_pages = {}  # host -> [in scope pages, out of scope pages]
+        self.host_verdicts = {}
+        self.stats = {"in_scope": 0, "out_of_scope": 0, "skipped_by_host_verdict": 0}
+        self.frontier = None
+
+    def share(self, frontier) -> None:
+        """
+        Counts the pages of the hosts in the hosts table of a shared CrawlFrontier instead of in memory.
+        """
+        self.reset()
+        self.frontier = frontier
+
+    def verdict(self, in_scope_pages: int, out_of_scope_pages: int) -> bool:
+        """
+        Returns the verdict of a host from its page counts: True (in scope), False (out of scope) or None (not yet decided).
+        """
+        if out_of_scope_pages == 0 and in_scope_pages >= self.host_verdict_pages:
+            return True
+        if in_scope_pages == 0 and out_of_scope_pages >= self.host_verdict_pages:
+            return False
+        return None
+
+    def host_verdict(self, host: str) -> bool:
+        """
+        Returns the cached verdict of a host, looking up the counts of the other workers when shared.
+        """
+        if host not in self.host_verdicts and self.frontier is not None:
+            counts = self.frontier.host_languages(host).get(host)
+            if counts is not None and self.verdict(*counts) is not None:
+                self.host_verdicts[host] = self.verdict(*counts)
+        return self.host_verdicts.get(host)
+
+    def verdicts(self) -> Dict:
+        """
+        Returns the verdicts of the hosts decided so far, by all the workers when shared.
+        """
+        if self.frontier is None:
+            return dict(self.host_verdicts)
+        verdicts = {
+            host: self.verdict(*counts)
+            for host, counts in self.frontier.host_languages().items()
+        }
+        return {host: verdict for host, verdict in verdicts.items() if verdict is not None}
+
+    def detect_text(self, text: str) -> str:
+        sample = text[: self.sample_size]
+        if len(sample) < MIN_SAMPLE_CHARS:
+            return None
+        try:
+            return detect_langs(sample)[0].lang
+        except LangDetectException:
+            return None
+
+    def declared_language(self, url: str, page: Dict) -> Tuple[str, str]:
+        """
+        Returns the (language, source) declared by the page, source being 'html_lang' or 'hreflang'.
+        """
+        if page.get("lang"):
+            return normalize_language(page["lang"]), "html_lang"
+        for lang, href in page.get("hreflang", []):
+            if urljoin(url, href).rstrip("/") == url.rstrip("/"):
+                return normalize_language(lang), "hreflang"
+        return None, None
+
+    def check(self, url: str, page: Dict) -> Tuple[bool, str, str]:
+        """
+        Judges the language of a parsed webpage.
+
+        Args:
+            url (str): The URL of the page.
+            page (Dict): The parsed page, see html_utils.parse_html.
+
+        Returns:
+            A tuple (in_scope, language, source), source being 'html_lang', 'hreflang', 'text',
+            'host' (cached verdict of the host) or None when the language is unknown (in scope).
+        """
+        host = urlsplit(url).netloc
+        if self.host_verdict(host) is True:
+            self.stats["in_scope"] += 1
+            return True, None, "host"
+        language, source = self.declared_language(url, page)
+        if language is None or language not in self.accepted_languages:
+            # an out-of-scope declaration is confirmed on the text before pruning the page
+            detected = self.detect_text(page["text"])
+            if detected is not None:
+                language, source = detected, "text"
+        in_scope = language is None or language in self.accepted_languages
+        self.stats["in_scope" if in_scope else "out_of_scope"] += 1
+        if language is not None:
+            self.record_verdict(host, in_scope)
+        return in_scope, language, source
+
+    def record_verdict(self, host: str, in_scope: bool) -> None:
+        if self.frontier is not None:
+            counts = self.frontier.record_host_language(host, in_scope)
+        else:
+            counts = self.host_pages.setdefault(host, [0, 0])
+            counts[0 if in_scope else 1] += 1
+        verdict = self.verdict(*counts)
+        if verdict is not None:
+            self.host_verdicts[host] = verdict
+
+    def allow(self, url: str) -> bool:
+        """
+        Tells whether a URL can be fetched, False if its host was cached as out of scope.
+        """
+        if self.host_verdict(urlsplit(url).netloc) is False:
+            self.stats["skipped_by_host_verdict"] += 1
+            return False
+        return True
+
+    def alternates(self, url: str, page: Dict) -> List[str]:
+        """
+        Returns the absolute URLs of the hreflang alternates of a page in the accepted languages.
+        """
+        return [
+            urljoin(url, href)
+            for lang, href in page.get("hreflang", [])
+            if normalize_language(lang) in self.accepted_languages
+        ]
+
+    def out_of_scope_alternates(self, url: str, page: Dict) -> set:
+        """
+        Returns the absolute URLs of the hreflang alternates of a page in the languages not accepted.
+        """
+        return {
+            urljoin(url, href)
+            for lang, href in page.get("hreflang", [])
+            if normalize_language(lang) not in self.accepted_languages
+            and normalize_language(lang) != "x"  # x-default
+        }
@@ -0,0 +1,209 @@
+import os
+import time
+import queue
+import threading
+from multiprocessing.managers import BaseManager
+from typing import Callable, Dict, List, Tuple
+
+from src.utils import misc as misc
+
+_server = None  # the tagger of the manager process
+
+
+class LanguageTaggerServer:
+    """
+    Language tagger shared by the transform workers, living in the manager process.
+
+    The requests of the workers are queued and classified together: a batch is closed when it
+    holds `max_batch_size` phrases or when its oldest request waited `max_wait` seconds, so the
+    model runs on full batches under load and answers quickly when idle.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 64,
+        max_wait: float = 0.02,
+        model_loader: Callable = misc.initialize_language_tagger_model,
+    ) -> None:
+        """
+        Loads the model and starts the batching thread.
+
+        Args:
+            max_batch_size (int): The maximum number of phrases classified in one call of the model.
+            max_wait (float): Seconds a request waits for other requests before its batch is classified.
+            model_loader (Callable): Returns the text-classification pipeline. Default is misc.initialize_language_tagger_model.
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pipeline = model_loader()
+        self.requests = queue.Queue()
+        self.stats = {"requests": 0, "phrases": 0, "batches": 0}
+        threading.Thread(target=self.run, name="language-tagger", daemon=True).start()
+
+    def classify(self, phrases: List[str], top_k: int = 1, truncation: bool = True) -> List:
+        """
+        Classifies the phrases of a worker, waiting for the batch they were put in.
+
+        Returns:
+            The output of the pipeline for the phrases, one list of top_k labels per phrase.
+        """
+        request = {
+            "phrases": phrases,
+            "options": (top_k, truncation),
+            "done": threading.Event(),
+        }
+        self.requests.put(request)
+        request["done"].wait()
+        if "error" in request:
+            raise request["error"]
+        return request["result"]
+
+    def next_batch(self) -> List[Dict]:
+        batch = [self.requests.get()]
+        size = len(batch[0]["phrases"])
+        deadline = time.time() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request["phrases"])
+        return batch
+
+    def run(self) -> None:
+        while True:
+            batch = self.next_batch()
+            groups = {}
+            for request in batch:
+                groups.setdefault(request["options"], []).append(request)
+            for (top_k, truncation), requests in groups.items():
+                phrases = [phrase for request in requests for phrase in request["phrases"]]
+                try:
+                    results = self.pipeline(
+                        phrases,
+                        top_k=top_k,
+                        truncation=truncation,
+                        batch_size=min(len(phrases), self.max_batch_size),
+                    )
+                except Exception as e:
+                    for request in requests:
+                        request["error"] = e
+                        request["done"].set()
+                    continue
+                start = 0
+                for request in requests:
+                    end = start + len(request["phrases"])
+                    request["result"] = results[start:end]
+                    start = end
+                    request["done"].set()
+                self.stats["requests"] += len(requests)
+                self.stats["phrases"] += len(phrases)
+                self.stats["batches"] += 1
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
+
+
+def _start_server(max_batch_size: int, max_wait: float, model_loader: Callable) -> None:
+    global _server
+    _server = LanguageTaggerServer(max_batch_size, max_wait, model_loader)
+
+
+def _get_server() -> LanguageTaggerServer:
+    return _server
+
+
+class LanguageTaggerManager(BaseManager):
+    pass
+
+
+LanguageTaggerManager.register("tagger", callable=_get_server)
+
+
+class LanguageTaggerClient:
+    """
+    Picklable stand-in of the transformers pipeline, forwarding the phrases to the shared LanguageTaggerServer.
+
+    The connection is opened lazily in the process using the client, so the client can be
+    carried by ParseHtml and ParsePdf into the pool workers like the pipeline.
+    """
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes) -> None:
+        self.address = address
+        self.authkey = authkey
+        self._tagger = None
+
+    @property
+    def tagger(self):
+        if self._tagger is None:
+            manager = LanguageTaggerManager(address=self.address, authkey=self.authkey)
+            manager.connect()
+            self._tagger = manager.tagger()
+        return self._tagger
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tagger"] = None
+        return state
+
+    def __call__(self, inputs, top_k: int = 1, truncation: bool = True, **kwargs):
+        """
+        Classifies a phrase or a list of phrases, with the same output as the pipeline.
+        """
+        single = isinstance(inputs, str)
+        results = self.tagger.classify([inputs] if single else list(inputs), top_k, truncation)
+        return results[0] if single else results
+
+    def stats(self) -> Dict:
+        return self.tagger.get_stats()
+
+
+class LanguageTaggerService:
+    """
+    Starts the manager process holding the only copy of the language tagger model and hands out its clients.
+
+    Example:
+        service = LanguageTaggerService().start()
+        parser = ParseHtml(..., pipeline=service.client(), language_detector="transformer")
+        parser.load_html_pool(html_data)
+        service.stop()
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 64,
+        max_wait: float = 0.02,
+        model_loader: Callable = misc.initialize_language_tagger_model,
+        address: Tuple[str, int] = ("127.0.0.1", 0),
+    ) -> None:
+        """
+        Initializes the service.
+
+        Args:
+            max_batch_size (int): The maximum number of phrases classified in one call of the model.
+            max_wait (float): Seconds a request waits for other requests before its batch is classified.
+            model_loader (Callable): A picklable function returning the text-classification pipeline, e.g. functools.partial(misc.initialize_language_tagger_model, backend="onnx").
+            address (Tuple[str, int]): The local address of the manager, port 0 picks a free one.
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.model_loader = model_loader
+        self.authkey = os.urandom(16)
+        self.manager = LanguageTaggerManager(address=address, authkey=self.authkey)
+
+    def start(self) -> "LanguageTaggerService":
+        self.manager.start(
+            initializer=_start_server,
+            initargs=(self.max_batch_size, self.max_wait, self.model_loader),
+        )
+        return self
+
+    def client(self) -> LanguageTaggerClient:
+        return LanguageTaggerClient(self.manager.address, self.authkey)
+
+    def stop(self) -> None:
+        self.manager.shutdown()
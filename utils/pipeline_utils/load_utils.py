@@ -7,7 +7,7 @@ from openai import BadRequestError
 from langchain_community.vectorstores import faiss
 from langchain_openai import AzureOpenAIEmbeddings
 from langchain_core.documents.base import Document
-from langchain.text_splitter import CharacterTextSplitter
+from src.utils.pipeline_utils.token_splitter import TokenSplitter
 from langchain_community.vectorstores.faiss import FAISS
 
 from distilabel.pipeline import Pipeline
@@ -140,11 +140,13 @@ def add_chunk_to_dataset(
     client_3_5: AzureChatOpenAI,
     mutation_client: AzureOpenAILLM,
     number_of_questions: int,
-    splitter: CharacterTextSplitter,
+    splitter: TokenSplitter,
     embeddings: AzureOpenAIEmbeddings,
+    full_content: str = None,
 ) -> list[dict]:
     """
     Given a chunk, create {Q, A, D} triplets and add them to the dataset.
+    The full document is read from chunk["full_document_path"] unless its content is given.
     """
 
     q_list = []
@@ -158,12 +160,13 @@ def add_chunk_to_dataset(
     if random.random() < 0.5:
         questions = evol_instruct(questions=questions, client=mutation_client)
 
-    with open(
-        chunk["full_document_path"],
-        "r",
-    ) as f:
-        full_doc = json.load(f)
-        full_content = full_doc["content"]
+    if full_content is None:
+        with open(
+            chunk["full_document_path"],
+            "r",
+        ) as f:
+            full_doc = json.load(f)
+            full_content = full_doc["content"]
     docs = splitter.split_text(full_content)
     index = init_index(
         embeddings, docs
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import bisect
+import threading
+import psutil
+from typing import Dict, List
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+QUEUE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+QUEUE_DEPTH_SAMPLE_PAGES = 50
+METRIC_PREFIX = "crawler_"
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed upper bounds, in the Prometheus style.
+    """
+
+    def __init__(self, buckets: List[float]) -> None:
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> Dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class CrawlMetrics:
+    """
+    In-process counters, gauges and histograms of a crawl, with a background sampler of the RSS and CPU of the process.
+
+    Updates only touch dictionaries in memory. The sampler thread refreshes the resource
+    gauges every `sample_interval` seconds and, when a path is given, flushes a snapshot every
+    `flush_interval` seconds: appended as a JSON line, or rewritten in the Prometheus text
+    exposition format. Every process writes its own file, named after its pid.
+    """
+
+    def __init__(
+        self,
+        folder: str = None,
+        format: str = "jsonl",
+        flush_interval: float = 10.0,
+        sample_interval: float = 1.0,
+    ) -> None:
+        """
+        Initializes the metrics.
+
+        Args:
+            folder (str): The folder of the metrics files (OPTIONAL). If not provided the metrics are kept in memory only.
+            format (str): 'jsonl' (default) or 'prometheus'.
+            flush_interval (float): Seconds between two flushes of the metrics file.
+            sample_interval (float): Seconds between two samples of the RSS and CPU usage.
+        """
+        if format not in ("jsonl", "prometheus"):
+            raise Exception(
+                f"formato delle metriche non supportato: {format}, usa 'jsonl' o 'prometheus'"
+            )
+        self.folder = folder
+        self.format = format
+        self.flush_interval = flush_interval
+        self.sample_interval = sample_interval
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stop = None
+        self._thread = None
+        self.reset()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ["_lock", "_stop", "_thread"]:
+            state[key] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+            self.started_at = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> tuple:
+        return (name, tuple(sorted((labels or {}).items())))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, buckets: List[float] = LATENCY_BUCKETS) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def total(self, name: str, **labels) -> float:
+        """
+        Sums a counter over the label sets matching the given labels.
+        """
+        wanted = set((key, value) for key, value in labels.items())
+        with self._lock:
+            return sum(
+                value
+                for (counter, counter_labels), value in self.counters.items()
+                if counter == name and wanted.issubset(counter_labels)
+            )
+
+    def gauge(self, name: str, default: float = None, **labels) -> float:
+        return self.gauges.get(self._key(name, labels), default)
+
+    def snapshot(self) -> Dict:
+        """
+        Returns all the metrics as a JSON serializable dictionary.
+        """
+
+        def flat(key):
+            name, labels = key
+            if not labels:
+                return name
+            return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "pid": os.getpid(),
+                "started_at": self.started_at,
+                "uptime_seconds": time.time() - self.started_at,
+                "counters": {flat(key): value for key, value in self.counters.items()},
+                "gauges": {flat(key): value for key, value in self.gauges.items()},
+                "histograms": {
+                    name: histogram.snapshot()
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+    def to_prometheus(self, snapshot: Dict) -> str:
+        lines = []
+        for values in [snapshot["counters"], snapshot["gauges"]]:
+            for name, value in sorted(values.items()):
+                lines.append(f"{METRIC_PREFIX}{name} {value}")
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{METRIC_PREFIX}{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{METRIC_PREFIX}{name}_sum {histogram['sum']}")
+            lines.append(f"{METRIC_PREFIX}{name}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    @property
+    def path(self) -> str:
+        extension = "jsonl" if self.format == "jsonl" else "prom"
+        return os.path.join(self.folder, f"metrics_{os.getpid()}.{extension}")
+
+    def flush(self) -> None:
+        """
+        Writes a snapshot to the metrics file of the process, if a folder was given.
+        """
+        if not self.folder:
+            return
+        snapshot = self.snapshot()
+        if self.format == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(snapshot) + "\n")
+        else:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(self.to_prometheus(snapshot))
+            os.replace(tmp_path, self.path)
+
+    def sample_resources(self, process: psutil.Process) -> None:
+        rss_mb = process.memory_info().rss / 1024**2
+        self.set("rss_mb", rss_mb)
+        self.set("peak_rss_mb", max(rss_mb, self.gauge("peak_rss_mb", 0.0)))
+        self.set("cpu_percent", process.cpu_percent(interval=None))
+
+    def _run(self) -> None:
+        process = psutil.Process()
+        process.cpu_percent(interval=None)  # the first call only sets the reference
+        last_flush = time.time()
+        while not self._stop.wait(self.sample_interval):
+            self.sample_resources(process)
+            if time.time() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.time()
+        self.sample_resources(process)
+
+    def start(self) -> None:
+        """
+        Starts the background sampler thread of the current process.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="crawl-metrics", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the sampler thread and writes a last snapshot.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
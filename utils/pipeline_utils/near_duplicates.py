@@ -0,0 +1,190 @@
+import re
+import hashlib
+import sqlite3
+import numpy as np
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> int:
+    """
+    Computes the 64-bit SimHash of a text from its word shingles.
+
+    Args:
+        text (str): The cleaned text of the page.
+        shingle_size (int): The number of consecutive words of a shingle. Default is 3.
+
+    Returns:
+        The fingerprint as an unsigned 64-bit integer, or None if the text has fewer words than a shingle.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        return None
+    shingles = {
+        " ".join(words[i : i + shingle_size])
+        for i in range(len(words) - shingle_size + 1)
+    }
+    hashes = np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            for shingle in shingles
+        ),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    shifts = np.arange(FINGERPRINT_BITS, dtype=np.uint64)
+    bits = (hashes[:, None] >> shifts) & np.uint64(1)
+    # a bit of the fingerprint is set when most shingles have it set
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int(np.packbits(majority, bitorder="little").view("<u8")[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """
+    LSH index of SimHash fingerprints answering "is there a page within max_distance bits of this one".
+
+    The 64 bits are split into max_distance + 1 bands: two fingerprints differing in at most
+    max_distance bits agree on at least one whole band (pigeonhole), so only the pages sharing
+    a band are compared.
+    """
+
+    def __init__(self, threshold: float = 0.95) -> None:
+        """
+        Initializes the index.
+
+        Args:
+            threshold (float): The minimum similarity (share of equal fingerprint bits) of two near-duplicate pages. Default is 0.95.
+        """
+        self.max_distance = int((1 - threshold) * FINGERPRINT_BITS)
+        n_bands = self.max_distance + 1
+        width = FINGERPRINT_BITS // n_bands
+        self.bands = [
+            (
+                band * width,
+                FINGERPRINT_BITS if band == n_bands - 1 else (band + 1) * width,
+            )
+            for band in range(n_bands)
+        ]
+        self.buckets = [{} for _ in self.bands]
+        self.stats = {"pages": 0, "near_duplicates": 0}
+
+    def _keys(self, fingerprint: int):
+        for start, end in self.bands:
+            yield (fingerprint >> start) & ((1 << (end - start)) - 1)
+
+    def add(self, fingerprint: int, url: str) -> str:
+        """
+        Looks up a page and records it if it is not a near-duplicate.
+
+        Args:
+            fingerprint (int): The SimHash of the page.
+            url (str): The URL of the page.
+
+        Returns:
+            The URL of an indexed page within max_distance bits, or None if the page is new.
+        """
+        keys = list(self._keys(fingerprint))
+        for bucket, key in zip(self.buckets, keys):
+            for other_fingerprint, other_url in bucket.get(key, ()):
+                if hamming_distance(fingerprint, other_fingerprint) <= self.max_distance:
+                    self.stats["near_duplicates"] += 1
+                    return other_url
+        for bucket, key in zip(self.buckets, keys):
+            bucket.setdefault(key, []).append((fingerprint, url))
+        self.stats["pages"] += 1
+        return None
+
+
+def to_signed(fingerprint: int) -> int:
+    """
+    Maps an unsigned 64-bit fingerprint to the signed integers SQLite stores.
+    """
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >> (FINGERPRINT_BITS - 1) else fingerprint
+
+
+class SharedSimHashIndex(SimHashIndex):
+    """
+    SimHashIndex whose bands are stored in a SQLite file, so the workers pulling from a shared
+    frontier detect the near-duplicates fetched by each other.
+
+    The lookup and the insertion of a page are one transaction, so two workers fetching
+    near-duplicates at the same time keep only the first one.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.95) -> None:
+        """
+        Initializes the index.
+
+        Args:
+            path (str): The SQLite file of the bands, such as the file of the shared frontier.
+            threshold (float): The minimum similarity of two near-duplicate pages. Default is 0.95.
+        """
+        super().__init__(threshold)
+        self.buckets = None
+        self.path = path
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS simhash_bands (
+                    band INTEGER NOT NULL,
+                    key INTEGER NOT NULL,
+                    fingerprint INTEGER NOT NULL,
+                    url TEXT NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS simhash_bands_key ON simhash_bands (band, key)"
+            )
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def add(self, fingerprint: int, url: str) -> str:
+        keys = [to_signed(key) for key in self._keys(fingerprint)]  # a single band is 64 bits wide
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for band, key in enumerate(keys):
+                for other_fingerprint, other_url in connection.execute(
+                    "SELECT fingerprint, url FROM simhash_bands WHERE band = ? AND key = ?",
+                    (band, key),
+                ):
+                    other_fingerprint %= 1 << FINGERPRINT_BITS
+                    if hamming_distance(fingerprint, other_fingerprint) <= self.max_distance:
+                        connection.execute("COMMIT")
+                        self.stats["near_duplicates"] += 1
+                        return other_url
+            connection.executemany(
+                "INSERT INTO simhash_bands (band, key, fingerprint, url) VALUES (?, ?, ?, ?)",
+                [(band, key, to_signed(fingerprint), url) for band, key in enumerate(keys)],
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self.stats["pages"] += 1
+        return None
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
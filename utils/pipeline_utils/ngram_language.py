@@ -0,0 +1,139 @@
+import os
+import re
+import json
+import numpy as np
+import langdetect
+from typing import List, Tuple
+
+PROFILES_PATH = os.path.join(os.path.dirname(langdetect.__file__), "profiles")
+MAX_NGRAM = 3
+SMOOTHING = 0.5  # same prior weight as langdetect
+OTHER = "other"
+# languages scored only to recognise a text as not accepted, reported as OTHER
+DEFAULT_OTHER_LANGUAGES = [
+    "en",
+    "it",
+    "fr",
+    "de",
+    "es",
+    "pt",
+    "nl",
+    "ro",
+    "ca",
+    "pl",
+    "sl",
+    "hr",
+    "sv",
+    "ru",
+]
+NON_LETTERS = re.compile(r"[\W\d_]+", re.UNICODE)
+
+
+def text_ngrams(text: str) -> List[str]:
+    """
+    Returns the character 1 to 3-grams of a text, words padded with spaces as in the langdetect profiles.
+
+    Words written all in capitals (acronyms) are skipped, as langdetect does.
+    """
+    ngrams = []
+    for word in NON_LETTERS.split(text):
+        if not word or (len(word) > 1 and word.isupper()):
+            continue
+        padded = f" {word} "
+        for n in range(1, MAX_NGRAM + 1):
+            for start in range(len(padded) - n + 1):
+                ngram = padded[start : start + n]
+                if ngram.strip():
+                    ngrams.append(ngram)
+    return ngrams
+
+
+class NgramLanguageIdentifier:
+    """
+    Deterministic naive Bayes language identifier over the character n-gram profiles shipped with langdetect.
+
+    Every n-gram known to a candidate profile gets one log-probability per language, kept in a
+    (n-grams x languages) NumPy matrix; a batch of phrases is scored at once by summing the rows
+    of its n-grams. Only the candidate languages are scored: the accepted ones, reported by
+    code, and `other_languages`, reported as OTHER.
+    """
+
+    def __init__(
+        self,
+        languages: List[str],
+        other_languages: List[str] = None,
+        profiles_path: str = PROFILES_PATH,
+    ) -> None:
+        """
+        Loads the profiles of the candidate languages.
+
+        Args:
+            languages (List[str]): The languages reported by code, as langdetect codes ('it', 'en', ...).
+            other_languages (List[str]): The languages reported as OTHER. Default is DEFAULT_OTHER_LANGUAGES minus `languages`.
+            profiles_path (str): The folder of the langdetect JSON profiles.
+        """
+        self.languages = list(languages)
+        if other_languages is None:
+            other_languages = DEFAULT_OTHER_LANGUAGES
+        self.other_languages = [l for l in other_languages if l not in self.languages]
+        candidates = self.languages + self.other_languages
+        profiles = []
+        for language in candidates:
+            with open(os.path.join(profiles_path, language), "r", encoding="utf-8") as file:
+                profiles.append(json.load(file))
+        self.vocabulary = {}
+        for profile in profiles:
+            for ngram in profile["freq"]:
+                self.vocabulary.setdefault(ngram, len(self.vocabulary))
+        # relative frequency of every n-gram in every language
+        probabilities = np.zeros((len(self.vocabulary), len(candidates)))
+        for column, profile in enumerate(profiles):
+            for ngram, count in profile["freq"].items():
+                probabilities[self.vocabulary[ngram], column] = (
+                    count / profile["n_words"][len(ngram) - 1]
+                )
+        # share of the n-gram among the candidates, smoothed towards the uniform prior
+        shares = probabilities / probabilities.sum(axis=1, keepdims=True)
+        self.log_weights = np.log(
+            (shares + SMOOTHING / len(candidates)) / (1 + SMOOTHING)
+        ).astype(np.float32)
+        self.labels = self.languages + [OTHER] * len(self.other_languages)
+
+    def scores(self, phrases: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the (phrases x candidates) log-likelihoods of a batch and the number of known n-grams of every phrase.
+        """
+        rows, columns = [], []
+        for row, phrase in enumerate(phrases):
+            for ngram in text_ngrams(phrase):
+                column = self.vocabulary.get(ngram)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        scores = np.zeros((len(phrases), self.log_weights.shape[1]), dtype=np.float32)
+        np.add.at(scores, np.array(rows, dtype=np.int64), self.log_weights[columns])
+        return scores, np.bincount(rows, minlength=len(phrases))
+
+    def detect(self, phrases: List[str]) -> List[Tuple[str, float]]:
+        """
+        Identifies the language of a batch of phrases.
+
+        Args:
+            phrases (List[str]): The phrases.
+
+        Returns:
+            One (language, probability) tuple per phrase, language being one of `languages` or
+            OTHER, or (None, 0.0) for a phrase without any known n-gram.
+        """
+        if not phrases:
+            return []
+        scores, known = self.scores(phrases)
+        probabilities = np.exp(scores - scores.max(axis=1, keepdims=True))
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [
+            (self.labels[column], float(probabilities[row, column]))
+            if known[row]
+            else (None, 0.0)
+            for row, column in enumerate(best)
+        ]
@@ -0,0 +1,170 @@
+import io
+import gzip
+import sqlite3
+import requests
+from lxml import etree
+from typing import Iterator, Tuple
+from urllib.parse import urlsplit
+
+from src.utils.pipeline_utils import extraction_utils as e_ut
+
+MAX_SITEMAP_NESTING = 3
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_sitemap(response: requests.Response):
+    """
+    Returns a file-like object streaming the XML of a sitemap response, decompressing .xml.gz sitemaps on the fly.
+    """
+    response.raw.decode_content = True  # Content-Encoding: gzip
+    response.raw.auto_close = False  # the buffered reader reads past the end of the body
+    stream = io.BufferedReader(response.raw)
+    if stream.peek(2)[:2] == GZIP_MAGIC:  # gzip file served as is
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def iter_sitemap(
+    url: str,
+    timeout: Tuple[float, float] = (5.0, 30.0),
+    nesting: int = MAX_SITEMAP_NESTING,
+    logger=None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Streams the page URLs of a sitemap, following the nested sitemaps of a sitemap index.
+
+    The XML is parsed incrementally and every element is released once read, so memory does
+    not grow with the size of the sitemap.
+
+    Args:
+        url (str): The URL of the sitemap (plain or gzip compressed).
+        timeout (Tuple[float, float]): The connect and read timeouts of the requests.
+        nesting (int): How many levels of sitemap indexes are followed. Default is MAX_SITEMAP_NESTING.
+        logger: The logger of the crawler, used to report the unreadable sitemaps.
+
+    Yields:
+        The (loc, lastmod) tuples of the pages, lastmod is None when not given.
+    """
+    nested = []
+    try:
+        with e_ut.requests_retry_session(retries=2, backoff_factor=0.2).get(
+            url, verify=False, stream=True, timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            for _, element in etree.iterparse(
+                open_sitemap(response), events=("end",), recover=True, huge_tree=True
+            ):
+                tag = etree.QName(element).localname
+                if tag not in ("url", "sitemap"):
+                    continue
+                fields = {
+                    etree.QName(child).localname: (child.text or "").strip()
+                    for child in element
+                    if isinstance(child.tag, str)
+                }
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+                if not fields.get("loc"):
+                    continue
+                if tag == "sitemap":
+                    nested.append(fields["loc"])
+                else:
+                    yield fields["loc"], fields.get("lastmod") or None
+    except (requests.RequestException, etree.XMLSyntaxError, OSError, EOFError) as e:
+        if logger is not None:
+            logger.warning(f"sitemap {url} not readable: {e}")
+        return
+    if nesting > 0:
+        for nested_url in nested:
+            yield from iter_sitemap(nested_url, timeout, nesting - 1, logger)
+
+
+def sitemap_depth(root_url: str, url: str) -> int:
+    """
+    Returns the depth-equivalent of a sitemap URL: the number of path segments below the
+    directory of the root URL, or None if the URL is on another host or outside that directory.
+    """
+    root, page = urlsplit(root_url), urlsplit(url)
+    if root.netloc.lower() != page.netloc.lower():
+        return None
+    root_segments = [s for s in root.path.split("/") if s]
+    if root.path and not root.path.endswith("/"):
+        root_segments = root_segments[:-1]  # the root is a page, its directory is the scope
+    segments = [s for s in page.path.split("/") if s]
+    if segments[: len(root_segments)] != root_segments:
+        return None
+    return len(segments) - len(root_segments)
+
+
+class SitemapState:
+    """
+    Last seen lastmod of every sitemap URL, stored in a SQLite file shared by the crawler processes and kept across runs.
+
+    The lastmod read from the sitemap is kept as pending until the page is fetched, so a page
+    whose fetch failed is not considered up to date by the next run.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sitemap_lastmod (
+                    url TEXT PRIMARY KEY,
+                    lastmod TEXT,
+                    pending_lastmod TEXT
+                )
+                """
+            )
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def unchanged(self, url: str, lastmod: str) -> bool:
+        """
+        Tells whether the page was fetched with this lastmod already, otherwise records the lastmod as pending.
+        """
+        if not lastmod:
+            return False
+        row = self.connection.execute(
+            "SELECT lastmod FROM sitemap_lastmod WHERE url = ?", (url,)
+        ).fetchone()
+        if row is not None and row[0] == lastmod:
+            return True
+        self.connection.execute(
+            """
+            INSERT INTO sitemap_lastmod (url, pending_lastmod) VALUES (?, ?)
+            ON CONFLICT (url) DO UPDATE SET pending_lastmod = excluded.pending_lastmod
+            """,
+            (url, lastmod),
+        )
+        return False
+
+    def confirm(self, url: str) -> None:
+        """
+        Marks the pending lastmod of a successfully fetched page as the current one.
+        """
+        self.connection.execute(
+            """
+            UPDATE sitemap_lastmod SET lastmod = pending_lastmod, pending_lastmod = NULL
+            WHERE url = ? AND pending_lastmod IS NOT NULL
+            """,
+            (url,),
+        )
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
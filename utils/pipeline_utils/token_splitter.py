@@ -0,0 +1,132 @@
+import bisect
+import tiktoken
+from typing import Dict, List, Union
+
+
+class TokenSplitter:
+    """
+    Token-native text splitter: every document is encoded once and the chunks are cut on token offsets.
+
+    The document is cut after every separator into pieces, the pieces are merged into chunks of
+    at most `chunk_size` tokens and every chunk starts with up to `chunk_overlap` tokens of the
+    previous one, as CharacterTextSplitter.from_tiktoken_encoder does. A piece longer than
+    `chunk_size` is cut on token boundaries. The chunks are returned with their token count and
+    offsets, so they never have to be encoded again.
+    """
+
+    def __init__(
+        self,
+        encoding: Union[str, tiktoken.Encoding] = "cl100k_base",
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        separator: str = ".",
+    ) -> None:
+        """
+        Initializes the splitter.
+
+        Args:
+            encoding (Union[str, tiktoken.Encoding]): The tiktoken encoding or its name.
+            chunk_size (int): The maximum number of tokens of a chunk.
+            chunk_overlap (int): The maximum number of tokens shared by two consecutive chunks.
+            separator (str): The string after which a chunk can be cut.
+        """
+        if chunk_overlap >= chunk_size:
+            raise Exception(
+                f"chunk_overlap ({chunk_overlap}) deve essere minore di chunk_size ({chunk_size})"
+            )
+        self.encoding = (
+            tiktoken.get_encoding(encoding) if isinstance(encoding, str) else encoding
+        )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separator = separator
+
+    def pieces(self, text: str, offsets: List[int]) -> List[tuple]:
+        """
+        Returns the (first token, last token + 1) ranges of the pieces of a text, cut after every separator.
+
+        Args:
+            text (str): The text.
+            offsets (List[int]): The character offset of every token, followed by len(text).
+        """
+        n_tokens = len(offsets) - 1
+        cuts = {0, n_tokens}
+        if self.separator:
+            position = text.find(self.separator)
+            while position != -1:
+                end = position + len(self.separator)
+                # the first token starting at or after the end of the separator
+                cuts.add(bisect.bisect_left(offsets, end, hi=n_tokens))
+                position = text.find(self.separator, end)
+        cuts = sorted(cuts)
+        pieces = []
+        for start, end in zip(cuts, cuts[1:]):
+            for piece_start in range(start, end, self.chunk_size):
+                pieces.append((piece_start, min(piece_start + self.chunk_size, end)))
+        return pieces
+
+    def merge(self, pieces: List[tuple]) -> List[tuple]:
+        """
+        Merges consecutive pieces into overlapping chunks, returned as token ranges.
+        """
+        chunks = []
+        current = []
+        total = 0
+        for start, end in pieces:
+            length = end - start
+            if current and total + length > self.chunk_size:
+                chunks.append((current[0][0], current[-1][1]))
+                # keep the tail of the chunk as the overlap of the next one
+                while current and (
+                    total > self.chunk_overlap or total + length > self.chunk_size
+                ):
+                    total -= current[0][1] - current[0][0]
+                    current.pop(0)
+            current.append((start, end))
+            total += length
+        if current:
+            chunks.append((current[0][0], current[-1][1]))
+        return chunks
+
+    def split(self, text: str) -> List[Dict]:
+        """
+        Splits a text into chunks.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            The chunks, as dictionaries with the keys 'text', 'token_count', 'start' and 'end'
+            (character offsets in the text, whitespace around the chunk excluded) and
+            'token_start' and 'token_end' (token offsets in the encoded text).
+        """
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if not tokens:
+            return []
+        _, offsets = self.encoding.decode_with_offsets(tokens)
+        offsets.append(len(text))
+        chunks = []
+        for token_start, token_end in self.merge(self.pieces(text, offsets)):
+            start, end = offsets[token_start], offsets[token_end]
+            chunk = text[start:end]
+            stripped = chunk.strip()
+            if not stripped:
+                continue
+            start += len(chunk) - len(chunk.lstrip())
+            chunks.append(
+                {
+                    "text": stripped,
+                    "token_count": token_end - token_start,
+                    "start": start,
+                    "end": start + len(stripped),
+                    "token_start": token_start,
+                    "token_end": token_end,
+                }
+            )
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Returns only the text of the chunks, as the langchain splitters.
+        """
+        return [chunk["text"] for chunk in self.split(text)]
@@ -8,6 +8,7 @@ from langchain.schema import HumanMessage, SystemMessage, AIMessage
 import src.utils.custom_prompts as cp
 from transformers import Pipeline
 import numpy as np
+from src.utils.pipeline_utils.ngram_language import NgramLanguageIdentifier
 
 
 def democratic_language_tagger(text: List[List[str]], pipeline: Pipeline, **kwargs) -> str:
@@ -70,4 +71,53 @@ def democratic_language_tagger_detect_lang(text: List[List[str]], **kwargs) -> s
     d_language = max(
         probs, key=result.get
     )
-    return d_language, probs[d_language] 
\ No newline at end of file
+    return d_language, probs[d_language] 
+
+
+def democratic_language_tagger_ngram(
+    text: List[List[str]], identifier: NgramLanguageIdentifier, **kwargs
+) -> str:
+    """
+    Votes the language of a document sample with the n-gram identifier, classifying all the phrases in one batch.
+
+    Returns:
+        The language and its confidence, (None, 0.0) if no phrase contains a known n-gram.
+    """
+    result = {}
+    for language, prob in identifier.detect([phrase for page in text for phrase in page]):
+        if language is None:
+            continue
+        result[language] = result.get(language, 0.0) + prob
+    if not result:
+        return None, 0.0
+    probs = softmax(result)
+    d_language = max(probs, key=result.get)
+    return d_language, probs[d_language]
+
+
+LANGUAGE_DETECTORS = ("langdetect", "transformer", "ngram")
+
+
+def detect_language(
+    text: List[List[str]],
+    detector: str = "langdetect",
+    pipeline=None,
+    identifier: NgramLanguageIdentifier = None,
+):
+    """
+    Votes the language of a document sample with the chosen detector.
+
+    Args:
+        text (List[List[str]]): The sampled phrases of the document, see sample_docs.
+        detector (str): 'langdetect', 'transformer' (the language tagger pipeline, or a LanguageTaggerClient of the shared server) or 'ngram' (the NumPy n-gram identifier).
+        pipeline: The language tagger, used by the 'transformer' detector.
+        identifier (NgramLanguageIdentifier): The n-gram identifier, used by the 'ngram' detector.
+
+    Returns:
+        The language and its confidence.
+    """
+    if detector == "transformer":
+        return democratic_language_tagger(text, pipeline=pipeline)
+    if detector == "ngram":
+        return democratic_language_tagger_ngram(text, identifier)
+    return democratic_language_tagger_detect_lang(text)
@@ -0,0 +1,237 @@
+import re
+import asyncio
+import aiohttp
+import requests
+from typing import List
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+from src.utils.pipeline_utils.extraction_utils import canonicalize_url
+
+DEFAULT_DENIED_DOMAINS = [
+    "twitter.com",
+    "x.com",
+    "facebook.com",
+    "linkedin.com",
+    "instagram.com",
+    "youtube.com",
+    "youtu.be",
+    "just-eat.com",
+    "just-eat.co.uk",
+    "slack.com",
+    "meetup.com",
+]
+DEFAULT_DENIED_PATHS = [
+    r"/subscriptions?(/|$)",
+    r"/donate(/|$)",
+]
+
+
+class DomainTrie:
+    """
+    Trie of domain names keyed by their reversed labels, matching a host and all its subdomains.
+    """
+
+    TERMINAL = ""
+
+    def __init__(self, domains: List[str] = None) -> None:
+        self.root = {}
+        for domain in domains or []:
+            self.add(domain)
+
+    def add(self, domain: str) -> None:
+        node = self.root
+        for label in reversed(domain.lower().strip(".").split(".")):
+            node = node.setdefault(label, {})
+        node[self.TERMINAL] = True
+
+    def match(self, host: str) -> bool:
+        """
+        Tells whether the host is one of the domains or a subdomain of one of them, in O(number of labels).
+        """
+        node = self.root
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                return False
+            if self.TERMINAL in node:
+                return True
+        return False
+
+
+def compile_patterns(patterns: List[str]):
+    """
+    Compiles a list of regular expressions into a single alternation, or None if the list is empty.
+    """
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+
+
+class UrlFilter:
+    """
+    Allow/deny filter applied to every link found by the crawler.
+
+    Domains are matched by suffix through a DomainTrie and paths through one compiled regular
+    expression, so the cost of a check does not grow with the number of rules. Allow rules
+    win over deny rules. With respect_robots the robots.txt of every host is fetched once and
+    cached; the asyncio engine fetches them beforehand with fetch_robots_async, so the checks
+    never block its event loop.
+    """
+
+    def __init__(
+        self,
+        denied_domains: List[str] = None,
+        allowed_domains: List[str] = None,
+        denied_paths: List[str] = None,
+        allowed_paths: List[str] = None,
+        respect_robots: bool = False,
+        user_agent: str = "*",
+        robots_timeout: float = 10.0,
+    ) -> None:
+        """
+        Initializes the filter.
+
+        Args:
+            denied_domains (List[str]): Domains whose links are dropped, subdomains included. Default is DEFAULT_DENIED_DOMAINS.
+            allowed_domains (List[str]): Domains whose links are always kept, even if a deny rule matches.
+            denied_paths (List[str]): Regular expressions searched in the path and query of the links to drop. Default is DEFAULT_DENIED_PATHS.
+            allowed_paths (List[str]): Regular expressions of the paths always kept.
+            respect_robots (bool): Whether to drop the links disallowed by the robots.txt of their host.
+            user_agent (str): The user agent the robots.txt rules are evaluated for.
+            robots_timeout (float): Seconds to wait for a robots.txt.
+        """
+        self.denied_domains = DomainTrie(
+            DEFAULT_DENIED_DOMAINS if denied_domains is None else denied_domains
+        )
+        self.allowed_domains = DomainTrie(allowed_domains)
+        self.denied_paths = compile_patterns(
+            DEFAULT_DENIED_PATHS if denied_paths is None else denied_paths
+        )
+        self.allowed_paths = compile_patterns(allowed_paths)
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self.robots_timeout = robots_timeout
+        self.robots = {}
+        self.stats = {"denied": 0, "robots_disallowed": 0}
+
+    def allowed(self, url: str) -> bool:
+        """
+        Tells whether the crawler should follow a link.
+
+        Args:
+            url (str): The absolute, canonical URL of the link.
+
+        Returns:
+            True if the link passes the filter.
+        """
+        parts = urlsplit(url)
+        if self.denied(parts):
+            self.stats["denied"] += 1
+            return False
+        if self.respect_robots and not self.robots_parser(parts).can_fetch(
+            self.user_agent, url
+        ):
+            self.stats["robots_disallowed"] += 1
+            return False
+        return True
+
+    def denied(self, parts) -> bool:
+        """
+        Tells whether the allow/deny rules drop a URL, already split.
+        """
+        host = (parts.hostname or "").lower()
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        if self.allowed_domains.match(host) or (
+            self.allowed_paths and self.allowed_paths.search(path)
+        ):
+            return False
+        return bool(
+            self.denied_domains.match(host)
+            or (self.denied_paths and self.denied_paths.search(path))
+        )
+
+    @staticmethod
+    def robots_origin(parts) -> str:
+        return f"{parts.scheme}://{parts.netloc}"
+
+    @staticmethod
+    def parse_robots(origin: str, status_code: int, text: str) -> RobotFileParser:
+        """
+        Builds the rules of a robots.txt response: like RobotFileParser.read, a 401/403 answer
+        disallows everything and any other failure (status_code None) allows everything.
+        """
+        parser = RobotFileParser(origin + "/robots.txt")
+        if status_code is None or (status_code >= 400 and status_code not in (401, 403)):
+            parser.allow_all = True
+        elif status_code in (401, 403):
+            parser.disallow_all = True
+        else:
+            parser.parse(text.splitlines())
+        return parser
+
+    def robots_parser(self, parts) -> RobotFileParser:
+        """
+        Returns the cached robots.txt rules of the host of the URL, fetching them on first use.
+        """
+        origin = self.robots_origin(parts)
+        parser = self.robots.get(origin)
+        if parser is not None:
+            return parser
+        try:
+            response = requests.get(
+                origin + "/robots.txt", timeout=self.robots_timeout, verify=False
+            )
+            parser = self.parse_robots(origin, response.status_code, response.text)
+        except requests.RequestException:
+            parser = self.parse_robots(origin, None, "")
+        self.robots[origin] = parser
+        return parser
+
+    async def fetch_robots_async(
+        self, session: aiohttp.ClientSession, urls: List[str]
+    ) -> None:
+        """
+        Fetches with the aiohttp session of the asyncio engine the robots.txt of the hosts of the URLs not cached yet.
+
+        The URLs are canonicalized first, so the rules are cached under the origin allowed looks
+        up (lowercased host, no default port) and allowed never falls back to a blocking fetch.
+
+        Args:
+            session (aiohttp.ClientSession): The session of the crawl.
+            urls (List[str]): The URLs about to be checked with allowed, canonical or not.
+        """
+
+        async def fetch(origin: str) -> None:
+            try:
+                async with session.get(
+                    origin + "/robots.txt",
+                    timeout=aiohttp.ClientTimeout(total=self.robots_timeout),
+                ) as response:
+                    text = await response.text(errors="replace")
+                    parser = self.parse_robots(origin, response.status, text)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                parser = self.parse_robots(origin, None, "")
+            self.robots.setdefault(origin, parser)
+
+        if not self.respect_robots:
+            return
+        origins = set()
+        for url in urls:
+            url = canonicalize_url(url)
+            if url is None:
+                continue
+            parts = urlsplit(url)
+            if not self.denied(parts):
+                origins.add(self.robots_origin(parts))
+        origins -= self.robots.keys()
+        if origins:
+            await asyncio.gather(*(fetch(origin) for origin in origins))
+
+    def sitemaps(self, url: str) -> List[str]:
+        """
+        Returns the sitemaps declared in the robots.txt of the host of the URL, or its /sitemap.xml if none is declared.
+        """
+        parts = urlsplit(url)
+        return self.robots_parser(parts).site_maps() or [
+            f"{parts.scheme}://{parts.netloc}/sitemap.xml"
+        ]
@@ -0,0 +1,175 @@
+import os
+import math
+import mmap
+import hashlib
+import portalocker
+from typing import Dict
+
+HEADER_SLOTS = 8  # capacity, count, duplicate hits, bloom flag, number of hashes, number of bits, 2 reserved
+HEADER_SIZE = HEADER_SLOTS * 8
+
+
+def url_fingerprint(url: str) -> int:
+    """
+    Computes the 64-bit fingerprint of a URL, never 0 since 0 marks an empty slot.
+
+    Args:
+        url (str): The URL to fingerprint.
+
+    Returns:
+        The fingerprint as an unsigned 64-bit integer.
+    """
+    fingerprint = int.from_bytes(
+        hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+    return fingerprint or 1
+
+
+class SharedVisitedSet:
+    """
+    Set of visited URLs shared by the crawler processes through a memory-mapped file.
+
+    Each URL is stored as a fixed-width 64-bit fingerprint in an open-addressing table
+    (or as k bits of a Bloom filter in bloom mode), so memory does not grow with the
+    URL length. Updates are serialized with a lock on the file, the header keeps the
+    number of stored URLs and of duplicate fetches avoided.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        capacity: int = 2**22,
+        bloom: bool = False,
+        false_positive_rate: float = 0.001,
+        max_load_factor: float = 0.8,
+    ) -> None:
+        """
+        Initializes the set, creating the file if it does not exist.
+
+        Args:
+            path (str): The file backing the set.
+            capacity (int): The expected number of URLs. Default is 2**22.
+            bloom (bool): Whether to use a Bloom filter instead of the fingerprint table. Default is False.
+            false_positive_rate (float): The target false positive rate in bloom mode.
+            max_load_factor (float): Fill ratio of the table above which new URLs are no longer recorded.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.bloom = bloom
+        self.false_positive_rate = false_positive_rate
+        self.max_load_factor = max_load_factor
+        self._file = None
+        self._mmap = None
+        self._header = None
+        self._body = None
+        if not os.path.exists(path):
+            self.reset()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ["_file", "_mmap", "_header", "_body"]:
+            state[key] = None
+        return state
+
+    def reset(self) -> None:
+        """
+        Creates (or empties) the backing file.
+        """
+        self.close()
+        if self.bloom:
+            n_bits = math.ceil(
+                -self.capacity * math.log(self.false_positive_rate) / math.log(2) ** 2
+            )
+            n_bits = 64 * math.ceil(n_bits / 64)
+            n_hashes = max(1, round(n_bits / self.capacity * math.log(2)))
+            body_size = n_bits // 8
+        else:
+            n_bits, n_hashes = 0, 0
+            body_size = self.capacity * 8
+        with open(self.path, "wb") as file:
+            file.truncate(HEADER_SIZE + body_size)
+            file.seek(0)
+            file.write(
+                b"".join(
+                    value.to_bytes(8, "little")
+                    for value in [self.capacity, 0, 0, int(self.bloom), n_hashes, n_bits]
+                )
+            )
+
+    def _open(self) -> None:
+        if self._mmap is not None:
+            return
+        self._file = open(self.path, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        self._header = memoryview(self._mmap)[:HEADER_SIZE].cast("Q")
+        self.capacity = self._header[0]
+        self.bloom = bool(self._header[3])
+        if self.bloom:
+            self._body = memoryview(self._mmap)[HEADER_SIZE:]
+        else:
+            self._body = memoryview(self._mmap)[HEADER_SIZE:].cast("Q")
+
+    def close(self) -> None:
+        if self._mmap is None:
+            return
+        self._header.release()
+        self._body.release()
+        self._mmap.close()
+        self._file.close()
+        self._file = self._mmap = self._header = self._body = None
+
+    def _bit_positions(self, fingerprint: int):
+        n_bits = self._header[5]
+        h1, h2 = fingerprint & 0xFFFFFFFF, (fingerprint >> 32) | 1
+        return [(h1 + i * h2) % n_bits for i in range(self._header[4])]
+
+    def add(self, url: str) -> bool:
+        """
+        Records a URL.
+
+        Args:
+            url (str): The URL to record.
+
+        Returns:
+            True if the URL was not in the set (it should be fetched), False if it was already visited.
+        """
+        self._open()
+        fingerprint = url_fingerprint(url)
+        portalocker.lock(self._file, portalocker.LOCK_EX)
+        try:
+            if self.bloom:
+                positions = self._bit_positions(fingerprint)
+                if all(self._body[p >> 3] & (1 << (p & 7)) for p in positions):
+                    self._header[2] += 1
+                    return False
+                for p in positions:
+                    self._body[p >> 3] |= 1 << (p & 7)
+                self._header[1] += 1
+                return True
+
+            slot = fingerprint % self.capacity
+            while self._body[slot]:
+                if self._body[slot] == fingerprint:
+                    self._header[2] += 1
+                    return False
+                slot = (slot + 1) % self.capacity
+            # past the load factor new URLs are not recorded, so probing always finds an empty slot
+            if self._header[1] < self.max_load_factor * self.capacity:
+                self._body[slot] = fingerprint
+                self._header[1] += 1
+            return True
+        finally:
+            portalocker.unlock(self._file)
+
+    def stats(self) -> Dict:
+        """
+        Returns the number of URLs stored and of duplicate fetches avoided.
+        """
+        self._open()
+        return {
+            "mode": "bloom" if self.bloom else "fingerprints",
+            "capacity": self.capacity,
+            "visited": self._header[1],
+            "duplicate_fetches_avoided": self._header[2],
+            "size_bytes": len(self._mmap),
+        }